@@ -0,0 +1,89 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from argparse import ArgumentParser
+from statistics import median
+from subprocess import run
+from pathlib import Path
+import sys
+
+
+SRC = Path(__file__).resolve().parent.parent / 'src'
+
+# statement: budget in milliseconds, measured in a fresh interpreter
+BUDGETS = {
+    'import plural': 5.0,
+    'import plural.models': 50.0,
+    'from plural.models import Message': 250.0,
+    'from plural.models import Member': 300.0,
+    'from plural.application import Application': 800.0,
+}
+
+TIMER = '''\
+from time import perf_counter
+start = perf_counter()
+{statement}
+print(perf_counter() - start)
+'''
+
+
+def measure(statement: str, runs: int) -> list[float]:
+    samples = []
+
+    for _ in range(runs):
+        process = run(
+            [sys.executable, '-c', TIMER.format(statement=statement)],
+            capture_output=True, text=True, check=True,
+            env={'PYTHONPATH': str(SRC)}
+        )
+        samples.append(float(process.stdout) * 1000)
+
+    return samples
+
+
+def main() -> int:
+    parser = ArgumentParser(description='Import time regression benchmark.')
+    parser.add_argument('-n', '--runs', type=int, default=10)
+    parser.add_argument(
+        '--check', action='store_true',
+        help='exit with an error if any median exceeds its budget')
+    args = parser.parse_args()
+
+    failed = False
+
+    for statement, budget in BUDGETS.items():
+        samples = measure(statement, args.runs)
+        result = median(samples)
+        over = result > budget
+        failed |= over
+
+        print(
+            f'{statement:45} median {result:7.1f} ms  '
+            f'min {min(samples):7.1f} ms  budget {budget:6.1f} ms'
+            f'{'  OVER BUDGET' if over else ''}')
+
+    return 1 if args.check and failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import Awaitable, Callable
+from asyncio import gather, get_running_loop, run
+from argparse import ArgumentParser, Namespace
+from statistics import quantiles
+from random import Random
+from typing import Any
+import sys
+
+from plural.testing import MockAPI, MockConfig
+from plural.application import Application
+from plural.http import RetryPolicy
+from plural.metrics import Metrics
+from plural.enums import Intents
+from plural.user import User
+
+
+OPERATIONS = ('member', 'message', 'existence', 'page')
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {operation: [] for operation in OPERATIONS}
+        self.errors: dict[str, int] = {}
+
+    def report(self, elapsed: float, api: MockAPI, metrics: list[Metrics]) -> None:
+        total = sum(len(latencies) for latencies in self.latencies.values())
+
+        print(f'{total} operations in {elapsed:.2f}s, {total / elapsed:,.0f} ops/s')
+        print(f'{sum(api.requests.values())} requests served, {sum(api.requests.values()) / elapsed:,.0f} req/s')
+        print(f'{"operation":<12} {"count":>8} {"p50 ms":>9} {"p99 ms":>9} {"max ms":>9}')
+
+        for operation, latencies in self.latencies.items():
+            if len(latencies) < 2:
+                continue
+
+            cuts = quantiles(latencies, n=100)
+            print(
+                f'{operation:<12} {len(latencies):>8} {cuts[49] * 1e3:>9.2f} '
+                f'{cuts[98] * 1e3:>9.2f} {max(latencies) * 1e3:>9.2f}')
+
+        print('statuses:', dict(sorted(api.statuses.items())))
+        print('client retries:', sum(sum(metric.retries.values()) for metric in metrics))
+        print('client transient retries:', sum(sum(metric.transient_retries.values()) for metric in metrics))
+        print('client hedges:', sum(sum(metric.hedges.values()) for metric in metrics))
+        print('client coalesced:', sum(metric.coalesced for metric in metrics))
+        print('client ratelimit wait: {:.2f}s'.format(
+            sum(sum(metric.ratelimit_wait.values()) for metric in metrics)))
+
+        if self.errors:
+            print('errors:', self.errors)
+
+
+def seed(api: MockAPI, args: Namespace) -> dict[int, list[str]]:
+    members: dict[int, list[str]] = {}
+
+    for user_id in range(1, args.users + 1):
+        group_id = api.add_group(user_id=user_id)['id']
+        members[user_id] = [
+            api.add_member(f'member {n}', group_id=group_id)['id']
+            for n in range(args.members)
+        ]
+
+    for proxy_id in range(1, args.messages + 1):
+        api.add_message(
+            proxy_id,
+            original_id=proxy_id + args.messages,
+            author_id=proxy_id % args.users + 1
+        )
+
+    return members
+
+
+async def client(
+    user: User,
+    member_ids: list[str],
+    args: Namespace,
+    results: Results,
+    deadline: float,
+    random: Random
+) -> None:
+    loop = get_running_loop()
+    application = user.application
+
+    async def page() -> None:
+        async for _ in user.iter_members(limit=args.page_size, page_size=args.page_size):
+            pass
+
+    operations: dict[str, Callable[[], Awaitable[Any]]] = {
+        'member': lambda: user.fetch_member(random.choice(member_ids), use_cache=False),
+        'message': lambda: application.fetch_message(
+            random.randint(1, args.messages * 2), max_wait=0, use_cache=False),
+        'existence': lambda: application.fetch_message(
+            random.randint(1, args.messages * 4), existence_only=True, max_wait=0, use_cache=False),
+        'page': page
+    }
+    names = list(operations)
+    weights = [args.weights[name] for name in names]
+
+    while (started := loop.time()) < deadline:
+        operation = random.choices(names, weights)[0]
+
+        try:
+            await operations[operation]()
+        except Exception as e:  # noqa: BLE001
+            name = type(e).__name__
+            results.errors[name] = results.errors.get(name, 0) + 1
+            continue
+
+        results.latencies[operation].append(loop.time() - started)
+
+
+async def load(args: Namespace) -> None:
+    config = MockConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        reset_rate=args.reset_rate,
+        ratelimit_rate=args.ratelimit_rate,
+        ratelimit_limit=args.ratelimit_limit,
+        seed=args.seed
+    )
+
+    async with MockAPI(config, token='token') as api:
+        member_ids = seed(api, args)
+        results = Results()
+        random = Random(args.seed)
+        applications = [
+            Application(
+                'token',
+                Intents.MEMBERS_READ | Intents.GROUPS_READ,
+                base_url=api.url,
+                metrics=Metrics(),
+                retry=RetryPolicy(
+                    max_retries=args.retries,
+                    hedge_percentile=args.hedge
+                )
+            )
+            for _ in range(args.applications)
+        ]
+
+        for application in applications:
+            await application.start()
+
+        loop = get_running_loop()
+        started = loop.time()
+        deadline = started + args.duration
+
+        try:
+            await gather(*(
+                client(
+                    application.as_user(user_id),
+                    member_ids[user_id],
+                    args, results, deadline,
+                    Random(random.random())
+                )
+                for application in applications
+                for user_id in member_ids
+                for _ in range(args.concurrency)
+            ))
+        finally:
+            for application in applications:
+                await application.close()
+
+        results.report(
+            loop.time() - started,
+            api,
+            [application.metrics for application in applications
+             if application.metrics is not None]
+        )
+
+
+def weights(value: str) -> dict[str, float]:
+    parsed = dict.fromkeys(OPERATIONS, 0.0)
+
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+
+        if name not in parsed:
+            raise ValueError(f'unknown operation {name!r}')
+
+        parsed[name] = float(weight or 1)
+
+    return parsed
+
+
+def main() -> int:
+    parser = ArgumentParser(description='End to end load test against a local mock API.')
+    parser.add_argument('-a', '--applications', type=int, default=2)
+    parser.add_argument('-u', '--users', type=int, default=50, help='users per application')
+    parser.add_argument(
+        '-c', '--concurrency', type=int, default=2,
+        help='concurrent clients per user')
+    parser.add_argument('-d', '--duration', type=float, default=10.0)
+    parser.add_argument('--members', type=int, default=20, help='members per user')
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument(
+        '--weights', type=weights, default='member=4,message=4,existence=1,page=1',
+        help='relative weight of each operation, e.g. member=1,page=1')
+    parser.add_argument('--latency', type=float, default=0.0, help='server latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random server latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of 500s')
+    parser.add_argument('--reset-rate', type=float, default=0.0, help='fraction of dropped connections')
+    parser.add_argument('--ratelimit-rate', type=float, default=0.0, help='fraction of injected 429s')
+    parser.add_argument(
+        '--ratelimit-limit', type=int, default=None,
+        help='requests per route per second before a 429')
+    parser.add_argument('--retries', type=int, default=2, help='client retries for transient errors')
+    parser.add_argument(
+        '--hedge', type=float, default=None, metavar='PERCENTILE',
+        help='hedge GET requests slower than this latency percentile, e.g. 0.95')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    run(load(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import Callable
+from argparse import ArgumentParser
+from asyncio import new_event_loop
+from statistics import median
+from subprocess import run
+from timeit import Timer
+from pathlib import Path
+from typing import Any
+import platform
+import json
+import sys
+
+from pydantic import TypeAdapter, __version__ as pydantic_version
+from pydantic_core import to_json
+
+from plural.models import Member, Message
+from plural.types import Image, PydanticObjectId
+from plural.application import Application
+from plural.enums import Intents
+
+
+RESULTS = Path(__file__).resolve().parent / 'results'
+MEMBER_ID = '5eb7cf5a86d9755df3a6c593'
+IMAGE = bytes([1]) + bytes(range(16))
+
+MEMBER = {
+    'id': MEMBER_ID,
+    'name': 'benchmark member',
+    'avatar': IMAGE.hex(),
+    'proxy_tags': [
+        {'prefix': f'm{n}:', 'suffix': '', 'regex': False, 'case_sensitive': n % 2 == 0}
+        for n in range(15)
+    ],
+    'userproxy': {
+        'bot_id': 1234567890123456789,
+        'public_key': 'a' * 64,
+        'token': None,
+        'command': 'proxy',
+        'include_group_tag': True,
+        'attachment_count': 3,
+        'self_hosted': False,
+        'guilds': list(range(1_000_000_000_000_000_000, 1_000_000_000_000_005_000))
+    }
+}
+
+MESSAGE = {
+    'original_id': 1234567890123456789,
+    'proxy_id': 1234567890123456790,
+    'author_id': 123456789012345678,
+    'channel_id': 123456789012345679,
+    'reason': 'matched proxy tag m1:',
+    'timestamp': '2024-01-01T00:00:00.000000Z'
+}
+
+
+def build_cases() -> dict[str, Callable[[], Any]]:
+    member_json = json.dumps(MEMBER).encode()
+    message_json = json.dumps(MESSAGE).encode()
+    image = Image(IMAGE, PydanticObjectId(MEMBER_ID))
+    image_str = str(image)
+    image_adapter = TypeAdapter(Image)
+    image_json = image_adapter.dump_json(image)
+    object_id = MEMBER_ID
+    object_id_bytes = MEMBER_ID.encode()
+
+    def validate_invalid() -> None:
+        try:
+            PydanticObjectId.validate('not an object id', None)
+        except ValueError:
+            pass
+
+    loop = new_event_loop()
+    app = Application('token', Intents.MEMBERS_WRITE | Intents.MEMBERS_USERPROXY_TOKEN_WRITE)
+    member = Member._from_data(member_json, app)
+
+    async def request(route: Any, *, json: Any = None, **_: Any) -> None:  # noqa: ANN401
+        # everything up to the request body, without the network
+        to_json(json)
+
+    app._request = request  # type: ignore[method-assign]
+
+    def edit(**kwargs: Any) -> Callable[[], None]:  # noqa: ANN401
+        # a hundred edits per call, one event loop round trip is more than an edit
+        async def edits() -> None:
+            for _ in range(100):
+                await member.edit(**kwargs)
+
+        return lambda: loop.run_until_complete(edits())
+
+    return {
+        'member/parse_bytes': lambda: Member._from_data(member_json),
+        'member/parse_dict': lambda: Member.model_validate(MEMBER),
+        'member/dump_json': lambda: member.model_dump_json(),
+        'message/parse_bytes': lambda: Message._from_data(message_json),
+        'message/parse_dict': lambda: Message.model_validate(MESSAGE),
+        'image/bytes_roundtrip': lambda: bytes(Image(bytes(image), image._parent_id)),
+        'image/str_roundtrip': lambda: str(Image.validate(image_str, _NoInfo)),
+        'image/json_roundtrip': lambda: image_adapter.dump_json(image_adapter.validate_json(image_json)),
+        'object_id/str': lambda: PydanticObjectId.validate(object_id, None),
+        'object_id/bytes': lambda: PydanticObjectId.validate(object_id_bytes, None),
+        'object_id/invalid': validate_invalid,
+        'edit/all_missing_x100': edit(),
+        'edit/name_only_x100': edit(name='renamed'),
+        'edit/proxy_tags_x100': edit(proxy_tags=member.proxy_tags),
+        'edit/everything_x100': edit(
+            name='renamed', proxy_tags=member.proxy_tags, userproxy=member.userproxy),
+    }
+
+
+class _NoInfo:
+    '''Stands in for the validation info when calling a validator directly.'''
+    data: dict[str, Any] = {}
+    context: dict[str, Any] | None = None
+
+
+def measure(case: Callable[[], Any], repeat: int) -> list[float]:
+    timer = Timer(case)
+    number, _ = timer.autorange()
+
+    # microseconds per call
+    return [
+        total / number * 1e6
+        for total in timer.repeat(repeat, number)
+    ]
+
+
+def commit() -> str:
+    process = run(
+        ['git', 'rev-parse', '--short', 'HEAD'],
+        capture_output=True, text=True, cwd=Path(__file__).parent
+    )
+    return process.stdout.strip() or 'unknown'
+
+
+def main() -> int:
+    parser = ArgumentParser(description='Model and type hot path benchmarks.')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument(
+        '-k', '--filter', default='',
+        help='only run cases whose name contains this string')
+    parser.add_argument(
+        '--save', action='store_true',
+        help=f'store the results as {RESULTS.name}/<commit>.json')
+    parser.add_argument(
+        '--compare', metavar='COMMIT',
+        help='compare against the stored results of a commit')
+    parser.add_argument(
+        '--check', action='store_true',
+        help='with --compare, exit with an error if any case regressed past the threshold')
+    parser.add_argument(
+        '--threshold', type=float, default=1.25,
+        help='the slowdown ratio that counts as a regression (default 1.25)')
+    args = parser.parse_args()
+
+    baseline: dict[str, Any] = {}
+
+    if args.compare:
+        baseline = json.loads(
+            (RESULTS / f'{args.compare}.json').read_text())['results']
+
+    results = {}
+    regressed = False
+
+    for name, case in build_cases().items():
+        if args.filter not in name:
+            continue
+
+        samples = measure(case, args.repeat)
+        results[name] = {'median_us': median(samples), 'min_us': min(samples)}
+        line = f'{name:28} median {median(samples):10.2f} us  min {min(samples):10.2f} us'
+
+        if (previous := baseline.get(name)) is not None:
+            ratio = median(samples) / previous['median_us']
+            over = ratio > args.threshold
+            regressed |= over
+            line += f'  {ratio:5.2f}x{'  REGRESSED' if over else ''}'
+
+        print(line)
+
+    if args.save:
+        RESULTS.mkdir(exist_ok=True)
+        path = RESULTS / f'{commit()}.json'
+        path.write_text(json.dumps({
+            'commit': commit(),
+            'python': platform.python_version(),
+            'pydantic': pydantic_version,
+            'results': results
+        }, indent=2) + '\n')
+        print(f'saved {path}')
+
+    return 1 if args.check and regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
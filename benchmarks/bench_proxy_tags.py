@@ -0,0 +1,138 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from random import Random
+from re import fullmatch, IGNORECASE, DOTALL
+from timeit import timeit
+
+from plural.proxy import ProxyTagMatcher
+from plural.models import Member
+
+
+TAGS_PER_MEMBER = 15
+TOTAL_TAGS = 10_000
+REGEX_RATIO = 0.01
+
+
+def build_members(total_tags: int = TOTAL_TAGS, seed: int = 0) -> list[Member]:
+    random = Random(seed)
+    members = []
+
+    for index in range(-(-total_tags // TAGS_PER_MEMBER)):
+        tags = []
+
+        for tag_index in range(TAGS_PER_MEMBER):
+            n = index * TAGS_PER_MEMBER + tag_index
+
+            if random.random() < REGEX_RATIO:
+                tags.append({'prefix': rf'r{n}\d+:', 'regex': True})
+            elif n % 3 == 0:
+                tags.append({'prefix': f'[{n}', 'suffix': ']'})
+            elif n % 3 == 1:
+                tags.append({'suffix': f'-{n}', 'case_sensitive': True})
+            else:
+                tags.append({'prefix': f'M{n}:'})
+
+        members.append(Member.model_validate({
+            'id': f'{index:024x}',
+            'name': f'member {index}',
+            'proxy_tags': tags
+        }))
+
+    return members
+
+
+def naive_match(members: list[Member], content: str) -> tuple[Member, str] | None:
+    '''Check every tag in turn, the way matching worked without an index.'''
+    best = None
+    best_length = -1
+
+    for member in members:
+        for tag in member.proxy_tags:
+            if tag.regex:
+                match = fullmatch(
+                    f'(?:{tag.prefix})(.*)(?:{tag.suffix})',
+                    content,
+                    DOTALL if tag.case_sensitive else DOTALL | IGNORECASE)
+
+                if match is None:
+                    continue
+
+                stripped = match.group(1)
+            else:
+                prefix, suffix, text = tag.prefix, tag.suffix, content
+
+                if not tag.case_sensitive:
+                    prefix, suffix, text = prefix.casefold(), suffix.casefold(), text.casefold()
+
+                if (
+                    not text.startswith(prefix) or
+                    not text.endswith(suffix) or
+                    len(prefix) + len(suffix) > len(text)
+                ):
+                    continue
+
+                stripped = content[len(prefix):len(content) - len(suffix)]
+
+            if len(content) - len(stripped) > best_length:
+                best, best_length = (member, stripped), len(content) - len(stripped)
+
+    return best
+
+
+def main() -> None:
+    members = build_members()
+    messages = [
+        'm9998: hello there',
+        '[9999 bracketed]',
+        'suffixed message -9997',
+        'no proxy tag in this message at all',
+    ]
+
+    build = timeit(lambda: ProxyTagMatcher(members), number=3) / 3
+    matcher = ProxyTagMatcher(members)
+    print(f'{len(matcher)} tags, {len(members)} members')
+    print(f'build: {build * 1e3:.1f} ms')
+
+    for content in messages:
+        result = matcher.match(content)
+        expected = naive_match(members, content)
+        assert (
+            (result is None and expected is None) or
+            (result is not None and expected is not None and result.member is expected[0])
+        ), content
+
+        number = 1000
+        indexed = timeit(lambda: matcher.match(content), number=number) / number
+        naive = timeit(lambda: naive_match(members, content), number=10) / 10
+        print(
+            f'{content!r:40} indexed {indexed * 1e6:8.1f} us  '
+            f'naive {naive * 1e6:10.1f} us  ({naive / indexed:,.0f}x)')
+
+    member = members[len(members) // 2]
+    update = timeit(lambda: matcher.update(member), number=1000) / 1000
+    print(f'incremental update of one member: {update * 1e6:.1f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -9,10 +9,28 @@ A basic wrapper for the /plu/ral API.
 
 """
 
-from plural._version import get_version
-
 __title__ = 'plural_py'
 __author__ = 'tyrantlink'
 __license__ = 'MIT'
 __copyright__ = '2024-present tyrantlink'
-__version__ = get_version()
+__version__: str
+
+
+def __getattr__(name: str) -> str:
+    # resolved on first access so importing the package never runs git
+    if name != '__version__':
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    try:
+        from plural._build_version import __version__ as version
+    except ImportError:
+        from importlib.metadata import version as installed_version, PackageNotFoundError
+
+        try:
+            version = installed_version('plural.py')
+        except PackageNotFoundError:
+            from plural._version import get_version
+            version = get_version()
+
+    globals()['__version__'] = version
+    return version
@@ -27,31 +27,39 @@ BASE_VERSION = '0.1.0'
 
 
 def get_version() -> str:
-    from subprocess import PIPE, run
+    """
+    Compute the version from the commit history.
 
-    process = run(
-        'git log --pretty=oneline',
-        shell=True, stdout=PIPE, text=True
-    )
+    Used at build time to bake `plural._build_version`; only called at runtime
+    when running from a source checkout that was never built.
+    """
+    from subprocess import DEVNULL, PIPE, SubprocessError, run
+    from pathlib import Path
 
-    commits = {
-        commit.split(' ', 1)[0]: commit.split(' ', 1)[1]
-        for commit in reversed(process.stdout.splitlines())
-    }
+    try:
+        process = run(
+            ['git', 'log', '--reverse', '--pretty=%H %s'],
+            cwd=Path(__file__).parent,
+            stdout=PIPE, stderr=DEVNULL, text=True, check=True
+        )
+    except (OSError, SubprocessError):
+        # git isn't installed or this isn't a checkout
+        return BASE_VERSION
 
-    if START_COMMIT:
-        for commit in commits.copy():
-            del commits[commit]
+    commits = process.stdout.splitlines()
 
-            if commit == START_COMMIT:
+    if START_COMMIT:
+        for index, commit in enumerate(commits):
+            if commit.split(' ', 1)[0] == START_COMMIT:
+                commits = commits[index + 1:]
                 break
         else:
             raise ValueError('start commit not found')
 
     version = list(map(int, BASE_VERSION.split('.')))
 
-    for message in commits.values():
-        match message.strip().lower()[:6]:
+    for commit in commits:
+        match commit.partition(' ')[2].strip().lower()[:6]:
             case 'major;':
                 version = [version[0]+1, 0, 0]
             case 'minor;':
@@ -21,65 +21,278 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from typing import overload, Literal, Any
+from typing import overload, Literal, Any, Self
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine, Iterable, Mapping
+from asyncio import Future, Queue, Task, create_task, gather, get_running_loop, timeout, timeout_at, wait
+from weakref import WeakSet, WeakValueDictionary
 
-from aiohttp import ClientSession
+from pydantic_core import from_json
 
-from .http import request, Route
+from .http import HTTPClient, PoolConfig, RetryPolicy, Route, BASE_URL
+from .gateway import Gateway, Listener, GATEWAY_URL
+from .ratelimit import Bucket
+from .metrics import Metrics
+from .types import CDN_URL, Image
+from .cache import ModelCache, ImageCache, _event_keys
+from .errors import HTTPError, NotFound
+from .models.abc import EditableBase, EditResult, PluralModel, _adapter
 from .models import Message
 from .enums import Intents
+from .scheduler import FairScheduler
+from .waiters import MessageWaiters
+from .state import StateBackend
+from .registry import MemberRegistry
 from .user import User
 
 
-class Application:
-    __session: ClientSession | None = None
+BULK_MESSAGE_LIMIT = 100
+
 
-    def __init__(self, token: str, intents: Intents = Intents.NONE) -> None:
+class Application:
+    def __init__(
+        self,
+        token: str,
+        intents: Intents = Intents.NONE,
+        *,
+        base_url: str = BASE_URL,
+        pool: PoolConfig | None = None,
+        max_ratelimit_retries: int = 3,
+        cache: ModelCache | None = None,
+        gateway_url: str = GATEWAY_URL,
+        retain_raw: bool = False,
+        cdn_url: str = CDN_URL,
+        image_cache: ImageCache | None = None,
+        track_changes: bool = False,
+        metrics: Metrics | None = None,
+        retry: RetryPolicy | None = None,
+        scheduler: FairScheduler | None = None,
+        state: StateBackend | None = None
+    ) -> None:
         self.token = token
         self.intents = intents
+        self.cache = cache
+        self.image_cache = image_cache
+        '''The optional on-disk cache used by `Image.read` and `Image.save`.'''
+        self.retain_raw = retain_raw
+        '''Whether models keep the payload they were created from. Off by default to save memory.'''
+        self.track_changes = track_changes
+        '''Whether editable models record their state so `save` can send only the changed fields. Off by default, the snapshot costs about a third more memory per model.'''
+        self.http = HTTPClient(
+            headers={'Authorization': f'Bot {token}'},
+            base_url=base_url,
+            pool=pool,
+            max_ratelimit_retries=max_ratelimit_retries,
+            metrics=metrics,
+            retry=retry,
+            state=state
+        )
+        self.gateway = Gateway(self, url=gateway_url)
+        self.scheduler = scheduler
+        '''Shares out request capacity between the users of `as_user`, if set.'''
+        self.state = state
+        '''Shares rate limits and cached models with other processes, if set.'''
+        self._tasks: set[Task[None]] = set()
+        self.message_waiters = MessageWaiters()
+        '''Lookups waiting for messages to arrive as gateway events.'''
+        self._bulk_messages: bool | None = None
+
+        if metrics is not None:
+            if cache is not None:
+                metrics.register_caches(cache.stats)
+
+            if image_cache is not None:
+                metrics.register_caches({'images': image_cache.stats})
+
+            metrics.scheduler = scheduler
+
+        if scheduler is not None:
+            scheduler.ratelimiter = self.http.ratelimiter
+
+        if state is not None and cache is not None:
+            # values invalidated by other processes are dropped here too
+            state.on_invalidate(cache.invalidate)
+
+        self._users: WeakValueDictionary[int, User] = WeakValueDictionary()
+        # see `MemberRegistry.attach`
+        self._registries: WeakSet[MemberRegistry] = WeakSet()
+        # passed to model validation, see `Image`
+        self._context: dict[str, Any] = {
+            'cdn_url': cdn_url.rstrip('/'),
+            'application': self
+        }
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.close()
+
+    async def start(self, warm: int | None = None) -> None:
+        '''
+        Open the connection pool. Requests will open it automatically if this is not called.
+
+        :param warm: The number of connections to open ahead of time. Defaults to `PoolConfig.warm_connections`.
+        :type warm: `int` | `None`
+        '''
+        if self.state is not None:
+            await self.state.start()
+
+        await self.http.start(warm)
+
+    async def close(self) -> None:
+        '''Close the gateway connection, if any, the connection pool and the shared state.'''
+        await self.gateway.close()
+        await self.http.close()
+
+        if self.state is not None:
+            await self.state.close()
+
+    async def connect(self, reconnect: bool = True) -> None:
+        '''
+        Connect to the event gateway and dispatch events to listeners until `close` is called.
+
+        Requires at least one of the `*.events` intents.
+
+        :param reconnect: Whether to reconnect (and resume, when possible) after the connection drops. Defaults to `True`.
+        :type reconnect: `bool`
+        '''
+        await self.gateway.connect(reconnect)
+
+    def listen(self, event: str = '*') -> Callable[[Listener], Listener]:
+        '''
+        Decorator to register a coroutine as an event listener.
+
+        e.g. `@app.listen('member_update')`
+
+        :param event: The event name, or `*` for every event. Defaults to `*`.
+        :type event: `str`
+        '''
+        def decorator(listener: Listener) -> Listener:
+            self.gateway.add_listener(event, listener)
+            return listener
+
+        return decorator
 
     @property
-    async def _session(self) -> ClientSession:
-        if self.__session is None:
-            self.__session = ClientSession()
-        return self.__session
+    def cdn_url(self) -> str:
+        '''The base URL image URLs are built with. Only applies to models created after it is set.'''
+        return self._context['cdn_url']
+
+    @cdn_url.setter
+    def cdn_url(self, value: str) -> None:
+        self._context['cdn_url'] = value.rstrip('/')
+
+    @property
+    def metrics(self) -> Metrics | None:
+        '''The request metrics, if enabled with `Application(metrics=Metrics())`.'''
+        return self.http.metrics
+
+    @property
+    def ratelimits(self) -> Mapping[str, Bucket]:
+        '''The current rate limit buckets, keyed by bucket name.'''
+        return self.http.ratelimiter.buckets
 
     async def _request(
         self,
-        method: str,
         route: Route,
         *,
-        json: dict[str, Any] | None = None,
+        json: Any = None,  # noqa: ANN401
         headers: dict[str, str] | None = None,
         params: dict[str, str] | None = None,
-        files: dict[str, Any] | None = None
-    ) -> Any:
-        return await request(
-            method,
+        files: dict[str, Any] | None = None,
+        coalesce: bool = True,
+        deadline: float | None = None
+    ) -> bytes | None:
+        return await self.http.request(
             route,
             json=json,
-            headers={'Authorization': f'Bot {self.token}'} | (headers or {}),
+            headers=headers,
             params=params,
-            files=files
+            files=files,
+            coalesce=coalesce,
+            deadline=deadline
         )
 
+    async def _read_image(self, image: Image) -> memoryview:
+        def download() -> Awaitable[bytes]:
+            return self.http.download(image.url)
+
+        if self.image_cache is None:
+            return memoryview(await download())
+
+        return await self.image_cache.read(f'{image.hash}.{image.ext}', download)
+
+    @property
+    def message_events(self) -> bool:
+        '''Whether proxied messages are received as gateway events, so message lookups can wait for them instead of the API.'''
+        return bool(self.intents & Intents.MESSAGES_EVENTS) and self.gateway.connected
+
+    def _handle_event(
+        self,
+        event: str,
+        data: dict[str, Any],
+        model: PluralModel | None = None
+    ) -> None:
+        if self.cache is not None:
+            self.cache.handle_event(event, data)
+
+            if self.state is not None and (keys := _event_keys(event, data)) is not None:
+                self._background(self.state.invalidate(*keys))
+
+        for registry in self._registries:
+            registry.handle_event(event, data)
+
+        if isinstance(model, Message):
+            self.message_waiters.resolve(model)
+        elif event == 'message_delete':
+            self.message_waiters.forget(data.get('proxy_id'), data.get('original_id'))
+
+    def _background(self, coro: Coroutine[None, None, None]) -> None:
+        task = create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _shared_get(self, namespace: str, key: str) -> bytes | None:
+        # only consulted on a local cache miss
+        if self.state is None or self.cache is None:
+            return None
+
+        return await self.state.get(namespace, key)
+
+    def _shared_set(self, namespace: str, keys: Iterable[str], data: bytes | None) -> None:
+        if self.state is None or self.cache is None or data is None:
+            return
+
+        ttl = getattr(self.cache, namespace).ttl
+
+        for key in keys:
+            self._background(self.state.set(namespace, key, data, ttl))
+
     def as_user(self, user_id: int) -> User:
         '''
         Return a user object for the given user ID.
 
         Intended for sending requests on behalf of a user. e.g. `await app.as_user(123).fetch_member(abc)`
 
+        The same object is returned for a user for as long as it is referenced.
+
         :param user_id: The user ID to act as.
         :type user_id: `int`
         '''
-        return User(user_id=user_id, application=self)
+        if (user := self._users.get(user_id)) is None:
+            user = self._users[user_id] = User(user_id=user_id, application=self)
+
+        return user
 
     @overload
     async def fetch_message(
         self,
         message_id: int,
         existence_only: Literal[True],
-        max_wait: float = 10.0
+        max_wait: float = 10.0,
+        coalesce: bool = True,
+        use_cache: bool = True
     ) -> bool:
         ...
 
@@ -88,7 +301,9 @@ class Application:
         self,
         message_id: int,
         existence_only: Literal[False],
-        max_wait: float = 10.0
+        max_wait: float = 10.0,
+        coalesce: bool = True,
+        use_cache: bool = True
     ) -> Message:
         ...
 
@@ -96,16 +311,441 @@ class Application:
         self,
         message_id: int,
         existence_only: bool = False,
-        max_wait: float = 10.0
+        max_wait: float = 10.0,
+        coalesce: bool = True,
+        use_cache: bool = True
     ) -> Message | bool:
         '''
         Fetch a message by either original or proxied ID.
 
+        When the gateway is connected with the `MESSAGES_EVENTS` intent, a message
+        that has not been proxied yet is waited for as an event, after one check
+        that doesn't wait on the API. Otherwise the API holds the request for up to `max_wait`.
+
         :param message_id: The original or proxied message ID.
         :type message_id: `int`
         :param only_check_existence: Whether to only check if the message exists. If `True`, the return type will be `bool`.
         :type only_check_existence: `bool`
-        :param max_wait: The maximum time to wait for a response. Defaults to 10 seconds.
+        :param max_wait: The maximum time to wait for a response. Defaults to 10 seconds. Retries stop once it has passed, plus `RetryPolicy.deadline_margin`.
         :type max_wait: `float`
+        :param coalesce: Whether to share an identical request that is already in flight. Defaults to `True`.
+        :type coalesce: `bool`
+        :param use_cache: Whether to return the message from the application cache, if enabled. Defaults to `True`.
+        :type use_cache: `bool`
+
+        :raises NotFound: The message was not found within `max_wait`.
+        :raises TimeoutError: No response arrived in time. Existence checks return `False` instead.
+
         :return: `bool` if `only_check_existence` is `True`, otherwise `Message`.
         '''
+        if (
+            use_cache and
+            self.cache is not None and
+            (message := self.cache.get_message(message_id, self)) is not None
+        ):
+            return True if existence_only else message
+
+        if use_cache and (data := await self._shared_get('messages', str(message_id))) is not None:
+            message = Message._from_data(data, self)
+
+            if self.cache is not None:
+                self.cache.add_message(message)
+
+            return True if existence_only else message
+
+        if self.message_events:
+            return await self._wait_for_message(
+                message_id, existence_only, max_wait, coalesce)
+
+        return await self._fetch_message(
+            message_id, existence_only, max_wait, coalesce)
+
+    async def _fetch_message(
+        self,
+        message_id: int,
+        existence_only: bool,
+        max_wait: float,
+        coalesce: bool
+    ) -> Message | bool:
+        params = {'max_wait': str(max_wait)}
+
+        if existence_only:
+            params['only_check_existence'] = 'true'
+
+        try:
+            data = await self._request(
+                Route('GET', '/messages/{message_id}', message_id=message_id),
+                params=params,
+                coalesce=coalesce,
+                deadline=get_running_loop().time() + max_wait + self.http.retry.deadline_margin
+            )
+        except (NotFound, TimeoutError):
+            if existence_only:
+                return False
+            raise
+
+        if existence_only:
+            return bool(data and from_json(data))
+
+        assert data is not None
+        message = Message._from_data(data, self)
+
+        if self.cache is not None:
+            self.cache.add_message(message)
+
+        self._shared_set('messages', _message_keys(message), data)
+
+        return message
+
+    async def _wait_for_message(
+        self,
+        message_id: int,
+        existence_only: bool,
+        max_wait: float,
+        coalesce: bool
+    ) -> Message | bool:
+        waiter = self.message_waiters.wait(message_id)
+
+        try:
+            if not waiter.done():
+                # the message may have been proxied before the waiter was registered,
+                # one check without a server side wait covers that
+                try:
+                    if result := await self._fetch_message(
+                        message_id, existence_only, 0.0, coalesce
+                    ):
+                        return result
+                except NotFound:
+                    pass
+
+                try:
+                    async with timeout(max_wait):
+                        await waiter
+                except TimeoutError:
+                    if existence_only:
+                        return False
+
+                    raise NotFound('Message not found') from None
+
+            message = waiter.result()
+        finally:
+            waiter.cancel()
+
+        if self.cache is not None:
+            self.cache.add_message(message)
+
+        return True if existence_only else message
+
+    @overload
+    async def fetch_messages(
+        self,
+        message_ids: Iterable[int],
+        existence_only: Literal[True],
+        max_wait: float = 10.0,
+        concurrency: int = 16
+    ) -> dict[int, bool]:
+        ...
+
+    @overload
+    async def fetch_messages(
+        self,
+        message_ids: Iterable[int],
+        existence_only: Literal[False],
+        max_wait: float = 10.0,
+        concurrency: int = 16
+    ) -> dict[int, Message | None]:
+        ...
+
+    async def fetch_messages(
+        self,
+        message_ids: Iterable[int],
+        existence_only: bool = False,
+        max_wait: float = 10.0,
+        concurrency: int = 16
+    ) -> dict[int, Message | None] | dict[int, bool]:
+        '''
+        Fetch many messages by either original or proxied ID.
+
+        Uses the bulk endpoint when the API supports it, otherwise sends single requests with bounded concurrency.
+
+        :param message_ids: The original or proxied message IDs.
+        :type message_ids: `Iterable[int]`
+        :param existence_only: Whether to only check if the messages exist. If `True`, the values will be `bool`.
+        :type existence_only: `bool`
+        :param max_wait: The maximum time to wait for the whole batch. Defaults to 10 seconds.
+        :type max_wait: `float`
+        :param concurrency: The maximum number of single requests in flight at once. Defaults to 16.
+        :type concurrency: `int`
+        :return: A mapping of every requested ID to its `Message` (or `bool` if `existence_only` is `True`). Messages that were not found before the deadline are `None` (or `False`).
+        '''
+        return {
+            message_id: result
+            async for message_id, result in self.iter_message_lookups(
+                message_ids, existence_only, max_wait, concurrency)
+        }
+
+    async def iter_message_lookups(
+        self,
+        message_ids: Iterable[int],
+        existence_only: bool = False,
+        max_wait: float = 10.0,
+        concurrency: int = 16
+    ) -> AsyncIterator[tuple[int, Any]]:
+        '''
+        Fetch many messages by ID, yielding `(message_id, result)` pairs as they complete.
+        To list the messages of a user instead, see `User.iter_messages`.
+
+        Takes the same arguments as `fetch_messages`. Breaking out of the loop cancels any requests still in flight.
+        '''
+        ids = list(dict.fromkeys(message_ids))
+        deadline = get_running_loop().time() + max_wait
+
+        if self.cache is not None:
+            missing = []
+
+            for message_id in ids:
+                if (message := self.cache.get_message(message_id, self)) is None:
+                    missing.append(message_id)
+                    continue
+
+                yield message_id, True if existence_only else message
+
+            ids = missing
+
+        if ids and self._bulk_messages is not False:
+            try:
+                first = await self._fetch_messages_bulk(
+                    ids[:BULK_MESSAGE_LIMIT], existence_only, deadline)
+            except HTTPError as e:
+                if e.status_code not in {404, 405}:
+                    raise
+
+                # the api doesn't have a bulk endpoint, fall back to single requests
+                self._bulk_messages = False
+            else:
+                self._bulk_messages = True
+
+                for item in first.items():
+                    yield item
+
+                for index in range(BULK_MESSAGE_LIMIT, len(ids), BULK_MESSAGE_LIMIT):
+                    chunk = await self._fetch_messages_bulk(
+                        ids[index:index + BULK_MESSAGE_LIMIT], existence_only, deadline)
+
+                    for item in chunk.items():
+                        yield item
+
+                return
+
+        async for item in self._iter_message_lookups_single(
+            ids, existence_only, deadline, concurrency
+        ):
+            yield item
+
+    async def _fetch_messages_bulk(
+        self,
+        message_ids: list[int],
+        existence_only: bool,
+        deadline: float
+    ) -> dict[int, Any]:
+        default = False if existence_only else None
+        # with message events, messages proxied after the request are waited for as events
+        waiters = {
+            message_id: self.message_waiters.wait(message_id)
+            for message_id in message_ids
+        } if self.message_events else {}
+
+        try:
+            results = await self._request_messages_bulk(
+                message_ids, existence_only, deadline, bool(waiters))
+
+            if waiters:
+                await self._wait_for_messages(results, waiters, existence_only, deadline)
+        except TimeoutError:
+            return dict.fromkeys(message_ids, default)
+        finally:
+            for waiter in waiters.values():
+                waiter.cancel()
+
+        return results
+
+    async def _request_messages_bulk(
+        self,
+        message_ids: list[int],
+        existence_only: bool,
+        deadline: float,
+        events: bool
+    ) -> dict[int, Any]:
+        max_wait = 0.0 if events else max(0.0, deadline - get_running_loop().time())
+
+        async with timeout_at(deadline):
+            data = await self._request(
+                Route('POST', '/messages/bulk'),
+                json={
+                    'message_ids': message_ids,
+                    'only_check_existence': existence_only,
+                    'max_wait': max_wait
+                }
+            )
+
+        if existence_only:
+            found = _adapter(dict[int, bool | None]).validate_json(data or b'{}')
+
+            return {
+                message_id: bool(found.get(message_id))
+                for message_id in message_ids
+            }
+
+        messages: dict[int, Message | None]
+
+        if self.retain_raw:
+            # every message keeps its own payload, so the items have to be split first
+            messages = {
+                int(key): None if value is None else Message._from_data(value, self)
+                for key, value in from_json(data or b'{}').items()
+            }
+        else:
+            messages = _adapter(dict[int, Message | None]).validate_json(
+                data or b'{}', context=self._context)
+
+        results: dict[int, Any] = {}
+
+        for message_id in message_ids:
+            results[message_id] = message = messages.get(message_id)
+
+            if message is None:
+                continue
+
+            message._bind(self)
+
+            if self.cache is not None:
+                self.cache.add_message(message)
+
+        return results
+
+    async def _wait_for_messages(
+        self,
+        results: dict[int, Any],
+        waiters: dict[int, Future[Message]],
+        existence_only: bool,
+        deadline: float
+    ) -> None:
+        pending = {
+            waiters[message_id]
+            for message_id, result in results.items()
+            if not result
+        }
+
+        if pending:
+            await wait(pending, timeout=max(0.0, deadline - get_running_loop().time()))
+
+        for message_id, waiter in waiters.items():
+            if results[message_id] or not waiter.done() or waiter.cancelled():
+                continue
+
+            message = results[message_id] = waiter.result()
+
+            if self.cache is not None:
+                self.cache.add_message(message)
+
+            if existence_only:
+                results[message_id] = True
+
+    async def _iter_message_lookups_single(
+        self,
+        message_ids: list[int],
+        existence_only: bool,
+        deadline: float,
+        concurrency: int
+    ) -> AsyncIterator[tuple[int, Any]]:
+        default = False if existence_only else None
+        queue: Queue[tuple[int, Any, BaseException | None]] = Queue()
+        pending = iter(message_ids)
+
+        async def worker() -> None:
+            # every worker pulls from the same iterator, so at most `concurrency` requests are in flight
+            for message_id in pending:
+                result, error = default, None
+
+                try:
+                    async with timeout_at(deadline):
+                        result = await self.fetch_message(
+                            message_id,
+                            existence_only,  # type: ignore[arg-type]
+                            max_wait=max(0.0, deadline - get_running_loop().time())
+                        )
+                except (NotFound, TimeoutError):
+                    pass
+                except Exception as e:  # noqa: BLE001
+                    error = e
+
+                queue.put_nowait((message_id, result, error))
+
+        workers = [
+            create_task(worker())
+            for _ in range(min(concurrency, len(message_ids)))
+        ]
+
+        try:
+            for _ in range(len(message_ids)):
+                message_id, result, error = await queue.get()
+
+                if error is not None:
+                    raise error
+
+                yield message_id, result
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def bulk_edit(
+        self,
+        edits: Iterable[EditableBase | tuple[EditableBase, Mapping[str, Any]]],
+        concurrency: int = 8
+    ) -> list[EditResult]:
+        '''
+        Apply many edits with bounded concurrency.
+
+        e.g. `await app.bulk_edit([member_a, (member_b, {'name': 'bob'})])`
+
+        :param edits: Objects to `save` (which requires `track_changes`), or `(object, kwargs)` pairs to `edit` with the given arguments.
+        :type edits: `Iterable[EditableBase | tuple[EditableBase, Mapping[str, Any]]]`
+        :param concurrency: The maximum number of edits in flight at once. Defaults to 8.
+        :type concurrency: `int`
+
+        :return: A result for every edit, in the order they were given. An edit that raised does not stop the rest.
+        '''
+        items = list(edits)
+        results: list[EditResult | None] = [None] * len(items)
+        pending = iter(enumerate(items))
+
+        async def worker() -> None:
+            # every worker pulls from the same iterator, so at most `concurrency` edits are in flight
+            for index, item in pending:
+                model, kwargs = item if isinstance(item, tuple) else (item, None)
+
+                try:
+                    if kwargs is None:
+                        changed = await model.save()
+                    else:
+                        await model.edit(**kwargs)
+                        changed = bool(kwargs)
+                except Exception as e:  # noqa: BLE001
+                    results[index] = EditResult(model, False, e)
+                else:
+                    results[index] = EditResult(model, changed, None)
+
+        await gather(*(
+            worker()
+            for _ in range(min(concurrency, len(items)))
+        ))
+
+        return results  # type: ignore[return-value]
+
+
+def _message_keys(message: Message) -> list[str]:
+    return [
+        str(message_id)
+        for message_id in (message.proxy_id, message.original_id)
+        if message_id is not None
+    ]
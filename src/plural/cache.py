@@ -0,0 +1,432 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from typing import Any, Generic, TypeVar, TYPE_CHECKING
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from os import PathLike, fsync, replace, scandir, unlink, utime
+from asyncio import Lock, to_thread
+from mmap import mmap, ACCESS_READ
+from tempfile import mkstemp
+from collections import OrderedDict
+from time import monotonic
+from pathlib import Path
+
+from .types import PydanticObjectId
+
+
+if TYPE_CHECKING:
+    from .models import Member, Group, Message, CompactMessage
+    from .application import Application
+
+
+__all__ = (
+    'CacheStats',
+    'TTLCache',
+    'ModelCache',
+    'ImageCache',
+)
+
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class CacheStats:
+    __slots__ = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        '''Entries dropped because the cache was full.'''
+        self.expirations = 0
+        '''Entries dropped because their TTL passed.'''
+        self.invalidations = 0
+        '''Entries dropped by events or explicit invalidation.'''
+
+    def __repr__(self) -> str:
+        return (
+            f'<CacheStats hits={self.hits} misses={self.misses} '
+            f'hit_ratio={self.hit_ratio:.2%} evictions={self.evictions} '
+            f'expirations={self.expirations} invalidations={self.invalidations}>'
+        )
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TTLCache(Generic[K, V]):
+    '''
+    A size bounded cache with per-entry expiry.
+
+    Entries are kept in least recently used order; when the cache is full the
+    least recently used entry is evicted. Expired entries are dropped when
+    they are next looked up.
+    '''
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = 300.0) -> None:
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        entry = self._data.get(key)  # type: ignore[arg-type]
+        return entry is not None and entry[0] > monotonic()
+
+    def __repr__(self) -> str:
+        return f'<TTLCache size={len(self)}/{self.maxsize} ttl={self.ttl}>'
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        if entry[0] <= monotonic():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+
+        self._data[key] = (
+            monotonic() + ttl if ttl is not None else float('inf'),
+            value
+        )
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def pop(self, key: K) -> V | None:
+        entry = self._data.pop(key, None)
+
+        if entry is None:
+            return None
+
+        self.stats.invalidations += 1
+        return entry[1]
+
+    def clear(self) -> None:
+        self.stats.invalidations += len(self._data)
+        self._data.clear()
+
+
+class ModelCache:
+    '''
+    The optional model cache of an `Application`.
+
+    Members and groups are keyed by ID, messages by both their original and
+    proxied message ID. Entries are invalidated by the matching events when
+    the application has the `*_EVENTS` intents, and otherwise expire by TTL.
+    '''
+
+    def __init__(
+        self,
+        *,
+        max_members: int = 4096,
+        max_groups: int = 1024,
+        max_messages: int = 4096,
+        ttl: float | None = 300.0,
+        compact_messages: bool = False
+    ) -> None:
+        self.members: TTLCache[PydanticObjectId, 'Member'] = TTLCache(max_members, ttl)
+        self.groups: TTLCache[PydanticObjectId, 'Group'] = TTLCache(max_groups, ttl)
+        self.messages: TTLCache[int, 'Message | CompactMessage'] = TTLCache(max_messages, ttl)
+        self.compact_messages = compact_messages
+        '''Whether messages are stored as `CompactMessage` and expanded on lookup, trading a little CPU for memory.'''
+
+    def __repr__(self) -> str:
+        return (
+            f'<ModelCache members={len(self.members)} '
+            f'groups={len(self.groups)} messages={len(self.messages)}>'
+        )
+
+    @property
+    def stats(self) -> dict[str, CacheStats]:
+        return {
+            'members': self.members.stats,
+            'groups': self.groups.stats,
+            'messages': self.messages.stats
+        }
+
+    def add_message(self, message: 'Message') -> None:
+        entry = message.compact() if self.compact_messages else message
+        self.messages.set(message.proxy_id, entry)
+
+        if message.original_id is not None:
+            self.messages.set(message.original_id, entry)
+
+    def get_message(
+        self,
+        message_id: int,
+        application: 'Application | None' = None
+    ) -> 'Message | None':
+        if (entry := self.messages.get(message_id)) is None:
+            return None
+
+        if isinstance(entry, tuple):
+            message = entry.expand()
+            message._app = application
+            return message
+
+        return entry
+
+    def clear(self) -> None:
+        self.members.clear()
+        self.groups.clear()
+        self.messages.clear()
+
+    def handle_event(self, event: str, data: dict[str, Any]) -> None:
+        '''
+        Invalidate the entries affected by an event.
+
+        :param event: The event name. e.g. `member_update`
+        :type event: `str`
+        :param data: The event payload.
+        :type data: `dict[str, Any]`
+        '''
+        if (keys := _event_keys(event, data)) is not None:
+            self.invalidate(*keys)
+
+    def invalidate(self, namespace: str, keys: Iterable[str]) -> None:
+        '''
+        Invalidate entries by namespace and string key, as used by `StateBackend`.
+
+        Keys that aren't valid IDs are skipped, nothing can be cached under them.
+
+        :param namespace: `members`, `groups` or `messages`.
+        :type namespace: `str`
+        :param keys: The IDs, as strings.
+        :type keys: `Iterable[str]`
+        '''
+        match namespace:
+            case 'members':
+                for key in keys:
+                    if PydanticObjectId.is_valid(key):
+                        self.members.pop(PydanticObjectId(key))
+            case 'groups':
+                for key in keys:
+                    if PydanticObjectId.is_valid(key):
+                        self.groups.pop(PydanticObjectId(key))
+            case 'messages':
+                for key in keys:
+                    if key.isdecimal():
+                        self.messages.pop(int(key))
+
+
+def _event_keys(event: str, data: dict[str, Any]) -> tuple[str, list[str]] | None:
+    '''The cache namespace and keys an event invalidates, if any.'''
+    match event.split('_', 1)[0]:
+        case 'member' if 'id' in data:
+            return 'members', [str(data['id'])]
+        case 'group' if 'id' in data:
+            return 'groups', [str(data['id'])]
+        case 'message':
+            return 'messages', [
+                str(message_id)
+                for key in ('proxy_id', 'original_id')
+                if (message_id := data.get(key)) is not None
+            ]
+
+    # autoproxy changes don't touch any cached model
+    return None
+
+
+class ImageCache:
+    '''
+    An on-disk cache of image bytes, used by `Image.read` and `Image.save`.
+
+    Files are named by the image hash, which is a hash of the content, so an
+    entry never goes stale and is shared by every member with the same avatar.
+    The least recently used files are removed to keep the directory under
+    `max_size` bytes. Hits are memory-mapped rather than read.
+    '''
+
+    def __init__(
+        self,
+        directory: str | PathLike[str],
+        max_size: int = 256 * 1024 * 1024
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.size = 0
+        '''The total size of the cached files, in bytes.'''
+        self.stats = CacheStats()
+        self._index: OrderedDict[str, int] | None = None
+        self._writing: set[str] = set()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._index) if self._index is not None else 0
+
+    def __repr__(self) -> str:
+        return f'<ImageCache {self.directory} size={self.size}/{self.max_size}>'
+
+    async def read(
+        self,
+        name: str,
+        download: Callable[[], Awaitable[bytes]]
+    ) -> memoryview:
+        '''
+        Return the cached file, or download and store it.
+
+        :param name: The file name, e.g. `{hash}.{ext}`.
+        :type name: `str`
+        :param download: Called on a miss to fetch the file.
+        :type download: `Callable[[], Awaitable[bytes]]`
+
+        :return: A memory-mapped view of the file on a hit, otherwise a view of the downloaded bytes.
+        '''
+        index = await self._load()
+
+        if name in index:
+            if (view := await to_thread(self._map, name)) is not None:
+                index.move_to_end(name)
+                self.stats.hits += 1
+                return view
+
+            # removed from outside of the cache
+            self.size -= index.pop(name)
+
+        self.stats.misses += 1
+        data = await download()
+
+        # concurrent misses share the download, only the first stores it
+        if name not in index and name not in self._writing and len(data) <= self.max_size:
+            self._writing.add(name)
+
+            try:
+                await to_thread(self._write, name, data)
+            except OSError:
+                pass
+            else:
+                index[name] = len(data)
+                self.size += len(data)
+                await self._evict(index)
+            finally:
+                self._writing.discard(name)
+
+        return memoryview(data)
+
+    async def clear(self) -> None:
+        '''Remove every cached file.'''
+        index = await self._load()
+        names = list(index)
+        self.stats.invalidations += len(names)
+        index.clear()
+        self.size = 0
+        await to_thread(self._unlink, names)
+
+    async def _load(self) -> OrderedDict[str, int]:
+        if self._index is not None:
+            return self._index
+
+        async with self._lock:
+            if self._index is None:
+                files = await to_thread(self._scan)
+                self._index = OrderedDict(files)
+                self.size = sum(self._index.values())
+                await self._evict(self._index)
+
+        return self._index
+
+    async def _evict(self, index: OrderedDict[str, int]) -> None:
+        evicted = []
+
+        while self.size > self.max_size and index:
+            name, size = index.popitem(last=False)
+            self.size -= size
+            evicted.append(name)
+
+        if evicted:
+            self.stats.evictions += len(evicted)
+            await to_thread(self._unlink, evicted)
+
+    def _scan(self) -> list[tuple[str, int]]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        files = []
+
+        for entry in scandir(self.directory):
+            # temporary files start with a dot
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+
+        files.sort()
+
+        return [(name, size) for _, name, size in files]
+
+    def _map(self, name: str) -> memoryview | None:
+        path = self.directory / name
+
+        try:
+            with open(path, 'rb') as file:
+                view = memoryview(mmap(file.fileno(), 0, access=ACCESS_READ))
+
+            # the modification time is the recency when the directory is next scanned
+            utime(path)
+        except (OSError, ValueError):
+            # ValueError is raised for empty files, which can't be mapped
+            return None
+
+        return view
+
+    def _write(self, name: str, data: bytes) -> None:
+        fd, temp = mkstemp(dir=self.directory, prefix='.')
+
+        try:
+            with open(fd, 'wb') as file:
+                file.write(data)
+                fsync(file.fileno())
+
+            # readers only ever see a complete file
+            replace(temp, self.directory / name)
+        except BaseException:
+            unlink(temp)
+            raise
+
+    def _unlink(self, names: list[str]) -> None:
+        for name in names:
+            try:
+                unlink(self.directory / name)
+            except OSError:
+                pass
@@ -21,7 +21,7 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from enum import Enum, IntFlag
+from enum import Enum, IntEnum, IntFlag
 
 
 class Intents(IntFlag):
@@ -57,3 +57,14 @@ class ImageExtension(Enum):
             ImageExtension.GIF: 'image/gif',
             ImageExtension.WEBP: 'image/webp'
         }[self]
+
+
+class GatewayOpcode(IntEnum):
+    DISPATCH = 0
+    HEARTBEAT = 1
+    IDENTIFY = 2
+    RESUME = 6
+    RECONNECT = 7
+    INVALID_SESSION = 9
+    HELLO = 10
+    HEARTBEAT_ACK = 11
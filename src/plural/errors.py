@@ -50,3 +50,29 @@ class Forbidden(HTTPError):
 
 class NotFound(HTTPError):
     status_code = 404
+
+
+class RateLimited(HTTPError):
+    status_code = 429
+
+    def __init__(
+        self,
+        message: str,
+        retry_after: float,
+        bucket: str | None = None,
+        is_global: bool = False
+    ) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        '''The number of seconds to wait before retrying.'''
+        self.bucket = bucket
+        '''The rate limit bucket that was exhausted, if known.'''
+        self.is_global = is_global
+        '''Whether the global rate limit was hit.'''
+
+
+ERRORS: dict[int, type[HTTPError]] = {
+    error.status_code: error
+    for error in (BadRequest, Unauthorized, Forbidden, NotFound, RateLimited)
+}
+'''The error raised for each status code. Other error statuses raise `HTTPError`.'''
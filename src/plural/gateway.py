@@ -0,0 +1,397 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Queue, Task, CancelledError, create_task, sleep, wait_for
+from collections.abc import Awaitable, Callable
+from typing import Any, TYPE_CHECKING
+from random import random
+from time import monotonic
+from zlib import decompressobj
+import logging
+
+from aiohttp import ClientSession, ClientWebSocketResponse, ClientError, WSMsgType
+from pydantic import ValidationError
+from pydantic_core import from_json, to_json
+
+from .errors import MissingIntentError, Unauthorized
+from .models import Member, Group, Message
+from .models.abc import PluralModel
+from .enums import GatewayOpcode, Intents
+
+
+if TYPE_CHECKING:
+    from .application import Application
+
+
+__all__ = (
+    'GATEWAY_URL',
+    'GatewayEvent',
+    'Gateway',
+)
+
+
+GATEWAY_URL = 'wss://api.plural.gg/gateway'
+ZLIB_SUFFIX = b'\x00\x00\xff\xff'
+EVENT_INTENTS = (
+    Intents.MEMBERS_EVENTS |
+    Intents.GROUPS_EVENTS |
+    Intents.LATCH_EVENTS |
+    Intents.MESSAGES_EVENTS
+)
+EVENT_MODELS: dict[str, type[PluralModel]] = {
+    'member': Member,
+    'group': Group,
+    'message': Message
+}
+
+logger = logging.getLogger(__name__)
+
+Listener = Callable[['GatewayEvent'], Awaitable[None]]
+
+
+class GatewayEvent:
+    __slots__ = ('name', 'data', 'model')
+
+    def __init__(
+        self,
+        name: str,
+        data: dict[str, Any],
+        model: PluralModel | None
+    ) -> None:
+        self.name = name
+        '''The event name. e.g. `member_update`'''
+        self.data = data
+        '''The raw event payload.'''
+        self.model = model
+        '''The payload parsed into its model, if the event carries one.'''
+
+    def __repr__(self) -> str:
+        return f'<GatewayEvent {self.name}>'
+
+
+class _Reconnect(Exception):
+    def __init__(self, resume: bool) -> None:
+        self.resume = resume
+
+
+class Gateway:
+    '''
+    A persistent connection to the /plu/ral event gateway.
+
+    Events are parsed into `plural.models` and handed to listeners through
+    bounded queues. Events about the same object always go to the same queue
+    so they are handled in order; when a queue is full the gateway stops
+    reading until it drains, instead of buffering without limit.
+    '''
+
+    def __init__(
+        self,
+        application: 'Application',
+        *,
+        url: str = GATEWAY_URL,
+        compress: bool = True,
+        queue_size: int = 256,
+        workers: int = 4
+    ) -> None:
+        self.application = application
+        self.url = url
+        self.compress = compress
+        self.queue_size = queue_size
+        self.workers = workers
+        self.session_id: str | None = None
+        self.sequence: int | None = None
+        self.latency = float('inf')
+        '''The time between the last heartbeat and its acknowledgement, in seconds.'''
+        self._listeners: dict[str, list[Listener]] = {}
+        self._queues: list[Queue[GatewayEvent]] = []
+        self._tasks: list[Task[None]] = []
+        self._ws: ClientWebSocketResponse | None = None
+        self._session: ClientSession | None = None
+        self._closing = False
+        self._acked = True
+        self._last_heartbeat = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    @property
+    def queue_depths(self) -> list[int]:
+        '''The number of events waiting in each dispatch queue.'''
+        return [queue.qsize() for queue in self._queues]
+
+    def add_listener(self, event: str, listener: Listener) -> None:
+        '''
+        Register a coroutine to be called for an event.
+
+        :param event: The event name. e.g. `member_update`, or `*` for every event.
+        :type event: `str`
+        :param listener: The coroutine to call with the `GatewayEvent`.
+        :type listener: `Callable[[GatewayEvent], Awaitable[None]]`
+        '''
+        self._listeners.setdefault(event, []).append(listener)
+
+    def remove_listener(self, event: str, listener: Listener) -> None:
+        if listener in (listeners := self._listeners.get(event, [])):
+            listeners.remove(listener)
+
+    async def connect(self, reconnect: bool = True) -> None:
+        '''
+        Connect to the gateway and dispatch events until `close` is called.
+
+        :param reconnect: Whether to reconnect (and resume, when possible) after the connection drops. Defaults to `True`.
+        :type reconnect: `bool`
+
+        :raises MissingIntentError: The application does not have any `*_EVENTS` intents.
+        :raises Unauthorized: The gateway rejected the token.
+        '''
+        if not self.application.intents & EVENT_INTENTS:
+            raise MissingIntentError(
+                'The application requires at least one `*.events` intent to connect to the gateway')
+
+        self._closing = False
+        self._start_workers()
+
+        backoff = 1.0
+
+        try:
+            while not self._closing:
+                try:
+                    await self._run()
+                    backoff = 1.0
+                except _Reconnect as e:
+                    if not e.resume:
+                        self.session_id = self.sequence = None
+                    backoff = 1.0
+                except (ClientError, TimeoutError, ConnectionError) as e:
+                    logger.warning('gateway connection lost: %r', e)
+
+                if self._closing or not reconnect:
+                    break
+
+                await sleep(backoff * random())
+                backoff = min(backoff * 2, 60.0)
+        finally:
+            await self._stop_workers()
+
+    async def close(self) -> None:
+        '''Close the gateway connection.'''
+        self._closing = True
+
+        if self._ws is not None:
+            await self._ws.close()
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            # share the transport's connector so dns and tls setup are reused
+            self._session = ClientSession(
+                connector=self.application.http.session.connector,
+                connector_owner=False
+            )
+
+        return self._session
+
+    async def _run(self) -> None:
+        inflator = decompressobj() if self.compress else None
+        buffer = bytearray()
+
+        async with self._get_session().ws_connect(
+            self.url,
+            params={'compress': 'zlib-stream'} if self.compress else None,
+            autoping=True
+        ) as ws:
+            self._ws = ws
+            heartbeat: Task[None] | None = None
+
+            try:
+                async for message in ws:
+                    match message.type:
+                        case WSMsgType.BINARY:
+                            buffer.extend(message.data)
+
+                            if inflator is None:
+                                payload = from_json(buffer)
+                            elif buffer[-4:] != ZLIB_SUFFIX:
+                                # the payload is split across frames
+                                continue
+                            else:
+                                payload = from_json(inflator.decompress(buffer))
+
+                            buffer.clear()
+                        case WSMsgType.TEXT:
+                            payload = from_json(message.data)
+                        case WSMsgType.ERROR:
+                            raise ws.exception() or ConnectionError('gateway error')
+                        case _:
+                            break
+
+                    match payload.get('op'):
+                        case GatewayOpcode.HELLO:
+                            heartbeat = create_task(self._heartbeat(
+                                ws, payload['d']['heartbeat_interval'] / 1000))
+                            await self._identify(ws)
+                        case GatewayOpcode.HEARTBEAT:
+                            await self._send(ws, GatewayOpcode.HEARTBEAT, self.sequence)
+                        case GatewayOpcode.HEARTBEAT_ACK:
+                            self._acked = True
+                            self.latency = monotonic() - self._last_heartbeat
+                        case GatewayOpcode.RECONNECT:
+                            raise _Reconnect(resume=True)
+                        case GatewayOpcode.INVALID_SESSION:
+                            raise _Reconnect(resume=bool(payload.get('d')))
+                        case GatewayOpcode.DISPATCH:
+                            await self._dispatch(payload)
+            finally:
+                if heartbeat is not None:
+                    heartbeat.cancel()
+
+                self._ws = None
+
+            if ws.close_code in {4001, 4004}:
+                self._closing = True
+                raise Unauthorized('The gateway rejected the token')
+
+    async def _send(
+        self,
+        ws: ClientWebSocketResponse,
+        op: GatewayOpcode,
+        data: Any  # noqa: ANN401
+    ) -> None:
+        await ws.send_bytes(to_json({'op': op, 'd': data}))
+
+    async def _identify(self, ws: ClientWebSocketResponse) -> None:
+        if self.session_id is not None and self.sequence is not None:
+            await self._send(ws, GatewayOpcode.RESUME, {
+                'token': self.application.token,
+                'session_id': self.session_id,
+                'seq': self.sequence
+            })
+            return
+
+        await self._send(ws, GatewayOpcode.IDENTIFY, {
+            'token': self.application.token,
+            'intents': int(self.application.intents)
+        })
+
+    async def _heartbeat(
+        self,
+        ws: ClientWebSocketResponse,
+        interval: float
+    ) -> None:
+        self._acked = True
+        await sleep(interval * random())
+
+        while not ws.closed:
+            if not self._acked:
+                # no ack since the last heartbeat, the connection is dead
+                logger.warning('gateway heartbeat was not acknowledged, reconnecting')
+                await ws.close(code=4000)
+                return
+
+            self._acked = False
+            self._last_heartbeat = monotonic()
+            await self._send(ws, GatewayOpcode.HEARTBEAT, self.sequence)
+            await sleep(interval)
+
+    async def _dispatch(self, payload: dict[str, Any]) -> None:
+        if (sequence := payload.get('s')) is not None:
+            self.sequence = sequence
+
+        name = str(payload.get('t', '')).lower()
+        data = payload.get('d') or {}
+
+        if not isinstance(data, dict):
+            logger.warning('ignoring the %s event, its payload is not an object: %r', name, data)
+            return
+
+        match name:
+            case 'ready':
+                self.session_id = data.get('session_id')
+                return
+            case 'resumed':
+                return
+
+        model = None
+
+        if (
+            (model_type := EVENT_MODELS.get(name.split('_', 1)[0])) is not None and
+            not name.endswith('_delete')
+        ):
+            try:
+                model = model_type._from_data(data, self.application)
+            except ValidationError as e:
+                # partial or malformed payloads are still dispatched, only without a model
+                logger.warning('could not parse the %s payload: %s', name, e)
+
+        try:
+            # before queueing, so message lookups are not held up by slow listeners
+            self.application._handle_event(name, data, model)
+        except Exception:
+            logger.exception('error handling %s', name)
+
+        event = GatewayEvent(name, data, model)
+        key = data.get('id', data.get('proxy_id', name))
+
+        # blocks reading from the socket while the queue is full
+        await self._queues[hash(str(key)) % len(self._queues)].put(event)
+
+    def _start_workers(self) -> None:
+        if self._tasks:
+            return
+
+        self._queues = [Queue(self.queue_size) for _ in range(self.workers)]
+        self._tasks = [
+            create_task(self._worker(queue))
+            for queue in self._queues
+        ]
+
+    async def _stop_workers(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+        for task in self._tasks:
+            try:
+                await wait_for(task, 1.0)
+            except (CancelledError, TimeoutError):
+                pass
+
+        self._tasks.clear()
+
+    async def _worker(self, queue: Queue[GatewayEvent]) -> None:
+        while True:
+            event = await queue.get()
+
+            for listener in (
+                *self._listeners.get(event.name, ()),
+                *self._listeners.get('*', ())
+            ):
+                try:
+                    await listener(event)
+                except Exception:
+                    logger.exception('error in listener for %s', event.name)
+
+            queue.task_done()
@@ -21,25 +21,633 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from typing import Any
+from typing import Any, Self, TypeVar
+from collections.abc import Callable, Coroutine
+from ssl import SSLContext, create_default_context
+from asyncio import FIRST_COMPLETED, Task, create_task, gather, get_running_loop, shield, sleep, timeout_at, wait
+from collections import defaultdict
+from time import perf_counter
+from random import uniform
 
-from aiohttp import ClientSession
+from aiohttp import ClientConnectionError, ClientSession, ClientResponse, ClientTimeout, TCPConnector, FormData
+from pydantic import BaseModel, Field
+from pydantic_core import to_json
 
+from .errors import ERRORS, HTTPError, RateLimited
+from .ratelimit import RateLimiter
+from .state import StateBackend
+from .upload import ImageUpload
+from .metrics import Histogram, Metrics
+from .route import Route
 
-session = ClientSession()
 
+__all__ = (
+    'BASE_URL',
+    'Route',
+    'PoolConfig',
+    'RetryPolicy',
+    'HTTPClient',
+    'request',
+)
 
-class Route:
-    ...
+
+BASE_URL = 'https://api.plural.gg'
+
+T = TypeVar('T')
+
+
+class PoolConfig(BaseModel):
+    '''Connection pool settings for the HTTP transport.'''
+    limit: int = Field(100, ge=0)
+    '''The total number of simultaneous connections. `0` for no limit.'''
+    limit_per_host: int = Field(0, ge=0)
+    '''The number of simultaneous connections to a single host. `0` for no limit.'''
+    keepalive_timeout: float = Field(60.0, gt=0)
+    '''How long an idle connection is kept open for reuse, in seconds.'''
+    ttl_dns_cache: int | None = Field(300, ge=0)
+    '''How long resolved DNS entries are cached, in seconds. `None` to cache forever.'''
+    connect_timeout: float | None = Field(10.0, gt=0)
+    '''The timeout for establishing a new connection, in seconds.'''
+    total_timeout: float | None = Field(30.0, gt=0)
+    '''The timeout for an entire request, in seconds.'''
+    warm_connections: int = Field(0, ge=0)
+    '''The number of connections to open when the transport is started.'''
+
+
+class RetryPolicy(BaseModel):
+    '''
+    How requests are retried after transient failures, and hedged when slow.
+
+    Rate limits are handled separately, see `max_ratelimit_retries`.
+    '''
+    max_retries: int = Field(2, ge=0)
+    '''How many times to retry a request after a transient error.'''
+    backoff_base: float = Field(0.1, gt=0)
+    '''The backoff before the first retry, in seconds. It doubles with every retry.'''
+    backoff_max: float = Field(2.0, gt=0)
+    '''The longest backoff between retries, in seconds.'''
+    statuses: frozenset[int] = frozenset({500, 502, 503, 504})
+    '''Response statuses that are retried.'''
+    methods: frozenset[str] = frozenset({'GET', 'HEAD', 'PUT', 'DELETE'})
+    '''
+    The idempotent methods, which are safe to send again. Requests with other
+    methods are never retried. `PATCH` is left out, an edit that reached the API
+    before the connection dropped could otherwise be applied twice.
+    '''
+    deadline_margin: float = Field(1.0, ge=0)
+    '''How long past `max_wait` a message lookup may take for the response to arrive, in seconds.'''
+    hedge_percentile: float | None = Field(None, gt=0, lt=1)
+    '''
+    Send a second attempt of a `GET` once the first has taken longer than this
+    percentile of recent response times for the route, e.g. `0.95`. `None` to never hedge.
+    '''
+    hedge_min_samples: int = Field(50, ge=1)
+    '''How many responses a route needs before its requests are hedged.'''
+    hedge_budget: float = Field(0.05, ge=0, le=1)
+    '''The largest fraction of `GET` requests that may be hedged, so a slow API is not sent twice the load.'''
+
+    def is_transient(self, route: Route, error: Exception) -> bool:
+        '''Whether a failed request may be sent again.'''
+        if route.method not in self.methods:
+            return False
+
+        if isinstance(error, HTTPError):
+            return error.status_code in self.statuses
+
+        return isinstance(error, ClientConnectionError)
+
+    def backoff(self, retry: int) -> float:
+        '''The delay before the given retry, counting from `1`, with full jitter.'''
+        return uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
+
+
+_NO_RETRY = RetryPolicy(max_retries=0)
 
 
 async def request(
-    method: str,
+    session: ClientSession,
     route: Route,
     *,
-    json: dict[str, Any] | None = None,
+    json: Any = None,  # noqa: ANN401
     headers: dict[str, str] | None = None,
     params: dict[str, str] | None = None,
-    files: dict[str, Any] | None = None
-) -> Any:
-    ...
+    files: dict[str, Any] | None = None,
+    ratelimiter: RateLimiter | None = None,
+    max_ratelimit_retries: int = 3,
+    metrics: Metrics | None = None,
+    retry: RetryPolicy | None = None,
+    deadline: float | None = None
+) -> bytes | None:
+    '''
+    Send a request with the given session.
+
+    :param session: The session to send the request with.
+    :type session: `ClientSession`
+    :param route: The route to request.
+    :type route: `Route`
+    :param json: The JSON body. Models and sets are serialized by pydantic, `bytes` are sent as already serialized JSON.
+    :type json: `Any`
+    :param headers: Additional request headers.
+    :type headers: `dict[str, str]` | `None`
+    :param params: The query parameters.
+    :type params: `dict[str, str]` | `None`
+    :param files: Files to send as a multipart body, keyed by field name.
+    :type files: `dict[str, Any]` | `None`
+    :param ratelimiter: The rate limiter to schedule the request with, if any.
+    :type ratelimiter: `RateLimiter` | `None`
+    :param max_ratelimit_retries: How many times to retry after a 429 response.
+    :type max_ratelimit_retries: `int`
+    :param metrics: Where to record the request, if anywhere.
+    :type metrics: `Metrics` | `None`
+    :param retry: How to retry transient errors. Defaults to no retries.
+    :type retry: `RetryPolicy` | `None`
+    :param deadline: The event loop time the request, including every retry and rate limit wait, must finish by.
+    :type deadline: `float` | `None`
+
+    :raises RateLimited: The request was still rate limited after all retries, or the rate limit would outlast the deadline.
+    :raises HTTPError: The API responded with an error status.
+    :raises TimeoutError: The deadline passed.
+
+    :return: The raw response body, or `None` if the response has no body. JSON bodies are left undecoded so models can be validated from them directly.
+    '''
+    headers = {**headers} if headers else {}
+    retry = retry or _NO_RETRY
+    started = metrics.request_started(route) if metrics is not None else 0.0
+    status: int | None = None
+    error: BaseException | None = None
+    ratelimit_retries = transient_retries = 0
+    loop = get_running_loop()
+
+    try:
+        async with timeout_at(deadline):
+            while True:
+                data, size = _build_body(json, files, headers)
+
+                if metrics is not None:
+                    metrics.bytes_out[route.bucket] += size
+
+                if ratelimiter is not None:
+                    if metrics is not None:
+                        waited = perf_counter()
+                        bucket = await ratelimiter.acquire(route)
+                        metrics.ratelimit_wait[route.bucket] += perf_counter() - waited
+                    else:
+                        bucket = await ratelimiter.acquire(route)
+
+                try:
+                    async with session.request(
+                        route.method,
+                        route.path,
+                        data=data,
+                        headers=headers,
+                        params=params
+                    ) as response:
+                        status = response.status
+
+                        if ratelimiter is not None:
+                            ratelimiter.update(route, response.headers)
+
+                        if status != 429:
+                            body = await _handle_response(response)
+
+                            if metrics is not None and body is not None:
+                                metrics.bytes_in[route.bucket] += len(body)
+
+                            return body
+
+                        retry_after = float(response.headers.get('Retry-After', 1.0))
+                        is_global = response.headers.get('X-RateLimit-Global') == 'true'
+
+                        if ratelimiter is not None:
+                            ratelimiter.limited(route, retry_after, is_global)
+
+                        if (
+                            ratelimit_retries == max_ratelimit_retries or
+                            (deadline is not None and loop.time() + retry_after >= deadline)
+                        ):
+                            raise RateLimited(
+                                await response.text(),
+                                retry_after,
+                                bucket.key if ratelimiter is not None else None,
+                                is_global
+                            )
+                except (ClientConnectionError, HTTPError) as e:
+                    if (
+                        transient_retries == retry.max_retries or
+                        not retry.is_transient(route, e)
+                    ):
+                        raise
+
+                    transient_retries += 1
+                    delay = retry.backoff(transient_retries)
+
+                    if deadline is not None and loop.time() + delay >= deadline:
+                        raise
+
+                    if metrics is not None:
+                        metrics.transient_retries[route.bucket] += 1
+
+                    await sleep(delay)
+                    continue
+                finally:
+                    if ratelimiter is not None:
+                        bucket.release()
+
+                ratelimit_retries += 1
+
+                if metrics is not None:
+                    metrics.retries[route.bucket] += 1
+
+                if ratelimiter is None:
+                    if metrics is not None:
+                        metrics.ratelimit_wait[route.bucket] += retry_after
+
+                    await sleep(retry_after)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if metrics is not None:
+            metrics.request_ended(route, started, status, error)
+
+
+def _build_body(
+    json: Any,  # noqa: ANN401
+    files: dict[str, Any] | None,
+    headers: dict[str, str]
+) -> tuple[bytes | FormData | None, int]:
+    # the size is only used for metrics, multipart framing is not counted
+    if files:
+        data, size = FormData(), 0
+
+        if json is not None:
+            payload = json if isinstance(json, bytes) else to_json(json)
+            size += len(payload)
+            data.add_field(
+                'payload_json',
+                payload,
+                content_type='application/json')
+
+        for name, file in files.items():
+            if isinstance(file, ImageUpload):
+                size += file.size
+                data.add_field(
+                    name,
+                    file.open(),
+                    filename=file.filename,
+                    content_type=file.content_type)
+                continue
+
+            if isinstance(file, bytes | bytearray | memoryview):
+                size += len(file)
+
+            data.add_field(name, file)
+
+        return data, size
+
+    if json is not None:
+        headers['Content-Type'] = 'application/json'
+        payload = json if isinstance(json, bytes) else to_json(json)
+        return payload, len(payload)
+
+    return None, 0
+
+
+async def _handle_response(response: ClientResponse) -> bytes | None:
+    if response.status >= 400:
+        detail = await response.text()
+
+        error = ERRORS.get(response.status, HTTPError)(detail)
+        error.status_code = response.status
+        raise error
+
+    if response.status == 204 or response.content_length == 0:
+        return None
+
+    return await response.read() or None
+
+
+class HTTPClient:
+    '''
+    The pooled HTTP transport owned by an `Application`.
+
+    Connections are kept alive and reused between requests; call `start` to
+    open the pool ahead of time and `close` to release it.
+    '''
+
+    def __init__(
+        self,
+        *,
+        headers: dict[str, str] | None = None,
+        base_url: str = BASE_URL,
+        pool: PoolConfig | None = None,
+        max_ratelimit_retries: int = 3,
+        metrics: Metrics | None = None,
+        retry: RetryPolicy | None = None,
+        state: StateBackend | None = None
+    ) -> None:
+        self.base_url = base_url
+        self.max_ratelimit_retries = max_ratelimit_retries
+        self.headers = headers or {}
+        self.pool = pool or PoolConfig()
+        self.ratelimiter = RateLimiter(state)
+        self.metrics = metrics
+        self.retry = retry or RetryPolicy()
+        self._latency: defaultdict[str, Histogram] = defaultdict(Histogram)
+        '''Response times by route, used to decide when to hedge.'''
+        self._hedge_requests = 0
+        self._hedges = 0
+        self._inflight: dict[tuple[Any, ...], Task[Any]] = {}
+        self._waiters: dict[tuple[Any, ...], int] = {}
+        self._session: ClientSession | None = None
+        self._download_session: ClientSession | None = None
+        self._ssl: SSLContext | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.close()
+
+    def _create_session(self) -> ClientSession:
+        if self._ssl is None:
+            # one context for every connection so certificates are only loaded once,
+            # the handshake itself is avoided by keeping connections alive
+            self._ssl = create_default_context()
+
+        connector = TCPConnector(
+            limit=self.pool.limit,
+            limit_per_host=self.pool.limit_per_host,
+            keepalive_timeout=self.pool.keepalive_timeout,
+            ttl_dns_cache=self.pool.ttl_dns_cache,
+            ssl=self._ssl
+        )
+
+        return ClientSession(
+            self.base_url,
+            connector=connector,
+            headers=self.headers,
+            timeout=ClientTimeout(
+                total=self.pool.total_timeout,
+                connect=self.pool.connect_timeout
+            ),
+            raise_for_status=False
+        )
+
+    async def start(self, warm: int | None = None) -> None:
+        '''
+        Open the connection pool.
+
+        :param warm: The number of connections to open ahead of time. Defaults to `PoolConfig.warm_connections`.
+        :type warm: `int` | `None`
+        '''
+        if self.started:
+            return
+
+        self._session = self._create_session()
+
+        warm = self.pool.warm_connections if warm is None else warm
+
+        if warm:
+            await gather(
+                *(self._warm() for _ in range(warm)),
+                return_exceptions=True
+            )
+
+    async def _warm(self) -> None:
+        assert self._session is not None
+        async with self._session.head('/') as response:
+            await response.read()
+
+    async def close(self) -> None:
+        '''Close the connection pool.'''
+        if self._download_session is not None:
+            await self._download_session.close()
+            self._download_session = None
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+
+        return self._session
+
+    @property
+    def download_session(self) -> ClientSession:
+        '''A session for absolute URLs, without the API headers, that shares the connection pool.'''
+        session = self.session
+
+        if (
+            self._download_session is None or
+            self._download_session.closed or
+            self._download_session.connector is not session.connector
+        ):
+            self._download_session = ClientSession(
+                connector=session.connector,
+                connector_owner=False,
+                timeout=session.timeout,
+                raise_for_status=False
+            )
+
+        return self._download_session
+
+    async def request(
+        self,
+        route: Route,
+        *,
+        json: Any = None,  # noqa: ANN401
+        headers: dict[str, str] | None = None,
+        params: dict[str, str] | None = None,
+        files: dict[str, Any] | None = None,
+        coalesce: bool = True,
+        deadline: float | None = None
+    ) -> bytes | None:
+        '''
+        Send a request through the pool.
+
+        Identical concurrent `GET` requests (same route, parameters and headers,
+        and so the same acting user) share a single in-flight request. It is
+        sent with the deadline of the first caller, the deadline isn't part of
+        the key as lookups each compute their own and would never be shared.
+        Later callers stop waiting at their own deadline, but see the `TimeoutError`
+        of the shared request if the first caller's deadline is earlier.
+
+        Transient errors are retried according to `retry`, and slow `GET`
+        requests are hedged if `RetryPolicy.hedge_percentile` is set.
+
+        :param route: The route to request.
+        :type route: `Route`
+        :param json: The JSON body. Models and sets are serialized by pydantic, `bytes` are sent as already serialized JSON.
+        :type json: `Any`
+        :param headers: Additional request headers.
+        :type headers: `dict[str, str]` | `None`
+        :param params: The query parameters.
+        :type params: `dict[str, str]` | `None`
+        :param files: Files to send as a multipart body, keyed by field name.
+        :type files: `dict[str, Any]` | `None`
+        :param coalesce: Whether this request may share an identical in-flight `GET`. Defaults to `True`.
+        :type coalesce: `bool`
+        :param deadline: The event loop time the request, including retries, must finish by.
+        :type deadline: `float` | `None`
+
+        :raises TimeoutError: The deadline passed.
+        '''
+        if route.method != 'GET':
+            return await self._send(route, json, headers, params, files, deadline)
+
+        send = self._send if self.retry.hedge_percentile is None else self._hedged
+
+        if not coalesce:
+            return await send(route, json, headers, params, files, deadline)
+
+        key = (
+            route.path,
+            tuple(sorted(params.items())) if params else (),
+            tuple(sorted(headers.items())) if headers else ()
+        )
+
+        return await self._shared(
+            key, lambda: send(route, json, headers, params, files, deadline), deadline)
+
+    async def download(self, url: str) -> bytes:
+        '''
+        Download a file from an absolute URL, such as an image on the CDN.
+
+        The API token is not sent, and identical concurrent downloads share a single request.
+
+        :param url: The URL to download.
+        :type url: `str`
+
+        :raises HTTPError: The server responded with an error status.
+
+        :return: The response body.
+        '''
+        return await self._shared(('download', url), lambda: self._download(url))
+
+    async def _shared(
+        self,
+        key: tuple[Any, ...],
+        send: Callable[[], Coroutine[Any, Any, T]],
+        deadline: float | None = None
+    ) -> T:
+        if (task := self._inflight.get(key)) is None:
+            task = self._inflight[key] = create_task(send())
+            task.add_done_callback(lambda task: self._shared_done(key, task))
+        elif self.metrics is not None:
+            self.metrics.coalesced += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+
+        try:
+            # the request is shared, so one caller being cancelled must not cancel it for the rest
+            async with timeout_at(deadline):
+                return await shield(task)
+        finally:
+            if waiters := self._waiters.pop(key) - 1:
+                self._waiters[key] = waiters
+            elif not task.done():
+                # nobody is waiting on the request anymore
+                task.cancel()
+
+    def _shared_done(self, key: tuple[Any, ...], task: Task[Any]) -> None:
+        self._inflight.pop(key, None)
+
+        if not task.cancelled():
+            # every caller may have stopped waiting, mark the exception as retrieved
+            task.exception()
+
+    async def _download(self, url: str) -> bytes:
+        async with self.download_session.get(url) as response:
+            return await _handle_response(response) or b''
+
+    async def _send(
+        self,
+        route: Route,
+        json: Any,  # noqa: ANN401
+        headers: dict[str, str] | None,
+        params: dict[str, str] | None,
+        files: dict[str, Any] | None,
+        deadline: float | None
+    ) -> bytes | None:
+        started = perf_counter()
+        data = await request(
+            self.session,
+            route,
+            json=json,
+            headers=headers,
+            params=params,
+            files=files,
+            ratelimiter=self.ratelimiter,
+            max_ratelimit_retries=self.max_ratelimit_retries,
+            metrics=self.metrics,
+            retry=self.retry,
+            deadline=deadline
+        )
+
+        if self.retry.hedge_percentile is not None:
+            self._latency[route.bucket].observe(perf_counter() - started)
+
+        return data
+
+    async def _hedged(
+        self,
+        route: Route,
+        json: Any,  # noqa: ANN401
+        headers: dict[str, str] | None,
+        params: dict[str, str] | None,
+        files: dict[str, Any] | None,
+        deadline: float | None
+    ) -> bytes | None:
+        policy = self.retry
+        assert policy.hedge_percentile is not None
+        histogram = self._latency.get(route.bucket)
+        self._hedge_requests += 1
+
+        if (
+            histogram is None or
+            histogram.count < policy.hedge_min_samples or
+            self._hedges >= self._hedge_requests * policy.hedge_budget
+        ):
+            return await self._send(route, json, headers, params, files, deadline)
+
+        first = create_task(self._send(route, json, headers, params, files, deadline))
+        tasks = {first}
+
+        try:
+            done, _ = await wait(tasks, timeout=histogram.quantile(policy.hedge_percentile))
+
+            if done:
+                return first.result()
+
+            self._hedges += 1
+
+            if self.metrics is not None:
+                self.metrics.hedges[route.bucket] += 1
+
+            tasks.add(create_task(self._send(route, json, headers, params, files, deadline)))
+            error: BaseException | None = None
+
+            # the first attempt to succeed wins, an error is only raised if both fail
+            while tasks:
+                done, tasks = await wait(tasks, return_when=FIRST_COMPLETED)
+
+                for task in done:
+                    if (exception := task.exception()) is None:
+                        return task.result()
+
+                    error = error or exception
+
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,297 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import Callable, Iterable, Mapping
+from collections import defaultdict
+from time import perf_counter
+from bisect import bisect_left
+from typing import TYPE_CHECKING
+
+from .errors import ERRORS, HTTPError
+
+
+if TYPE_CHECKING:
+    from .scheduler import FairScheduler
+    from .cache import CacheStats
+    from .route import Route
+
+
+__all__ = (
+    'LATENCY_BUCKETS',
+    'Histogram',
+    'Metrics',
+)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+'''The default histogram bucket bounds, in seconds.'''
+
+StartHook = Callable[['Route'], None]
+EndHook = Callable[['Route', int | None, float, BaseException | None], None]
+
+
+class Histogram:
+    '''A cumulative histogram with fixed bucket bounds, in the Prometheus style.'''
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Iterable[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(sorted(bounds))
+        self.counts = [0] * (len(self.bounds) + 1)
+        '''The count of each bucket, the last is every value above the largest bound. Not cumulative.'''
+        self.sum = 0.0
+        self.count = 0
+
+    def __repr__(self) -> str:
+        return f'<Histogram count={self.count} sum={self.sum:.3f}>'
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        '''Estimate a quantile from the bucket bounds, e.g. `0.99`. Values above the largest bound are reported as that bound.'''
+        if not self.count:
+            return 0.0
+
+        rank, seen = q * self.count, 0
+
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+
+            if seen >= rank:
+                return bound
+
+        return self.bounds[-1]
+
+
+class Metrics:
+    '''
+    Request instrumentation for an `Application`.
+
+    Pass an instance as `Application(metrics=...)`. Without one, requests
+    only pay for an `is None` check. Everything is keyed by the route
+    template (`Route.bucket`, e.g. `GET /members/{member_id}`) so the number
+    of series stays bounded.
+
+    Hooks are called synchronously on the event loop and should be quick.
+    '''
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.latency: defaultdict[str, Histogram] = defaultdict(
+            lambda: Histogram(self.buckets))
+        '''Request duration by route, including rate limit waits and retries.'''
+        self.statuses: defaultdict[tuple[str, int], int] = defaultdict(int)
+        '''Response counts by route and status code.'''
+        self.errors: defaultdict[tuple[str, str], int] = defaultdict(int)
+        '''Failed request counts by route and error type, e.g. `NotFound`.'''
+        self.bytes_in: defaultdict[str, int] = defaultdict(int)
+        '''Response body bytes by route.'''
+        self.bytes_out: defaultdict[str, int] = defaultdict(int)
+        '''Request body bytes by route. Multipart bodies only count the JSON payload and files.'''
+        self.retries: defaultdict[str, int] = defaultdict(int)
+        '''Rate limited attempts that were retried, by route.'''
+        self.transient_retries: defaultdict[str, int] = defaultdict(int)
+        '''Attempts that failed with a transient error and were retried, by route.'''
+        self.hedges: defaultdict[str, int] = defaultdict(int)
+        '''Second attempts sent because the first was slow, by route.'''
+        self.ratelimit_wait: defaultdict[str, float] = defaultdict(float)
+        '''Seconds spent waiting for rate limits, by route.'''
+        self.coalesced = 0
+        '''Requests that were served by an identical request already in flight.'''
+        self.in_flight = 0
+        self.caches: dict[str, 'CacheStats'] = {}
+        '''Cache statistics included in the export, by cache name.'''
+        self.scheduler: 'FairScheduler | None' = None
+        '''The user request scheduler included in the export, if any.'''
+        self._start_hooks: list[StartHook] = []
+        self._end_hooks: list[EndHook] = []
+
+    def __repr__(self) -> str:
+        return f'<Metrics routes={len(self.latency)} in_flight={self.in_flight}>'
+
+    def on_start(self, hook: StartHook) -> StartHook:
+        '''
+        Register a hook called with the route when a request starts.
+
+        Can be used as a decorator.
+        '''
+        self._start_hooks.append(hook)
+        return hook
+
+    def on_end(self, hook: EndHook) -> EndHook:
+        '''
+        Register a hook called with the route, status code, duration in seconds
+        and error (if any) when a request ends. The status is `None` if no
+        response was received.
+
+        Can be used as a decorator.
+        '''
+        self._end_hooks.append(hook)
+        return hook
+
+    def request_started(self, route: 'Route') -> float:
+        self.in_flight += 1
+
+        for hook in self._start_hooks:
+            hook(route)
+
+        return perf_counter()
+
+    def request_ended(
+        self,
+        route: 'Route',
+        started: float,
+        status: int | None,
+        error: BaseException | None
+    ) -> None:
+        elapsed = perf_counter() - started
+        self.in_flight -= 1
+        self.latency[route.bucket].observe(elapsed)
+
+        if status is not None:
+            self.statuses[route.bucket, status] += 1
+
+        if error is not None:
+            self.errors[route.bucket, type(error).__name__] += 1
+
+        for hook in self._end_hooks:
+            hook(route, status, elapsed, error)
+
+    def reset(self) -> None:
+        '''Clear every recorded value. Hooks and caches are kept.'''
+        for values in (
+            self.latency, self.statuses, self.errors, self.bytes_in,
+            self.bytes_out, self.retries, self.transient_retries,
+            self.hedges, self.ratelimit_wait
+        ):
+            values.clear()
+
+        self.coalesced = 0
+
+    def prometheus(self, prefix: str = 'plural') -> str:
+        '''
+        Export the metrics in the Prometheus text format.
+
+        :param prefix: The metric name prefix. Defaults to `plural`.
+        :type prefix: `str`
+        '''
+        lines: list[str] = []
+
+        def header(name: str, kind: str, description: str) -> str:
+            name = f'{prefix}_{name}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            return name
+
+        name = header(
+            'request_duration_seconds', 'histogram',
+            'API request duration, including rate limit waits and retries.')
+
+        for route, histogram in sorted(self.latency.items()):
+            label = f'route="{_escape(route)}"'
+            cumulative = 0
+
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+
+            lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+        name = header(
+            'responses_total', 'counter',
+            'API responses by status code, and the error raised for error statuses.')
+        lines.extend(
+            f'{name}{{route="{_escape(route)}",status="{status}",error="{_status_error(status)}"}} {count}'
+            for (route, status), count in sorted(self.statuses.items())
+        )
+
+        name = header('request_errors_total', 'counter', 'Failed API requests by error type.')
+        lines.extend(
+            f'{name}{{route="{_escape(route)}",error="{_escape(error)}"}} {count}'
+            for (route, error), count in sorted(self.errors.items())
+        )
+
+        for key, values, description in (
+            ('response_bytes_total', self.bytes_in, 'Response body bytes received.'),
+            ('request_bytes_total', self.bytes_out, 'Request body bytes sent.'),
+            ('ratelimit_retries_total', self.retries, 'Rate limited attempts that were retried.'),
+            ('transient_retries_total', self.transient_retries, 'Attempts retried after a transient error.'),
+            ('hedged_requests_total', self.hedges, 'Second attempts sent because the first was slow.'),
+            ('ratelimit_wait_seconds_total', self.ratelimit_wait, 'Time spent waiting for rate limits.')
+        ):
+            name = header(key, 'counter', description)
+            lines.extend(
+                f'{name}{{route="{_escape(route)}"}} {value}'
+                for route, value in sorted(values.items())
+            )
+
+        name = header(
+            'coalesced_requests_total', 'counter',
+            'Requests served by an identical request already in flight.')
+        lines.append(f'{name} {self.coalesced}')
+
+        name = header('requests_in_flight', 'gauge', 'API requests in flight.')
+        lines.append(f'{name} {self.in_flight}')
+
+        for key, attribute, description in (
+            ('cache_hits_total', 'hits', 'Cache lookups that were hits.'),
+            ('cache_misses_total', 'misses', 'Cache lookups that were misses.'),
+            ('cache_evictions_total', 'evictions', 'Cache entries dropped because the cache was full.')
+        ):
+            name = header(key, 'counter', description)
+            lines.extend(
+                f'{name}{{cache="{_escape(cache)}"}} {getattr(stats, attribute)}'
+                for cache, stats in sorted(self.caches.items())
+            )
+
+        if (scheduler := self.scheduler) is not None:
+            # totals only, a series per user would grow without bound
+            for key, kind, value, description in (
+                ('scheduler_queue_depth', 'gauge', scheduler.depth, 'User requests waiting to be admitted.'),
+                ('scheduler_in_flight', 'gauge', scheduler.in_flight, 'User requests admitted and in flight.'),
+                ('scheduler_requests_total', 'counter', scheduler.requests, 'User requests admitted.'),
+                ('scheduler_wait_seconds_total', 'counter', scheduler.wait_time, 'Time user requests spent queued.')
+            ):
+                name = header(key, kind, description)
+                lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def register_caches(self, caches: Mapping[str, 'CacheStats']) -> None:
+        '''Include the given cache statistics in the export.'''
+        self.caches.update(caches)
+
+
+def _status_error(status: int) -> str:
+    if status < 400:
+        return ''
+
+    return ERRORS.get(status, HTTPError).__name__
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
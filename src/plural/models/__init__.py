@@ -8,8 +8,39 @@ Data models for the /plu/ral API.
 :license: MIT, see LICENSE for more details.
 
 """
-from .autoproxy import *
-from .config import *
-from .group import *
-from .member import *
-from .message import *
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .autoproxy import *
+    from .config import *
+    from .group import *
+    from .member import *
+    from .message import *
+
+
+# models are imported on first access, so importing one doesn't build them all
+_MODELS = {
+    'Group': 'group',
+    'ProxyTag': 'member',
+    'CompactProxyTag': 'member',
+    'UserProxy': 'member',
+    'Member': 'member',
+    'Message': 'message',
+    'CompactMessage': 'message',
+}
+
+__all__ = tuple(_MODELS)
+
+
+def __getattr__(name: str) -> object:
+    if (module := _MODELS.get(name)) is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return [*globals(), *_MODELS]
@@ -21,24 +21,51 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from typing import Any, TYPE_CHECKING
+from typing import Any, NamedTuple, Self, TypedDict, TYPE_CHECKING
 from abc import ABC, abstractmethod
+from functools import cache
+from inspect import signature
 
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import from_json
+
+from ..types import MISSING
 
 
 if TYPE_CHECKING:
     from ..application import Application
+    from ..user import User
 
 
 __all__ = (
     'PluralModel',
     'EditableBase',
+    'EditResult',
 )
 
 
+@cache
+def _adapter(type_: Any) -> TypeAdapter[Any]:  # noqa: ANN401
+    # building a TypeAdapter compiles a new validator, so each type is only built once
+    return TypeAdapter(type_)
+
+
+@cache
+def _edit_adapter(cls: type['PluralModel']) -> TypeAdapter[Any]:
+    # the body of an edit holds the parameters of `edit` that are also model fields,
+    # typed as those fields so nested models and sets are serialized by pydantic-core too
+    fields = {
+        name: cls.model_fields[name].annotation
+        for name in signature(cls.edit).parameters  # type: ignore[attr-defined]
+        if name in cls.model_fields
+    }
+
+    return TypeAdapter(TypedDict(f'{cls.__name__}Edit', fields, total=False))  # type: ignore[operator]
+
+
 class PluralClientState:
-    _app: Application | None = None
+    _app: 'Application | None' = None
+    _user: 'User | None' = None
 
 
 class PluralModel(BaseModel, PluralClientState):
@@ -46,14 +73,172 @@ class PluralModel(BaseModel, PluralClientState):
         json_encoders = {
             set: list
         }
+        # validators are built on first use instead of at import
+        defer_build = True
+
+    @classmethod
+    def _from_data(
+        cls,
+        data: bytes | dict[str, Any],
+        application: 'Application | None' = None,
+        user: 'User | None' = None,
+        retain_raw: bool | None = None
+    ) -> Self:
+        """
+        Validate an API payload and attach the client state.
+
+        Response bodies should be passed as `bytes`, they are validated directly
+        without building an intermediate `dict`.
+
+        The payload is only kept (see `_raw`) when `retain_raw` is `True`, or when
+        it is `None` and the application was created with `retain_raw=True`.
+        Nested models never keep their own copy.
+        """
+        context = _context(application)
+        model = (
+            cls.model_validate_json(data, context=context)
+            if isinstance(data, bytes) else
+            cls.model_validate(data, context=context)
+        )
+
+        model._bind(application, user, data, retain_raw)
+
+        return model
+
+    @classmethod
+    def _list_from_data(
+        cls,
+        data: bytes | list[dict[str, Any]],
+        application: 'Application | None' = None,
+        user: 'User | None' = None,
+        retain_raw: bool | None = None
+    ) -> list[Self]:
+        """Validate an API payload that is a list of this model. See `_from_data`."""
+        if _retain_raw(application, retain_raw):
+            # every model keeps its own payload, so the items have to be split first
+            if isinstance(data, bytes):
+                data = from_json(data)
+
+            return [
+                cls._from_data(item, application, user, True)
+                for item in data
+            ]
+
+        adapter = _adapter(list[cls])  # type: ignore[valid-type]
+        context = _context(application)
+        models: list[Self] = (
+            adapter.validate_json(data, context=context)
+            if isinstance(data, bytes) else
+            adapter.validate_python(data, context=context)
+        )
+
+        for model in models:
+            model._bind(application, user)
 
-    def __init__(self, **data) -> None:
-        super().__init__(**data)
-        self.__raw_data = data.copy()
+        return models
+
+    def _bind(
+        self,
+        application: 'Application | None',
+        user: 'User | None' = None,
+        data: bytes | dict[str, Any] | None = None,
+        retain_raw: bool | None = None
+    ) -> None:
+        self._app = application
+        self._user = user
+
+        if data is not None and _retain_raw(application, retain_raw):
+            self.__raw_data = data
+
+        if (
+            isinstance(self, EditableBase) and
+            application is not None and
+            application.track_changes
+        ):
+            self._snapshot()
 
     @property
-    def _raw(self) -> dict[str, Any]:
-        return self.__raw_data
+    def _raw(self) -> dict[str, Any] | None:
+        """The payload this model was created from, if it was retained."""
+        raw = self.__dict__.get('_PluralModel__raw_data')
+
+        if isinstance(raw, bytes):
+            # response bodies are kept as-is and only decoded when asked for
+            raw = self.__raw_data = from_json(raw)
+
+        return raw
+
+    def _update(self, other: 'PluralModel') -> None:
+        """Update this model in place from a newer copy of itself."""
+        for field in type(self).model_fields:
+            setattr(self, field, getattr(other, field))
+
+        if (raw := other.__dict__.get('_PluralModel__raw_data')) is not None:
+            self.__raw_data = raw
+        else:
+            self.__dict__.pop('_PluralModel__raw_data', None)
+
+        if '_PluralModel__snapshot' in self.__dict__:
+            self._snapshot()
+
+    def _snapshot(self) -> None:
+        """Record the current field values as the state known to the API. See `_changes`."""
+        self.__snapshot = _freeze(self)
+
+    def _changes(self) -> dict[str, Any]:
+        """The fields that were changed since the model was fetched or last saved."""
+        snapshot = self.__dict__.get('_PluralModel__snapshot')
+
+        if snapshot is None:
+            raise ValueError(
+                'Changes are only tracked for objects created by an application with `track_changes` enabled')
+
+        # the first item is the model type
+        return {
+            field: getattr(self, field)
+            for field, known in zip(type(self).__pydantic_fields__, snapshot[1:])
+            if _freeze(getattr(self, field)) != known
+        }
+
+
+_IMMUTABLE = frozenset({str, int, float, bool, bytes, type(None)})
+
+
+def _freeze(value: Any) -> Any:  # noqa: ANN401
+    # an immutable copy, so changes made in place (e.g. to a list of proxy tags) are still seen
+    cls = type(value)
+
+    if cls in _IMMUTABLE:
+        return value
+
+    if cls is list or cls is tuple:
+        return tuple([_freeze(item) for item in value])
+
+    if cls is set or cls is frozenset:
+        return frozenset([_freeze(item) for item in value])
+
+    if cls is dict:
+        return tuple([(key, _freeze(item)) for key, item in value.items()])
+
+    # checked by attribute, isinstance is slow for pydantic models
+    if (fields := getattr(cls, '__pydantic_fields__', None)) is not None:
+        return (cls, *[_freeze(getattr(value, field)) for field in fields])
+
+    return value
+
+
+def _context(application: 'Application | None') -> dict[str, Any] | None:
+    return application._context if application is not None else None
+
+
+def _retain_raw(
+    application: 'Application | None',
+    retain_raw: bool | None
+) -> bool:
+    if retain_raw is None:
+        return application is not None and application.retain_raw
+
+    return retain_raw
 
 
 class EditableBase(ABC):
@@ -61,3 +246,62 @@ class EditableBase(ABC):
     async def edit(self) -> None:
         """Edit the object. This docstring should be overridden."""
         pass
+
+    async def save(self) -> bool:
+        """
+        Send the fields that were changed since the object was fetched or last saved.
+
+        e.g. `member.name = 'new name'; await member.save()`
+
+        Only the changed fields are sent, and nothing is sent if nothing changed.
+        Takes the same permissions and raises the same errors as `edit`.
+
+        :raises ValueError: The object was not created by an application with `track_changes` enabled.
+
+        :return: Whether anything was sent.
+        """
+        changes = self._changes()  # type: ignore[attr-defined]
+        # ids can't be changed
+        changes.pop('id', None)
+
+        if not changes:
+            return False
+
+        await self.edit(**changes)
+        # the api may not respond with the new state, the fields already hold it
+        self._snapshot()  # type: ignore[attr-defined]
+        return True
+
+    def _edit_body(self, **values: Any) -> bytes | None:  # noqa: ANN401
+        """
+        Serialize the JSON body of an edit, leaving out the `MISSING` values.
+
+        The body is written by pydantic-core in one pass, nested models and sets
+        included, with a serializer built once per class from the parameters of
+        `edit` that are model fields.
+
+        :raises ValueError: A value doesn't match the type of its field.
+
+        :return: The body, or `None` if every value was `MISSING`.
+        """
+        payload = {
+            name: value
+            for name, value in values.items()
+            if value is not MISSING
+        }
+
+        if not payload:
+            return None
+
+        # a value of the wrong type is only a warning by default, and would be sent as-is
+        return _edit_adapter(type(self)).dump_json(payload, warnings='error')
+
+
+class EditResult(NamedTuple):
+    """The result of one edit in a bulk edit."""
+    model: EditableBase
+    """The edited object."""
+    changed: bool
+    """Whether anything was sent."""
+    error: Exception | None
+    """The error the edit raised, if any."""
@@ -21,3 +21,26 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+from pydantic import Field
+
+from ..types import PydanticObjectId, Image
+from .abc import PluralModel
+
+
+__all__ = (
+    'Group',
+)
+
+
+class Group(PluralModel):
+    '''Requires the `groups.read` intent.'''
+    id: PydanticObjectId
+    '''The group ID.'''
+    name: str = Field(min_length=1, max_length=45)
+    '''The group name. Must be unique between 1 and 45 characters.'''
+    avatar: Image | None = None
+    '''The group avatar, if any.'''
+    channels: set[int] = Field(default_factory=set)
+    '''The Discord channel IDs the group is restricted to. Empty if the group is not restricted.'''
+    tag: str | None = Field(None, max_length=79)
+    '''The group tag, appended to member names when proxying, if any.'''
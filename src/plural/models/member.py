@@ -21,15 +21,25 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from typing import Self, Annotated
+from typing import Any, Self, Annotated, NamedTuple
 
-from pydantic import Field, model_validator
+from pydantic import Field, SerializerFunctionWrapHandler, model_serializer, model_validator
 
 
 from ..types import MissingOr, MissingNoneOr, MISSING, MissingType, PydanticObjectId, Image
 from ..errors import Unauthorized, Forbidden, NotFound, BadRequest, MissingIntentError
 from .abc import PluralModel, EditableBase
+from ..upload import ImageSource, ImageUpload
 from ..enums import Intents
+from ..route import Route
+
+
+__all__ = (
+    'ProxyTag',
+    'CompactProxyTag',
+    'UserProxy',
+    'Member',
+)
 
 
 class ProxyTag(PluralModel):
@@ -59,6 +69,27 @@ class ProxyTag(PluralModel):
 
         return self
 
+    def compact(self) -> 'CompactProxyTag':
+        '''Return a tuple form of this proxy tag that uses a fraction of the memory.'''
+        return CompactProxyTag(
+            self.prefix,
+            self.suffix,
+            self.regex,
+            self.case_sensitive
+        )
+
+
+class CompactProxyTag(NamedTuple):
+    '''A compact, immutable and hashable form of `ProxyTag`.'''
+    prefix: str
+    suffix: str
+    regex: bool
+    case_sensitive: bool
+
+    def expand(self) -> ProxyTag:
+        '''Return this proxy tag as a full `ProxyTag`, without validation.'''
+        return ProxyTag.model_construct(**self._asdict())
+
 
 class UserProxy(PluralModel):
     def __eq__(self, value: object) -> bool:
@@ -85,6 +116,15 @@ class UserProxy(PluralModel):
     guilds: set[int] = Field(default_factory=set)
     '''The guild IDs where the user proxy is a member.'''
 
+    @model_serializer(mode='wrap')
+    def _drop_missing(self, handler: SerializerFunctionWrapHandler) -> dict[str, Any]:
+        # fields the api didn't send are left out, rather than sent back as null
+        return {
+            key: value
+            for key, value in handler(self).items()
+            if getattr(self, key, None) is not MISSING
+        }
+
 
 class Member(PluralModel, EditableBase):
     '''Requires the `members.read` intent.'''
@@ -104,7 +144,7 @@ class Member(PluralModel, EditableBase):
     async def edit(
         self,
         name: MissingOr[str] = MISSING,
-        avatar: MissingNoneOr[bytes] = MISSING,
+        avatar: MissingNoneOr[ImageSource] = MISSING,
         proxy_tags: MissingOr[list[ProxyTag]] = MISSING,
         userproxy: MissingNoneOr[UserProxy] = MISSING
     ) -> None:
@@ -113,8 +153,8 @@ class Member(PluralModel, EditableBase):
 
         :param name: The member name. Must be unique within the group and between 1 and 80 characters.
         :type name: `str` | `MISSING`
-        :param avatar: The member avatar bytes, or `None` to remove the avatar.
-        :type avatar: `bytes` | `None` | `MISSING`
+        :param avatar: The member avatar as bytes, a file path, an async iterator of chunks or another `Image`, or `None` to remove the avatar. Must be a png, jpg, gif or webp of at most `MAX_IMAGE_SIZE` bytes.
+        :type avatar: `ImageSource` | `None` | `MISSING`
         :param proxy_tags: The proxy tags for the member.
         :type proxy_tags: `list[ProxyTag]` | `MISSING`
         :param userproxy: The user proxy for the member, or `None` to remove the user proxy. Requires the `members.userproxy_tokens.write` intent.
@@ -137,26 +177,58 @@ class Member(PluralModel, EditableBase):
             raise MissingIntentError(
                 'The application does not have the required intent `members.write`')
 
-        json = {}
+        if not isinstance(name, MissingType) and not 1 <= len(name) <= 80:
+            raise ValueError(
+                'Name must be between 1 and 80 characters')
 
-        if not isinstance(name, MissingType):
-            if not 1 <= len(name) <= 80:
-                raise ValueError(
-                    'Name must be between 1 and 80 characters')
+        if (
+            not isinstance(userproxy, MissingType) and
+            not self._app.intents & Intents.MEMBERS_USERPROXY_TOKEN_WRITE
+        ):
+            raise MissingIntentError(
+                'The application does not have the required intent `members.userproxy_token.write`')
+
+        files = {}
+
+        if avatar is not None and not isinstance(avatar, MissingType):
+            files['avatar'] = await ImageUpload.prepare(avatar)
+
+        json = self._edit_body(
+            name=name,
+            # new avatars are uploaded as a file, only removing one is part of the body
+            avatar=MISSING if files else avatar,
+            proxy_tags=proxy_tags,
+            userproxy=userproxy
+        )
+
+        if json is None and not files:
+            return
+
+        request = (
+            self._user._request
+            if self._user is not None
+            else self._app._request
+        )
+
+        data = await request(
+            Route('PATCH', '/members/{member_id}', member_id=self.id),
+            json=json,
+            files=files or None
+        )
 
-            json['name'] = name
+        if data is None:
+            if self._app.cache is not None:
+                self._app.cache.members.pop(self.id)
 
-        if not isinstance(avatar, MissingType):
-            #! add image validation
-            #! figure out actually uploading images
-            ...
+            if not isinstance(name, MissingType):
+                for registry in self._app._registries:
+                    registry._refresh(self.id.binary, name)
+            return
 
-        if not isinstance(proxy_tags, MissingType):
-            json['proxy_tags'] = proxy_tags
+        self._update(Member._from_data(data, self._app, self._user))
 
-        if not isinstance(userproxy, MissingType):
-            if not self._app.intents & Intents.MEMBERS_USERPROXY_TOKEN_WRITE:
-                raise MissingIntentError(
-                    'The application does not have the required intent `members.userproxy_token.write`')
+        if self._app.cache is not None:
+            self._app.cache.members.set(self.id, self)
 
-            json['userproxy'] = userproxy
+        for registry in self._app._registries:
+            registry._refresh(self.id.binary, self.name)
@@ -21,11 +21,19 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+from typing import NamedTuple
 from datetime import datetime
+from sys import intern
 
 from .abc import PluralModel
 
 
+__all__ = (
+    'Message',
+    'CompactMessage',
+)
+
+
 class Message(PluralModel):
     #! probably store member id here
     original_id: int | None
@@ -40,3 +48,28 @@ class Message(PluralModel):
     """The reason the message was proxied."""
     timestamp: datetime
     """The timestamp when the message was proxied."""
+
+    def compact(self) -> 'CompactMessage':
+        """Return a tuple form of this message that uses about a tenth of the memory."""
+        return CompactMessage(
+            self.original_id,
+            self.proxy_id,
+            self.author_id,
+            self.channel_id,
+            intern(self.reason),
+            self.timestamp
+        )
+
+
+class CompactMessage(NamedTuple):
+    """A compact, immutable form of `Message` for holding many messages at once."""
+    original_id: int | None
+    proxy_id: int
+    author_id: int
+    channel_id: int
+    reason: str
+    timestamp: datetime
+
+    def expand(self) -> Message:
+        """Return this message as a full `Message`, without validation."""
+        return Message.model_construct(**self._asdict())
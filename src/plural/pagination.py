@@ -0,0 +1,121 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import AsyncIterator, Awaitable, Callable
+from asyncio import Queue, Semaphore, create_task
+from typing import Any, TypeVar
+
+
+__all__ = (
+    'PAGE_SIZE',
+    'paginate',
+)
+
+
+PAGE_SIZE = 100
+'''The largest page the API returns.'''
+
+T = TypeVar('T')
+
+
+async def paginate(
+    fetch: Callable[[Any, int], Awaitable[list[T]]],
+    cursor: Callable[[T], Any],
+    *,
+    limit: int | None = None,
+    page_size: int = PAGE_SIZE,
+    prefetch: int = 1
+) -> AsyncIterator[T]:
+    '''
+    Iterate over a cursor paginated endpoint, fetching pages ahead of the consumer.
+
+    Pages are fetched in order by a background task, which may run up to
+    `prefetch` pages ahead of the page being consumed. Breaking out of the
+    loop cancels the request in flight, if any.
+
+    :param fetch: Fetches and parses the page after the given cursor (`None` for the first page) with the given size.
+    :type fetch: `Callable[[Any, int], Awaitable[list[T]]]`
+    :param cursor: Returns the cursor for the page after the given item.
+    :type cursor: `Callable[[T], Any]`
+    :param limit: The maximum number of items to return. `None` for every item.
+    :type limit: `int` | `None`
+    :param page_size: The number of items to request per page. Defaults to `PAGE_SIZE`.
+    :type page_size: `int`
+    :param prefetch: The number of pages to fetch ahead of the page being consumed. `0` fetches each page on demand. Defaults to 1.
+    :type prefetch: `int`
+    '''
+    if not 1 <= page_size <= PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {PAGE_SIZE}')
+
+    if prefetch < 0:
+        raise ValueError('prefetch must be at least 0')
+
+    if limit is not None and limit <= 0:
+        return
+
+    # each permit allows one more page to be fetched, the consumer adds one per page it asks for
+    permits = Semaphore(prefetch)
+    pages: Queue[tuple[list[T], BaseException | None, bool]] = Queue()
+
+    async def fetcher() -> None:
+        after, remaining = None, limit
+
+        while True:
+            await permits.acquire()
+            size = page_size if remaining is None else min(page_size, remaining)
+
+            try:
+                page = await fetch(after, size)
+            except Exception as e:  # noqa: BLE001
+                pages.put_nowait(([], e, True))
+                return
+
+            if remaining is not None:
+                remaining -= len(page)
+
+            # a short page is the last one
+            last = len(page) < size or remaining == 0
+            pages.put_nowait((page, None, last))
+
+            if last:
+                return
+
+            after = cursor(page[-1])
+
+    task = create_task(fetcher())
+
+    try:
+        while True:
+            permits.release()
+            page, error, last = await pages.get()
+
+            if error is not None:
+                raise error
+
+            for item in page:
+                yield item
+
+            if last:
+                return
+    finally:
+        task.cancel()
@@ -0,0 +1,427 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from re import DOTALL, IGNORECASE, Pattern, compile, error as RegexError
+from re._parser import parse as parse_regex
+from collections.abc import Iterable
+from typing import Any
+import logging
+
+from .models import Member, ProxyTag
+from .types import PydanticObjectId
+
+
+__all__ = (
+    'ProxyMatch',
+    'ProxyTagMatcher',
+)
+
+
+# keys of the terminal entries in a trie node, never collide with a single character
+# tags with both a prefix and a suffix are paired, tags with only one of them are alone
+_PAIRED = 'paired'
+_ALONE = 'alone'
+
+logger = logging.getLogger(__name__)
+
+
+class ProxyMatch:
+    __slots__ = ('member', 'proxy_tag', 'content')
+
+    def __init__(self, member: Member, proxy_tag: ProxyTag, content: str) -> None:
+        self.member = member
+        '''The member whose proxy tag matched.'''
+        self.proxy_tag = proxy_tag
+        '''The proxy tag that matched.'''
+        self.content = content
+        '''The message content with the proxy tag stripped.'''
+
+    def __repr__(self) -> str:
+        return f'<ProxyMatch member={self.member.name!r} content={self.content!r}>'
+
+
+class _Entry:
+    __slots__ = ('member', 'proxy_tag', 'prefix', 'suffix')
+
+    def __init__(self, member: Member, proxy_tag: ProxyTag, prefix: str, suffix: str) -> None:
+        self.member = member
+        self.proxy_tag = proxy_tag
+        self.prefix = prefix
+        self.suffix = suffix
+
+
+class _RegexTag:
+    '''A regex tag, with its prefix and suffix compiled on their own.'''
+    __slots__ = ('entry', 'prefix', 'suffix', 'width')
+
+    def __init__(self, entry: _Entry, prefix: Pattern[str], suffix: Pattern[str]) -> None:
+        self.entry = entry
+        self.prefix = prefix
+        self.suffix = suffix
+        self.width = _max_width(prefix) + _max_width(suffix)
+        '''The longest the prefix and suffix can be together, huge if either is unbounded.'''
+
+    def match(self, content: str) -> str | None:
+        '''The content between the prefix and the suffix, if the tag matches.'''
+        if (head := self.prefix.match(content)) is None:
+            return None
+
+        # the content is greedy, so the suffix is tried from the end of the message first
+        for end in range(len(content), head.end() - 1, -1):
+            if self.suffix.fullmatch(content, end) is not None:
+                return content[head.end():end]
+
+        return None
+
+
+class _Index:
+    '''Literal tags, a prefix trie and a trie of reversed suffixes.'''
+    __slots__ = ('fold', 'prefixes', 'suffixes')
+
+    def __init__(self, fold: bool) -> None:
+        self.fold = fold
+        self.prefixes: dict[str, Any] = {}
+        self.suffixes: dict[str, Any] = {}
+
+    def add(self, entry: _Entry) -> None:
+        kind = _PAIRED if entry.prefix and entry.suffix else _ALONE
+
+        if entry.prefix:
+            _insert(self.prefixes, entry.prefix, kind, entry)
+
+        if entry.suffix:
+            _insert(self.suffixes, entry.suffix[::-1], kind, entry)
+
+    def remove(self, entry: _Entry) -> None:
+        kind = _PAIRED if entry.prefix and entry.suffix else _ALONE
+
+        if entry.prefix:
+            _delete(self.prefixes, entry.prefix, kind, entry)
+
+        if entry.suffix:
+            _delete(self.suffixes, entry.suffix[::-1], kind, entry)
+
+    def match(self, content: str) -> tuple[_Entry, int, int] | None:
+        prefixes = _walk(self.prefixes, content, range(len(content)), self.fold)
+        suffixes = _walk(
+            self.suffixes, content, range(len(content) - 1, -1, -1), self.fold)
+
+        best: tuple[_Entry, int, int] | None = None
+        best_length = -1
+
+        for node, start in prefixes:
+            if (alone := node.get(_ALONE)) and start > best_length:
+                best, best_length = (next(iter(alone)), start, len(content)), start
+
+        for node, end in suffixes:
+            if (alone := node.get(_ALONE)) and len(content) - end > best_length:
+                best, best_length = (next(iter(alone)), 0, end), len(content) - end
+
+        for prefix_node, start in prefixes:
+            if not (prefix_paired := prefix_node.get(_PAIRED)):
+                continue
+
+            for suffix_node, end in suffixes:
+                if (
+                    start > end or
+                    (length := start + len(content) - end) <= best_length or
+                    not (suffix_paired := suffix_node.get(_PAIRED))
+                ):
+                    continue
+
+                # a tag matches when it ends in both nodes, so only the smaller side is iterated
+                small, large = sorted((prefix_paired, suffix_paired), key=len)
+
+                for entry in small:
+                    if entry in large:
+                        best, best_length = (entry, start, end), length
+                        break
+
+        return best
+
+
+def _insert(root: dict[str, Any], key: str, kind: str, entry: _Entry) -> None:
+    node = root
+
+    for char in key:
+        node = node.setdefault(char, {})
+
+    node.setdefault(kind, {})[entry] = None
+
+
+def _delete(root: dict[str, Any], key: str, kind: str, entry: _Entry) -> None:
+    path = [root]
+
+    for char in key:
+        if (node := path[-1].get(char)) is None:
+            return
+
+        path.append(node)
+
+    entries = path[-1].get(kind, {})
+    entries.pop(entry, None)
+
+    if not entries:
+        path[-1].pop(kind, None)
+
+    # prune the branch back up to the last node still in use
+    for depth in range(len(key), 0, -1):
+        if path[depth]:
+            break
+
+        del path[depth - 1][key[depth - 1]]
+
+
+def _walk(
+    root: dict[str, Any],
+    content: str,
+    indices: range,
+    fold: bool
+) -> list[tuple[dict[str, Any], int]]:
+    '''
+    Walk the trie along `content` in the order of `indices`.
+
+    Returns every node with terminal entries that was reached, with the
+    position in the original content where its key ends (or starts, when
+    walking backwards).
+    '''
+    found: list[tuple[dict[str, Any], int]] = []
+    forward = indices.step > 0
+    node = root
+
+    for index in indices:
+        char = content[index]
+
+        if fold:
+            folded = char.casefold()
+            char = folded if forward else folded[::-1]
+
+        for part in char:
+            if (node := node.get(part)) is None:
+                return found
+
+        if _PAIRED in node or _ALONE in node:
+            found.append((node, index + 1 if forward else index))
+
+    return found
+
+
+class ProxyTagMatcher:
+    '''
+    A compiled index of the proxy tags of many members.
+
+    Literal tags are matched with a prefix trie and a trie of reversed
+    suffixes, so the cost of a match depends on the length of the tags rather
+    than their number. Regex tags are compiled into a single alternation,
+    except those with groups or inline flags, which could break or change the
+    meaning of the others there and are matched on their own instead.
+    Case-insensitive tags are case folded once, when they are added.
+
+    When several tags match, the longest tag wins.
+    '''
+
+    def __init__(self, members: Iterable[Member] = ()) -> None:
+        self._entries: dict[PydanticObjectId, list[_Entry]] = {}
+        self._sensitive = _Index(fold=False)
+        self._insensitive = _Index(fold=True)
+        self._regex_tags: list[_RegexTag] = []
+        '''The regex tags compiled into `_regex`.'''
+        self._isolated: list[_RegexTag] = []
+        '''The regex tags matched on their own.'''
+        self._regex: Pattern[str] | None = None
+        self._regex_dirty = False
+
+        for member in members:
+            self.add(member)
+
+    def __len__(self) -> int:
+        '''The number of proxy tags in the index.'''
+        return sum(len(entries) for entries in self._entries.values())
+
+    def __contains__(self, member: object) -> bool:
+        return getattr(member, 'id', member) in self._entries
+
+    def add(self, member: Member) -> None:
+        '''Add a member's proxy tags, replacing any previously added for the same member.'''
+        if member.id in self._entries:
+            self.remove(member.id)
+
+        entries = self._entries[member.id] = []
+
+        for proxy_tag in member.proxy_tags:
+            if proxy_tag.regex:
+                entry = _Entry(member, proxy_tag, proxy_tag.prefix, proxy_tag.suffix)
+
+                if not self._add_regex(entry):
+                    continue
+            elif proxy_tag.case_sensitive:
+                entry = _Entry(member, proxy_tag, proxy_tag.prefix, proxy_tag.suffix)
+                self._sensitive.add(entry)
+            else:
+                entry = _Entry(
+                    member,
+                    proxy_tag,
+                    proxy_tag.prefix.casefold(),
+                    proxy_tag.suffix.casefold())
+                self._insensitive.add(entry)
+
+            entries.append(entry)
+
+    def update(self, member: Member) -> None:
+        '''Re-index a member after its proxy tags changed.'''
+        self.add(member)
+
+    def remove(self, member_id: PydanticObjectId) -> None:
+        '''Remove all proxy tags of a member.'''
+        for entry in self._entries.pop(member_id, ()):
+            if entry.proxy_tag.regex:
+                for tags in (self._regex_tags, self._isolated):
+                    for index, tag in enumerate(tags):
+                        if tag.entry is entry:
+                            del tags[index]
+                            break
+
+                self._regex_dirty = True
+            elif entry.proxy_tag.case_sensitive:
+                self._sensitive.remove(entry)
+            else:
+                self._insensitive.remove(entry)
+
+    def _add_regex(self, entry: _Entry) -> bool:
+        flags = DOTALL if entry.proxy_tag.case_sensitive else DOTALL | IGNORECASE
+
+        try:
+            tag = _RegexTag(entry, compile(entry.prefix, flags), compile(entry.suffix, flags))
+        except RegexError:
+            return False
+
+        # in the alternation, named groups would clash between tags, numbered groups would
+        # move under their backreferences and inline global flags would no longer be at the start
+        if tag.prefix.groups or tag.suffix.groups or not _compiles(_alternative(entry, 0)):
+            self._isolated.append(tag)
+        else:
+            self._regex_tags.append(tag)
+            self._regex_dirty = True
+
+        return True
+
+    def _compile_regex(self) -> Pattern[str] | None:
+        if self._regex_dirty:
+            self._regex_dirty = False
+
+            # the alternation returns the first alternative that matches, widest first keeps
+            # the longest tag winning, with only the tags that may still be longer left to try
+            self._regex_tags.sort(key=lambda tag: tag.width, reverse=True)
+
+            try:
+                self._regex = compile('|'.join(
+                    _alternative(tag.entry, index)
+                    for index, tag in enumerate(self._regex_tags)
+                )) if self._regex_tags else None
+            except RegexError:
+                # every tag compiled on its own, so this should not happen, but one
+                # bad tag must not stop the others from matching
+                logger.exception('could not compile the regex proxy tags, matching them one by one')
+                self._isolated.extend(self._regex_tags)
+                self._regex_tags.clear()
+                self._regex = None
+
+        return self._regex
+
+    def match(self, content: str) -> ProxyMatch | None:
+        '''
+        Find the member whose proxy tag matches the given message content.
+
+        :param content: The message content.
+        :type content: `str`
+
+        :return: The winning member, proxy tag and stripped content, or `None` if no tag matched.
+        '''
+        best: ProxyMatch | None = None
+        best_length = -1
+
+        for index in (self._sensitive, self._insensitive):
+            if (found := index.match(content)) is None:
+                continue
+
+            entry, start, end = found
+
+            if (length := start + len(content) - end) > best_length:
+                best = ProxyMatch(entry.member, entry.proxy_tag, content[start:end])
+                best_length = length
+
+        if (
+            (regex := self._compile_regex()) is not None and
+            (match := regex.match(content)) is not None and
+            match.lastgroup is not None
+        ):
+            index = int(match.lastgroup[1:])
+            stripped = match.group(f'c{index}')
+
+            if len(content) - len(stripped) > best_length:
+                entry = self._regex_tags[index].entry
+                best = ProxyMatch(entry.member, entry.proxy_tag, stripped)
+                best_length = len(content) - len(stripped)
+
+            # the earlier alternatives didn't match, the later ones are narrower
+            for tag in self._regex_tags[index + 1:]:
+                if tag.width <= best_length:
+                    break
+
+                if (
+                    (stripped := tag.match(content)) is not None and
+                    len(content) - len(stripped) > best_length
+                ):
+                    best = ProxyMatch(tag.entry.member, tag.entry.proxy_tag, stripped)
+                    best_length = len(content) - len(stripped)
+
+        for tag in self._isolated:
+            if (
+                (stripped := tag.match(content)) is not None and
+                len(content) - len(stripped) > best_length
+            ):
+                best = ProxyMatch(tag.entry.member, tag.entry.proxy_tag, stripped)
+                best_length = len(content) - len(stripped)
+
+        return best
+
+
+def _alternative(entry: _Entry, index: int) -> str:
+    # each alternative ends in an empty marker group, so `lastgroup` names the tag that matched
+    return (
+        f'(?{'s' if entry.proxy_tag.case_sensitive else 'is'}:'
+        f'(?:{entry.prefix})(?P<c{index}>.*)(?:{entry.suffix})\\Z)(?P<t{index}>)'
+    )
+
+
+def _max_width(pattern: Pattern[str]) -> int:
+    return parse_regex(pattern.pattern, pattern.flags).getwidth()[1]
+
+
+def _compiles(pattern: str) -> bool:
+    try:
+        compile(pattern)
+    except RegexError:
+        return False
+
+    return True
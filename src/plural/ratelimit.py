@@ -0,0 +1,277 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Event, Future, Lock, Task, create_task, get_running_loop, shield, sleep
+from collections.abc import Coroutine, Mapping
+from time import monotonic, time
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .state import StateBackend
+    from .route import Route
+
+
+__all__ = (
+    'Bucket',
+    'RateLimiter',
+)
+
+
+class Bucket:
+    '''
+    The rate limit state of a single bucket, as last reported by the API.
+
+    Requests reserve a slot before they are sent; once a bucket is exhausted,
+    further requests wait in order until it resets instead of being rejected.
+    '''
+    __slots__ = ('key', 'limit', 'remaining', 'reset_at', 'window', '_lock', '_discovery')
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self.limit: int | None = None
+        '''The number of requests allowed per window, or `None` if unknown or unlimited.'''
+        self.remaining: int | None = None
+        '''The number of requests left in the current window, or `None` if unknown or unlimited.'''
+        self.reset_at = 0.0
+        '''The monotonic time when the current window resets.'''
+        self.window = 0.0
+        '''The longest reset interval seen, used to estimate a window before the API reports it.'''
+        self._lock = Lock()
+        self._discovery: Future[None] | None = None
+
+    def __repr__(self) -> str:
+        return (
+            f'<Bucket {self.key!r} '
+            f'remaining={self.remaining} limit={self.limit} '
+            f'reset_after={self.reset_after:.3f}>'
+        )
+
+    @property
+    def known(self) -> bool:
+        '''Whether the API has reported limits for this bucket yet.'''
+        return self.reset_at != 0.0 or self.limit is not None
+
+    @property
+    def reset_after(self) -> float:
+        '''The number of seconds until the current window resets.'''
+        return max(0.0, self.reset_at - monotonic())
+
+    @property
+    def locked(self) -> bool:
+        '''Whether requests are currently waiting on this bucket.'''
+        return self._lock.locked()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            # only one request is sent until the limits of a new bucket are known,
+            # otherwise a cold burst would be sent before any headers are seen
+            while not self.known and self._discovery is not None:
+                await shield(self._discovery)
+
+            if not self.known:
+                self._discovery = get_running_loop().create_future()
+                return
+
+            if self.remaining is None:
+                return
+
+            if self.remaining <= 0:
+                delay = self.reset_after
+
+                if delay:
+                    await sleep(delay)
+
+                self.remaining = self.limit
+                self.reset_at = monotonic() + self.window
+
+            if self.remaining is not None:
+                self.remaining -= 1
+
+    def release(self) -> None:
+        '''Release the discovery slot if the request ended without updating the bucket.'''
+        if self._discovery is not None and not self._discovery.done():
+            self._discovery.set_result(None)
+
+        self._discovery = None
+
+    def update(
+        self,
+        limit: int | None,
+        remaining: int | None,
+        reset_after: float | None
+    ) -> None:
+        now = monotonic()
+
+        if (
+            remaining is not None and
+            self.remaining is not None and
+            self.reset_at > now
+        ):
+            # the window has not reset yet, requests that are still in flight already took their slot
+            remaining = min(self.remaining, remaining)
+
+        if reset_after is not None:
+            self.window = max(self.window, reset_after)
+
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = now + (reset_after or 0.0)
+        self.release()
+
+    def exhaust(self, retry_after: float) -> None:
+        self.remaining = 0
+        self.reset_at = monotonic() + retry_after
+
+        if self.limit is None:
+            self.limit = 1
+
+        self.release()
+
+
+class RateLimiter:
+    '''
+    Tracks rate limit buckets by route.
+
+    Routes start in a bucket named after their method and path template; once
+    the API reports a bucket with `X-RateLimit-Bucket`, every route sharing it
+    uses the same state.
+
+    With a `StateBackend`, every request also reserves a slot in the state
+    shared with other processes, so processes using the same token don't
+    overrun the limits between them.
+    '''
+
+    def __init__(self, backend: 'StateBackend | None' = None) -> None:
+        self.backend = backend
+        self._tasks: set[Task[None]] = set()
+        self._routes: dict[str, str] = {}
+        self._buckets: dict[str, Bucket] = {}
+        self._global = Event()
+        self._global.set()
+        self._global_reset_at = 0.0
+
+    @property
+    def buckets(self) -> Mapping[str, Bucket]:
+        '''The known buckets, keyed by bucket name.'''
+        return self._buckets
+
+    @property
+    def global_reset_after(self) -> float:
+        '''The number of seconds until the global rate limit resets, `0` if it is not active.'''
+        return max(0.0, self._global_reset_at - monotonic())
+
+    def get_bucket(self, route: 'Route') -> Bucket:
+        key = self._routes.get(route.bucket, route.bucket)
+
+        if (bucket := self._buckets.get(key)) is None:
+            bucket = self._buckets[key] = Bucket(key)
+
+        return bucket
+
+    async def acquire(self, route: 'Route') -> Bucket:
+        if not self._global.is_set():
+            await self._global.wait()
+
+        bucket = self.get_bucket(route)
+        await bucket.acquire()
+
+        if self.backend is None:
+            return bucket
+
+        try:
+            while (delay := await self.backend.reserve(bucket.key)) > 0:
+                await sleep(delay)
+        except BaseException:
+            bucket.release()
+            raise
+
+        return bucket
+
+    def update(self, route: 'Route', headers: Mapping[str, str]) -> None:
+        bucket = self.get_bucket(route)
+
+        if (name := headers.get('X-RateLimit-Bucket')) and name != bucket.key:
+            self._routes[route.bucket] = name
+
+            if (shared := self._buckets.get(name)) is None:
+                bucket.key = name
+                self._buckets[name] = bucket
+            else:
+                bucket.release()
+                bucket = shared
+
+            self._buckets.pop(route.bucket, None)
+
+        limit = headers.get('X-RateLimit-Limit')
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+
+        if reset_after is None and (reset := headers.get('X-RateLimit-Reset')):
+            # absolute epoch seconds, only used when reset-after is missing
+            reset_after = str(max(0.0, float(reset) - time()))
+
+        bucket.update(
+            int(limit) if limit is not None else None,
+            int(remaining) if remaining is not None else None,
+            float(reset_after) if reset_after is not None else None
+        )
+
+        if self.backend is not None and bucket.known:
+            self._background(self.backend.update(
+                bucket.key, bucket.limit, bucket.remaining, bucket.reset_after))
+
+    def limited(
+        self,
+        route: 'Route',
+        retry_after: float,
+        is_global: bool = False
+    ) -> None:
+        '''Record a 429 response for the given route.'''
+        if self.backend is not None:
+            self._background(self.backend.exhaust(
+                self.get_bucket(route).key, retry_after, is_global))
+
+        if not is_global:
+            self.get_bucket(route).exhaust(retry_after)
+            return
+
+        self.get_bucket(route).release()
+        self._global_reset_at = monotonic() + retry_after
+
+        if self._global.is_set():
+            self._global.clear()
+            get_running_loop().call_later(retry_after, self._reset_global)
+
+    def _reset_global(self) -> None:
+        if (delay := self.global_reset_after) > 0:
+            get_running_loop().call_later(delay, self._reset_global)
+            return
+
+        self._global.set()
+
+    def _background(self, coro: Coroutine[None, None, None]) -> None:
+        # the shared state is told without holding up the response
+        task = create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
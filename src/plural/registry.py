@@ -0,0 +1,447 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import AsyncIterable, Iterable, Iterator
+from typing import Any, NamedTuple, TYPE_CHECKING
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from heapq import nlargest
+from array import array
+
+from bson.objectid import ObjectId
+
+from .types import PydanticObjectId
+
+if TYPE_CHECKING:
+    from .application import Application
+    from .models import Member
+
+
+__all__ = (
+    'MemberEntry',
+    'MemberRegistry',
+)
+
+
+_ID_SIZE = 12
+# ids per block of the sorted buffer, the first id of each block is kept as a fence
+_BLOCK = 64
+# separates the folded name from the slot in a key, sorts before any character of a name
+_SEP = '\0'
+# below this share of the registry, a batch is inserted in place rather than rebuilding
+_REBUILD_RATIO = 8
+
+
+class MemberEntry(NamedTuple):
+    id: PydanticObjectId
+    '''The member ID.'''
+    name: str
+    '''The member name.'''
+
+
+class MemberRegistry:
+    '''
+    A compact index of member IDs and names, for autocomplete.
+
+    Only the ID and name of each member is kept, in columns rather than as
+    models, so a registry takes a fraction of the memory of the `Member`
+    models it was built from. IDs are kept in a sorted buffer of their 12 byte
+    binary form, found by bisecting the first ID of each block of 64 and then
+    searching that block in place. Names are casefolded into sorted lists of
+    keys, one of whole names and one starting at each later word, so a prefix
+    search is a bisect followed by a scan over the matches.
+
+    With `fuzzy` enabled, names are also indexed by their trigrams, so queries
+    with typos or matching the middle of a word still find results.
+
+    Use `attach` to keep the registry up to date with the members edited
+    through an application and the member events it receives.
+    '''
+
+    def __init__(self, members: Iterable['Member'] = (), *, fuzzy: bool = False) -> None:
+        self.fuzzy = fuzzy
+        '''Whether `search` fills the remaining results with trigram matches.'''
+        # entries are stored in slots, which never move, so the indexes can refer to them
+        self._ids = bytearray()
+        '''The sorted binary IDs.'''
+        self._slots = array('I')
+        '''The slot of each ID in `_ids`.'''
+        self._fences: list[bytes] | None = None
+        '''The first ID of each block of `_ids`, rebuilt on the first lookup after a change.'''
+        self._slot_ids = bytearray()
+        '''The binary ID in each slot.'''
+        self._names: list[str | None] = []
+        '''The name in each slot, `None` when the slot is free.'''
+        self._free: list[int] = []
+        self._keys: list[str] = []
+        '''The sorted `{casefolded name}\\0{slot}` keys.'''
+        self._word_keys: list[str] = []
+        '''The sorted `{casefolded name from a later word start}\\0{slot}` keys.'''
+        self._trigrams: dict[str, array[int]] = {}
+        '''The slots of the names containing each trigram, when `fuzzy` is enabled.'''
+
+        self.update(members)
+
+    @classmethod
+    async def collect(
+        cls,
+        members: AsyncIterable['Member'],
+        *,
+        fuzzy: bool = False
+    ) -> 'MemberRegistry':
+        '''
+        Build a registry from an async iterator of members, e.g. `User.iter_members`.
+
+        Each member is dropped as soon as it is indexed, so the whole system
+        is never held as models at once.
+
+        :param members: The members to index.
+        :type members: `AsyncIterable[Member]`
+        :param fuzzy: Whether to index trigrams for fuzzy search. Defaults to `False`.
+        :type fuzzy: `bool`
+        '''
+        registry = cls(fuzzy=fuzzy)
+        rows = {member.id.binary: member.name async for member in members}
+        registry._rebuild(rows)
+
+        return registry
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, member: 'Member | PydanticObjectId | str') -> bool:
+        return self._position(_binary(member)) is not None
+
+    def __iter__(self) -> Iterator[MemberEntry]:
+        '''The members, in ID order.'''
+        for position, slot in enumerate(self._slots):
+            start = position * _ID_SIZE
+            yield MemberEntry(
+                PydanticObjectId(bytes(self._ids[start:start + _ID_SIZE])),
+                self._names[slot])  # type: ignore[arg-type]
+
+    def get(self, member_id: PydanticObjectId | str) -> MemberEntry | None:
+        '''
+        Get a member by ID.
+
+        :param member_id: The member ID.
+        :type member_id: `PydanticObjectId` | `str`
+
+        :return: The member, if it is in the registry.
+        :rtype: `MemberEntry` | `None`
+        '''
+        if (position := self._position(key := _binary(member_id))) is None:
+            return None
+
+        return MemberEntry(
+            member_id if isinstance(member_id, PydanticObjectId) else PydanticObjectId(key),
+            self._names[self._slots[position]])  # type: ignore[arg-type]
+
+    def add(self, member: 'Member') -> None:
+        '''Add a member, replacing the existing entry with the same ID.'''
+        self._set(member.id.binary, member.name)
+
+    def update(self, members: Iterable['Member']) -> None:
+        '''Add many members, replacing the existing entries with the same IDs.'''
+        rows = {member.id.binary: member.name for member in members}
+
+        if len(rows) * _REBUILD_RATIO < len(self):
+            for key, name in rows.items():
+                self._set(key, name)
+
+            return
+
+        # sorting everything once is cheaper than many inserts into the middle of the columns
+        self._rebuild({
+            bytes(self._ids[start:start + _ID_SIZE]): self._names[slot]
+            for start, slot in zip(range(0, len(self._ids), _ID_SIZE), self._slots)
+        } | rows)  # type: ignore[operator]
+
+    def remove(self, member_id: PydanticObjectId | str) -> None:
+        '''Remove a member, if it is in the registry.'''
+        if (position := self._position(_binary(member_id))) is None:
+            return
+
+        slot = self._slots.pop(position)
+        start = position * _ID_SIZE
+        del self._ids[start:start + _ID_SIZE]
+        self._fences = None
+
+        self._unindex(slot, self._names[slot])  # type: ignore[arg-type]
+        self._names[slot] = None
+        self._free.append(slot)
+
+    def search(self, query: str, limit: int = 25) -> list[MemberEntry]:
+        '''
+        Find members by name, for autocomplete.
+
+        Names starting with the query rank first, then names with a later word
+        starting with it, shorter names first. With `fuzzy` enabled, the
+        remaining results are the names sharing the most trigrams with the query.
+
+        :param query: The text typed so far. Case is ignored.
+        :type query: `str`
+        :param limit: The maximum number of results. Defaults to 25, the most Discord will show.
+        :type limit: `int`
+
+        :return: The matching members, best first.
+        :rtype: `list[MemberEntry]`
+        '''
+        folded = query.casefold().replace(_SEP, '').lstrip()
+        names = self._names
+        slots: list[int] = []
+
+        # names starting with the query come first, later words only fill the remaining results
+        for keys in (self._keys, self._word_keys):
+            if (remaining := limit - len(slots)) <= 0:
+                break
+
+            ranks: dict[int, tuple[int, str]] = {}
+            index = bisect_left(keys, folded)
+
+            # matches are in alphabetical order, only enough of them to fill the results are ranked
+            while (
+                index < len(keys) and
+                len(ranks) < remaining * 2 and
+                (key := keys[index]).startswith(folded)
+            ):
+                slot = int(key.rpartition(_SEP)[2])
+
+                if slot not in ranks and slot not in slots:
+                    name: str = names[slot]  # type: ignore[assignment]
+                    ranks[slot] = (len(name), name)
+
+                index += 1
+
+            slots.extend(sorted(ranks, key=ranks.__getitem__)[:remaining])
+
+        if self.fuzzy and folded and len(slots) < limit:
+            slots.extend(self._fuzzy(folded, limit - len(slots), slots))
+
+        return [self._entry(slot) for slot in slots]
+
+    def handle_event(self, event: str, data: dict[str, Any]) -> None:
+        '''
+        Apply a member event.
+
+        Only members already in the registry are changed, the gateway sends the
+        events of every user of the application while a registry usually holds
+        the members of one.
+
+        :param event: The event name. e.g. `member_update`
+        :type event: `str`
+        :param data: The event payload.
+        :type data: `dict[str, Any]`
+        '''
+        if not event.startswith('member_') or not ObjectId.is_valid(data.get('id')):
+            return
+
+        if event == 'member_delete':
+            self.remove(data['id'])
+        elif (name := data.get('name')) is not None:
+            self._refresh(_binary(data['id']), name)
+
+    def attach(self, application: 'Application') -> None:
+        '''
+        Keep the registry up to date with the member edits made through, and the
+        member events received by, an application. The application only keeps a
+        weak reference to the registry.
+        '''
+        application._registries.add(self)
+
+    def detach(self, application: 'Application') -> None:
+        application._registries.discard(self)
+
+    def _refresh(self, key: bytes, name: str) -> None:
+        '''Rename a member, only if it is already in the registry.'''
+        if self._position(key) is not None:
+            self._set(key, name)
+
+    def _position(self, key: bytes) -> int | None:
+        '''The position of an ID in `_ids`, if it is in the registry.'''
+        if (fences := self._fences) is None:
+            fences = self._fences = [
+                bytes(self._ids[start:start + _ID_SIZE])
+                for start in range(0, len(self._ids), _BLOCK * _ID_SIZE)
+            ]
+
+        if (block := bisect_right(fences, key) - 1) < 0:
+            return None
+
+        ids = self._ids
+        end = min((start := block * _BLOCK * _ID_SIZE) + _BLOCK * _ID_SIZE, len(ids))
+        index = ids.find(key, start, end)
+
+        # a match can straddle two ids, the search then continues past it
+        while index != -1 and index % _ID_SIZE:
+            index = ids.find(key, index + 1, end)
+
+        return None if index == -1 else index // _ID_SIZE
+
+    def _search(self, key: bytes) -> int:
+        '''The position an ID is, or would be inserted, at in `_ids`.'''
+        ids = self._ids
+        low, high = 0, len(self._slots)
+
+        while low < high:
+            middle = (low + high) >> 1
+            start = middle * _ID_SIZE
+
+            if ids[start:start + _ID_SIZE] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _set(self, key: bytes, name: str) -> None:
+        position = self._search(key)
+        start = position * _ID_SIZE
+
+        if position < len(self._slots) and self._ids[start:start + _ID_SIZE] == key:
+            slot = self._slots[position]
+
+            if (old := self._names[slot]) == name:
+                return
+
+            self._unindex(slot, old)  # type: ignore[arg-type]
+        else:
+            if self._free:
+                slot = self._free.pop()
+                self._slot_ids[slot * _ID_SIZE:(slot + 1) * _ID_SIZE] = key
+            else:
+                slot = len(self._names)
+                self._names.append(None)
+                self._slot_ids += key
+
+            self._ids[start:start] = key
+            self._slots.insert(position, slot)
+            self._fences = None
+
+        self._names[slot] = name
+        self._index(slot, name)
+
+    def _index(self, slot: int, name: str) -> None:
+        for index, key in enumerate(_keys(name, slot)):
+            insort(self._word_keys if index else self._keys, key)
+
+        if self.fuzzy:
+            for trigram in _trigrams(name.casefold()):
+                self._trigrams.setdefault(trigram, array('I')).append(slot)
+
+    def _unindex(self, slot: int, name: str) -> None:
+        for word, key in enumerate(_keys(name, slot)):
+            keys = self._word_keys if word else self._keys
+
+            if (index := bisect_left(keys, key)) < len(keys) and keys[index] == key:
+                del keys[index]
+
+        if self.fuzzy:
+            for trigram in _trigrams(name.casefold()):
+                if (slots := self._trigrams.get(trigram)) is None:
+                    continue
+
+                slots.remove(slot)
+
+                if not slots:
+                    del self._trigrams[trigram]
+
+    def _rebuild(self, rows: dict[bytes, str]) -> None:
+        ordered = sorted(rows.items())
+
+        self._ids = bytearray(b''.join([key for key, _ in ordered]))
+        self._slot_ids = bytearray(self._ids)
+        self._slots = array('I', range(len(ordered)))
+        self._fences = None
+        self._names = [name for _, name in ordered]
+        self._free = []
+        keys = [_keys(name, slot) for slot, name in enumerate(self._names)]  # type: ignore[arg-type]
+        self._keys = sorted([name_keys[0] for name_keys in keys if name_keys])
+        self._word_keys = sorted([key for name_keys in keys for key in name_keys[1:]])
+        self._trigrams = {}
+
+        if self.fuzzy:
+            for slot, name in enumerate(self._names):
+                for trigram in _trigrams(name.casefold()):  # type: ignore[union-attr]
+                    self._trigrams.setdefault(trigram, array('I')).append(slot)
+
+    def _fuzzy(self, folded: str, limit: int, exclude: Iterable[int]) -> list[int]:
+        trigrams = _trigrams(folded)
+        counts: Counter[int] = Counter()
+
+        for trigram in trigrams:
+            if (slots := self._trigrams.get(trigram)) is not None:
+                counts.update(slots)
+
+        for slot in exclude:
+            counts.pop(slot, None)
+
+        # a third of the query has to match, or every name sharing a common trigram would be a result
+        minimum = len(trigrams) / 3
+        names = self._names
+
+        # the dice coefficient, so long names sharing a few trigrams don't outrank close matches
+        return nlargest(
+            limit,
+            (slot for slot, count in counts.items() if count >= minimum),
+            key=lambda slot: counts[slot] / (len(trigrams) + len(names[slot]) + 2)  # type: ignore[arg-type]
+        )
+
+    def _entry(self, slot: int) -> MemberEntry:
+        start = slot * _ID_SIZE
+
+        return MemberEntry(
+            PydanticObjectId(bytes(self._slot_ids[start:start + _ID_SIZE])),
+            self._names[slot])  # type: ignore[arg-type]
+
+
+def _binary(member: 'Member | ObjectId | str | bytes') -> bytes:
+    if isinstance(member, ObjectId):
+        return member.binary
+
+    if isinstance(member, str):
+        return ObjectId(member).binary
+
+    if isinstance(member, bytes):
+        return member
+
+    return member.id.binary
+
+
+def _keys(name: str, slot: int) -> list[str]:
+    '''The index keys of a name, one starting at each word, the whole name first.'''
+    folded = name.casefold().replace(_SEP, '')
+    suffix = f'{_SEP}{slot}'
+
+    return [
+        folded[index:] + suffix
+        for index, char in enumerate(folded)
+        if not char.isspace() and (index == 0 or folded[index - 1].isspace())
+    ]
+
+
+def _trigrams(folded: str) -> set[str]:
+    # padded so the start of a name weighs more, like a prefix match
+    padded = f'  {folded} '
+
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
@@ -0,0 +1,62 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from typing import Any
+
+
+__all__ = (
+    'Route',
+)
+
+
+class Route:
+    '''
+    A single API endpoint.
+
+    The path is formatted once on creation, so a route can be built ahead of
+    time and reused for any number of requests.
+
+    e.g. `Route('GET', '/members/{member_id}', member_id=member.id)`
+    '''
+    __slots__ = ('method', 'template', 'path', 'params', 'bucket')
+
+    def __init__(self, method: str, template: str, **params: Any) -> None:  # noqa: ANN401
+        self.method = method
+        self.template = template
+        self.params = params
+        self.path = template.format_map(params) if params else template
+        self.bucket = f'{method} {template}'
+        '''The default rate limit bucket, until the API reports a shared one.'''
+
+    def __repr__(self) -> str:
+        return f'<Route {self.method} {self.path}>'
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, Route) and
+            self.method == other.method and
+            self.path == other.path
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.method, self.path))
@@ -0,0 +1,355 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Future, TimerHandle, get_running_loop
+from collections.abc import Mapping
+from collections import deque
+from time import monotonic
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from .ratelimit import RateLimiter
+    from .route import Route
+
+
+__all__ = (
+    'UserQueue',
+    'FairScheduler',
+)
+
+
+class UserQueue:
+    '''The scheduling state and statistics of a single user.'''
+    __slots__ = (
+        'user_id', 'weight', 'limit', 'in_flight', 'requests',
+        'wait_time', 'max_wait_time', 'virtual_time', '_waiting', '_usage', '_refilled_at'
+    )
+
+    def __init__(self, user_id: int, weight: float, limit: int) -> None:
+        self.user_id = user_id
+        self.weight = weight
+        '''The relative share of requests this user gets while others are waiting.'''
+        self.limit = limit
+        '''The number of requests this user may have in flight at once.'''
+        self.in_flight = 0
+        self.requests = 0
+        '''The number of requests admitted.'''
+        self.wait_time = 0.0
+        '''The total time requests spent queued, in seconds.'''
+        self.max_wait_time = 0.0
+        '''The longest time a request spent queued, in seconds.'''
+        self.virtual_time = 0.0
+        self._waiting: deque[tuple[Future[None], str | None, float]] = deque()
+        self._usage: dict[str, tuple[float, float]] = {}
+        self._refilled_at = 0.0
+        '''When every rate limit share of the user is full again.'''
+
+    def __repr__(self) -> str:
+        return (
+            f'<UserQueue {self.user_id} depth={self.depth} '
+            f'in_flight={self.in_flight} weight={self.weight}>'
+        )
+
+    @property
+    def depth(self) -> int:
+        '''The number of requests waiting to be admitted.'''
+        return len(self._waiting)
+
+    @property
+    def mean_wait_time(self) -> float:
+        '''The mean time a request spent queued, in seconds.'''
+        return self.wait_time / self.requests if self.requests else 0.0
+
+
+class FairScheduler:
+    '''
+    Admits requests made through `Application.as_user` with weighted fair queuing.
+
+    Pass an instance as `Application(scheduler=...)`. Every user has its own
+    queue and concurrency limit, and while requests are waiting the next one
+    is taken from the user that has received the least service relative to
+    its weight, so one user syncing thousands of members does not hold up
+    everyone else. Requests are only queued when a limit is reached.
+
+    The queue of a user is dropped once it is idle, unless the user was given
+    its own weight or limit with `configure`, so serving many users that each
+    send a few requests does not grow memory without bound.
+
+    :param concurrency: The number of user requests in flight at once, across every user.
+    :type concurrency: `int`
+    :param per_user: The default number of requests a single user may have in flight.
+    :type per_user: `int`
+    :param ratelimit_share: The largest fraction of a rate limit bucket a single user may use per window, e.g. `0.25`. `None` for no limit.
+    :type ratelimit_share: `float` | `None`
+    '''
+
+    def __init__(
+        self,
+        concurrency: int = 64,
+        per_user: int = 4,
+        ratelimit_share: float | None = None
+    ) -> None:
+        if concurrency < 1 or per_user < 1:
+            raise ValueError('concurrency and per_user must be at least 1')
+
+        if ratelimit_share is not None and not 0 < ratelimit_share <= 1:
+            raise ValueError('ratelimit_share must be between 0 and 1')
+
+        self.concurrency = concurrency
+        self.per_user = per_user
+        self.ratelimit_share = ratelimit_share
+        self.ratelimiter: RateLimiter | None = None
+        '''The rate limiter whose buckets are shared out, set by the application.'''
+        self.in_flight = 0
+        self.requests = 0
+        '''The number of requests admitted, across every user.'''
+        self.wait_time = 0.0
+        '''The total time requests spent queued, across every user, in seconds.'''
+        self._queues: dict[int, UserQueue] = {}
+        self._active: dict[int, UserQueue] = {}
+        '''Queues with requests waiting, in the order they became active.'''
+        self._virtual_time = 0.0
+        self._timer: TimerHandle | None = None
+
+    def __repr__(self) -> str:
+        return f'<FairScheduler in_flight={self.in_flight} depth={self.depth}>'
+
+    @property
+    def queues(self) -> Mapping[int, UserQueue]:
+        '''The users with requests in flight or waiting, or with their own settings, keyed by user ID.'''
+        return self._queues
+
+    @property
+    def depth(self) -> int:
+        '''The number of requests waiting, across every user.'''
+        return sum(queue.depth for queue in self._active.values())
+
+    def queue(self, user_id: int) -> UserQueue:
+        '''Return the queue of a user, creating it if needed.'''
+        if (queue := self._queues.get(user_id)) is None:
+            queue = self._queues[user_id] = UserQueue(user_id, 1.0, self.per_user)
+
+        return queue
+
+    def configure(
+        self,
+        user_id: int,
+        *,
+        weight: float | None = None,
+        limit: int | None = None
+    ) -> UserQueue:
+        '''
+        Set the weight or concurrency limit of a user.
+
+        :param user_id: The user ID.
+        :type user_id: `int`
+        :param weight: The relative share of requests. Defaults to `1.0`.
+        :type weight: `float` | `None`
+        :param limit: The number of requests the user may have in flight. Defaults to `per_user`.
+        :type limit: `int` | `None`
+        '''
+        queue = self.queue(user_id)
+
+        if weight is not None:
+            if weight <= 0:
+                raise ValueError('weight must be positive')
+
+            queue.weight = weight
+
+        if limit is not None:
+            if limit < 1:
+                raise ValueError('limit must be at least 1')
+
+            queue.limit = limit
+            self._dispatch()
+
+        return queue
+
+    async def acquire(self, user_id: int, route: 'Route | None' = None) -> None:
+        '''
+        Wait until a request for the user may be sent. Every call must be followed by `release`.
+
+        :param user_id: The user ID.
+        :type user_id: `int`
+        :param route: The route, used to share out rate limit buckets.
+        :type route: `Route` | `None`
+        '''
+        queue = self.queue(user_id)
+        bucket = self._bucket_key(route)
+
+        if not queue._waiting and self._admissible(queue, bucket, monotonic()):
+            self._admit(queue, bucket, monotonic(), 0.0)
+            return
+
+        future: Future[None] = get_running_loop().create_future()
+        queue._waiting.append((future, bucket, monotonic()))
+
+        if queue.user_id not in self._active:
+            # a user that was idle doesn't bank credit, it starts level with the others
+            queue.virtual_time = max(queue.virtual_time, self._virtual_time)
+            self._active[queue.user_id] = queue
+
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # admitted just as the caller was cancelled
+                self.release(user_id)
+            else:
+                self._remove(queue, future)
+            raise
+
+    def release(self, user_id: int) -> None:
+        '''Release a slot taken by `acquire`.'''
+        queue = self._queues[user_id]
+        queue.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+        self._discard(queue)
+
+    def _bucket_key(self, route: 'Route | None') -> str | None:
+        if route is None or self.ratelimit_share is None or self.ratelimiter is None:
+            return None
+
+        return self.ratelimiter.get_bucket(route).key
+
+    def _admissible(self, queue: UserQueue, bucket: str | None, now: float) -> bool:
+        if self.in_flight >= self.concurrency or queue.in_flight >= queue.limit:
+            return False
+
+        return self._share_wait(queue, bucket, now) is None
+
+    def _share_tokens(self, queue: UserQueue, bucket: str | None, now: float) -> tuple[float, float, float] | None:
+        # each user refills its share of the bucket at share * limit per window, up to one share
+        if bucket is None or self.ratelimiter is None or self.ratelimit_share is None:
+            return None
+
+        state = self.ratelimiter.buckets.get(bucket)
+
+        if state is None or state.limit is None or state.window <= 0:
+            return None
+
+        capacity = max(1.0, state.limit * self.ratelimit_share)
+        rate = capacity / state.window
+        tokens, updated = queue._usage.get(bucket, (capacity, now))
+
+        return min(capacity, tokens + (now - updated) * rate), rate, capacity
+
+    def _share_wait(self, queue: UserQueue, bucket: str | None, now: float) -> float | None:
+        '''How long until the user may use the bucket again, or `None` if it may now.'''
+        if (share := self._share_tokens(queue, bucket, now)) is None:
+            return None
+
+        tokens, rate, _ = share
+        return None if tokens >= 1 else (1 - tokens) / rate
+
+    def _admit(self, queue: UserQueue, bucket: str | None, now: float, waited: float) -> None:
+        queue.in_flight += 1
+        queue.requests += 1
+        queue.wait_time += waited
+        queue.max_wait_time = max(queue.max_wait_time, waited)
+        self.in_flight += 1
+        self.requests += 1
+        self.wait_time += waited
+
+        start = max(queue.virtual_time, self._virtual_time)
+        self._virtual_time = start
+        queue.virtual_time = start + 1 / queue.weight
+
+        if bucket is not None and (share := self._share_tokens(queue, bucket, now)) is not None:
+            tokens, rate, capacity = share
+            queue._usage[bucket] = (tokens - 1, now)
+            queue._refilled_at = max(queue._refilled_at, now + (capacity - tokens + 1) / rate)
+
+    def _dispatch(self) -> None:
+        now = monotonic()
+        retry_after: float | None = None
+
+        while self._active and self.in_flight < self.concurrency:
+            best: UserQueue | None = None
+
+            for queue in self._active.values():
+                if queue.in_flight >= queue.limit:
+                    continue
+
+                _, bucket, _ = queue._waiting[0]
+
+                if (wait := self._share_wait(queue, bucket, now)) is not None:
+                    retry_after = wait if retry_after is None else min(retry_after, wait)
+                    continue
+
+                if best is None or queue.virtual_time < best.virtual_time:
+                    best = queue
+
+            if best is None:
+                break
+
+            future, bucket, enqueued = best._waiting.popleft()
+
+            if not best._waiting:
+                del self._active[best.user_id]
+
+            if future.done():
+                # cancelled, its acquire hasn't run yet to remove it
+                continue
+
+            self._admit(best, bucket, now, now - enqueued)
+            future.set_result(None)
+
+        if retry_after is not None and self._timer is None:
+            # only a used up rate limit share is holding requests back, try again once it refills
+            self._timer = get_running_loop().call_later(retry_after, self._retry)
+
+    def _retry(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def _remove(self, queue: UserQueue, future: Future[None]) -> None:
+        for index, (waiting, _, _) in enumerate(queue._waiting):
+            if waiting is future:
+                del queue._waiting[index]
+                break
+
+        if not queue._waiting:
+            self._active.pop(queue.user_id, None)
+
+        self._discard(queue)
+
+    def _discard(self, queue: UserQueue) -> None:
+        '''Drop the queue of a user once it is idle.'''
+        if (
+            queue.in_flight or
+            queue._waiting or
+            queue.weight != 1.0 or
+            queue.limit != self.per_user or
+            self._queues.get(queue.user_id) is not queue
+        ):
+            return
+
+        # a new queue starts with full rate limit shares, so one that used them waits until they refill
+        if (remaining := queue._refilled_at - monotonic()) > 0:
+            get_running_loop().call_later(remaining, self._discard, queue)
+            return
+
+        del self._queues[queue.user_id]
@@ -0,0 +1,764 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import (
+    Future, StreamReader, StreamWriter, Task, Server, IncompleteReadError,
+    create_task, get_running_loop, open_unix_connection, sleep, start_unix_server, timeout
+)
+from collections.abc import Callable, Iterable
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from os import O_CREAT, O_RDWR, PathLike, close as close_fd, fspath, open as open_fd, unlink
+from time import monotonic
+from struct import Struct
+from typing import Any
+import logging
+
+from pydantic_core import from_json, to_json
+
+
+__all__ = (
+    'SharedState',
+    'StateBackend',
+    'MemoryBackend',
+    'SocketBackend',
+)
+
+
+logger = logging.getLogger(__name__)
+
+InvalidateCallback = Callable[[str, list[str]], None]
+
+_FRAME = Struct('!II')
+
+
+class _BucketState:
+    __slots__ = ('limit', 'remaining', 'reset_at', 'window')
+
+    def __init__(self) -> None:
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+        self.window = 0.0
+
+
+class SharedState:
+    '''
+    The rate limit and cache state shared by every process using a backend.
+
+    Mirrors `Bucket`: requests reserve a slot in a bucket before they are sent,
+    and responses report the limits the API has counted across every process.
+    Cached values are raw response bodies, keyed by namespace and key.
+    '''
+
+    def __init__(self, max_entries: int = 65536) -> None:
+        self.max_entries = max_entries
+        '''The number of cached values kept per namespace.'''
+        self.buckets: dict[str, _BucketState] = {}
+        self.global_reset_at = 0.0
+        self.entries: dict[str, OrderedDict[str, tuple[float, bytes]]] = {}
+
+    def reserve(self, bucket: str) -> float:
+        '''Take a slot in a bucket. Returns `0` on success, otherwise how long to wait before trying again.'''
+        now = monotonic()
+
+        if self.global_reset_at > now:
+            return self.global_reset_at - now
+
+        if (state := self.buckets.get(bucket)) is None or state.limit is None:
+            # unknown limits, each process discovers them on its own
+            return 0.0
+
+        if state.reset_at <= now:
+            state.remaining = state.limit
+            state.reset_at = now + state.window
+
+        if state.remaining is not None:
+            if state.remaining <= 0:
+                return max(state.reset_at - now, 0.001)
+
+            state.remaining -= 1
+
+        return 0.0
+
+    def update(
+        self,
+        bucket: str,
+        limit: int | None,
+        remaining: int | None,
+        reset_after: float | None
+    ) -> None:
+        '''Record the limits reported by a response.'''
+        now = monotonic()
+        state = self.buckets.get(bucket)
+
+        if state is None:
+            state = self.buckets[bucket] = _BucketState()
+
+        if (
+            remaining is not None and
+            state.remaining is not None and
+            state.reset_at > now
+        ):
+            # slots reserved by requests still in flight are not in the response yet
+            remaining = min(state.remaining, remaining)
+
+        if reset_after is not None:
+            state.window = max(state.window, reset_after)
+
+        state.limit = limit
+        state.remaining = remaining
+        state.reset_at = now + (reset_after or 0.0)
+
+    def exhaust(self, bucket: str, retry_after: float, is_global: bool = False) -> None:
+        '''Record a 429 response.'''
+        now = monotonic()
+
+        if is_global:
+            self.global_reset_at = max(self.global_reset_at, now + retry_after)
+            return
+
+        state = self.buckets.get(bucket)
+
+        if state is None:
+            state = self.buckets[bucket] = _BucketState()
+
+        state.remaining = 0
+        state.reset_at = now + retry_after
+
+        if state.limit is None:
+            state.limit = 1
+
+    def snapshot(self) -> dict[str, Any]:
+        '''The rate limit state, with times relative to now, to hand over to another process. Cached values are left out.'''
+        now = monotonic()
+
+        return {
+            'global_reset_after': max(self.global_reset_at - now, 0.0),
+            'buckets': {
+                bucket: [state.limit, state.remaining, max(state.reset_at - now, 0.0), state.window]
+                for bucket, state in self.buckets.items()
+            }
+        }
+
+    def restore(self, snapshot: dict[str, Any]) -> None:
+        '''Merge in a `snapshot` from another process, keeping whichever limits are stricter.'''
+        now = monotonic()
+        self.global_reset_at = max(self.global_reset_at, now + snapshot['global_reset_after'])
+
+        for bucket, (limit, remaining, reset_after, window) in snapshot['buckets'].items():
+            state = self.buckets.get(bucket)
+
+            if state is None:
+                state = self.buckets[bucket] = _BucketState()
+            elif (
+                state.limit is not None and
+                state.reset_at > now and (
+                    remaining is None or
+                    (state.remaining is not None and state.remaining <= remaining)
+                )
+            ):
+                state.window = max(state.window, window)
+                continue
+
+            state.limit = limit
+            state.remaining = remaining
+            state.reset_at = now + reset_after
+            state.window = max(state.window, window)
+
+    def get(self, namespace: str, key: str) -> bytes | None:
+        if (entries := self.entries.get(namespace)) is None:
+            return None
+
+        if (entry := entries.get(key)) is None:
+            return None
+
+        if entry[0] <= monotonic():
+            del entries[key]
+            return None
+
+        entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: float | None) -> None:
+        entries = self.entries.setdefault(namespace, OrderedDict())
+        entries[key] = (monotonic() + ttl if ttl is not None else float('inf'), value)
+        entries.move_to_end(key)
+
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, keys: Iterable[str]) -> None:
+        if (entries := self.entries.get(namespace)) is None:
+            return
+
+        for key in keys:
+            entries.pop(key, None)
+
+
+class StateBackend(ABC):
+    '''
+    Where an `Application` keeps the rate limit and cache state it shares with other processes.
+
+    Pass an instance as `Application(state=...)`. Every process using the
+    same token should use a backend connected to the same state. Backends
+    fail open: if the state can't be reached, requests go ahead and the
+    cache misses, as if no backend was set.
+    '''
+
+    def __init__(self) -> None:
+        self._invalidate_callbacks: list[InvalidateCallback] = []
+
+    def on_invalidate(self, callback: InvalidateCallback) -> None:
+        '''Register a function to call with `(namespace, keys)` when another process invalidates cached values.'''
+        self._invalidate_callbacks.append(callback)
+
+    def _invalidated(self, namespace: str, keys: list[str]) -> None:
+        for callback in self._invalidate_callbacks:
+            try:
+                callback(namespace, keys)
+            except Exception:
+                logger.exception('error in invalidation callback')
+
+    async def start(self) -> None:
+        '''Connect to the shared state. Called by `Application.start`, and otherwise on first use.'''
+
+    async def close(self) -> None:
+        '''Disconnect from the shared state.'''
+
+    @abstractmethod
+    async def reserve(self, bucket: str) -> float:
+        '''Take a slot in a rate limit bucket. Returns `0` on success, otherwise how long to wait before trying again.'''
+
+    @abstractmethod
+    async def update(
+        self,
+        bucket: str,
+        limit: int | None,
+        remaining: int | None,
+        reset_after: float | None
+    ) -> None:
+        '''Record the rate limits reported by a response.'''
+
+    @abstractmethod
+    async def exhaust(self, bucket: str, retry_after: float, is_global: bool = False) -> None:
+        '''Record a 429 response.'''
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> bytes | None:
+        '''Return a cached value, if any.'''
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: bytes, ttl: float | None = None) -> None:
+        '''Cache a value.'''
+
+    @abstractmethod
+    async def invalidate(self, namespace: str, keys: Iterable[str]) -> None:
+        '''Drop cached values, in every process.'''
+
+
+class MemoryBackend(StateBackend):
+    '''
+    Keeps the state in this process.
+
+    Share one instance between several applications in the same process,
+    e.g. one per event loop thread, so they don't work against each other.
+    '''
+
+    def __init__(self, state: SharedState | None = None) -> None:
+        super().__init__()
+        self.state = state or SharedState()
+        self._peers: list[MemoryBackend] = [self]
+
+    def __repr__(self) -> str:
+        return f'<MemoryBackend buckets={len(self.state.buckets)}>'
+
+    def share(self) -> 'MemoryBackend':
+        '''Return another backend on the same state, for another application. Invalidations reach every one of them.'''
+        backend = MemoryBackend(self.state)
+        backend._peers = self._peers
+        self._peers.append(backend)
+        return backend
+
+    async def reserve(self, bucket: str) -> float:
+        return self.state.reserve(bucket)
+
+    async def update(
+        self,
+        bucket: str,
+        limit: int | None,
+        remaining: int | None,
+        reset_after: float | None
+    ) -> None:
+        self.state.update(bucket, limit, remaining, reset_after)
+
+    async def exhaust(self, bucket: str, retry_after: float, is_global: bool = False) -> None:
+        self.state.exhaust(bucket, retry_after, is_global)
+
+    async def get(self, namespace: str, key: str) -> bytes | None:
+        return self.state.get(namespace, key)
+
+    async def set(self, namespace: str, key: str, value: bytes, ttl: float | None = None) -> None:
+        self.state.set(namespace, key, value, ttl)
+
+    async def invalidate(self, namespace: str, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        self.state.invalidate(namespace, keys)
+
+        for peer in self._peers:
+            if peer is not self:
+                peer._invalidated(namespace, keys)
+
+
+class SocketBackend(StateBackend):
+    '''
+    Shares the state between processes on one host over a Unix socket.
+
+    No separate service is needed: the first process to start hosts the state,
+    chosen with a lock file next to the socket, and the others connect to it.
+    A host that closes hands its rate limit state to the others, and one of
+    them takes over with it before they send anything else. If the host dies
+    instead, the new host starts fresh, and rate limits are rediscovered from
+    the next responses.
+
+    Messages are framed as two lengths, a JSON header and an optional binary
+    payload, so cached response bodies are passed through without re-encoding.
+    Writes are not acknowledged, only reservations and lookups wait for a reply.
+    If the host doesn't answer in time, this process uses its local state
+    until `reconnect_delay` has passed.
+
+    :param path: The socket path, e.g. `/run/plural/state.sock`. The lock file is `path` + `.lock`.
+    :type path: `str` | `PathLike[str]`
+    :param max_entries: The number of cached values kept per namespace, when this process hosts the state.
+    :type max_entries: `int`
+    :param reconnect_delay: How long to wait after losing the connection before trying again, in seconds.
+    :type reconnect_delay: `float`
+    :param timeout: How long to wait for the host to answer a reservation or lookup, in seconds.
+    :type timeout: `float`
+    '''
+
+    def __init__(
+        self,
+        path: str | PathLike[str],
+        *,
+        max_entries: int = 65536,
+        reconnect_delay: float = 1.0,
+        timeout: float = 0.5
+    ) -> None:
+        super().__init__()
+        self.path = fspath(path)
+        self.max_entries = max_entries
+        self.reconnect_delay = reconnect_delay
+        self.timeout = timeout
+        self._reader: StreamReader | None = None
+        self._writer: StreamWriter | None = None
+        self._reader_task: Task[None] | None = None
+        self._reconnect_task: Task[bool] | None = None
+        self._connecting: Future[bool] | None = None
+        self._pending: dict[int, Future[Any]] = {}
+        self._next_id = 0
+        self._retry_at = 0.0
+        self._closed = False
+        # the state handed over by a host that closed, for whoever takes over
+        self._handover: dict[str, Any] | None = None
+        # only set in the process hosting the state
+        self._server: Server | None = None
+        self._state: SharedState | None = None
+        self._clients: set[StreamWriter] = set()
+        self._lock_fd: int | None = None
+
+    def __repr__(self) -> str:
+        return f'<SocketBackend {self.path!r} connected={self.connected} hosting={self.hosting}>'
+
+    @property
+    def connected(self) -> bool:
+        return self._state is not None or (
+            self._writer is not None and not self._writer.is_closing()
+        )
+
+    @property
+    def hosting(self) -> bool:
+        '''Whether this process hosts the shared state.'''
+        return self._server is not None
+
+    async def start(self) -> None:
+        self._closed = False
+        await self._ensure_connected()
+
+    async def close(self) -> None:
+        self._closed = True
+        self._disconnect()
+
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+
+        if self._server is not None:
+            await self._stop_hosting()
+
+        self._release_lock()
+
+    async def _stop_hosting(self) -> None:
+        assert self._server is not None and self._state is not None
+        server, state, clients = self._server, self._state, list(self._clients)
+        self._server = self._state = None
+        server.close()
+
+        if clients:
+            # the socket is left for whoever takes over to replace, and the lock
+            # is released first so one of the clients can take it straight away
+            self._release_lock()
+            snapshot = state.snapshot()
+
+            for writer in clients:
+                if not writer.is_closing():
+                    _write(writer, [0, 'handover', snapshot])
+
+            try:
+                # the clients hang up once they read it, closing first could lose it
+                async with timeout(self.timeout):
+                    await server.wait_closed()
+            except TimeoutError:
+                pass
+        else:
+            try:
+                # while the lock is still held, so this can't be a new host's socket
+                unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+            self._release_lock()
+
+        for writer in list(self._clients):
+            writer.close()
+
+        await server.wait_closed()
+        self._clients.clear()
+
+    def _release_lock(self) -> None:
+        if self._lock_fd is not None:
+            close_fd(self._lock_fd)
+            self._lock_fd = None
+
+    async def reserve(self, bucket: str) -> float:
+        result = await self._call('reserve', [bucket])
+        return float(result) if result is not None else 0.0
+
+    async def update(
+        self,
+        bucket: str,
+        limit: int | None,
+        remaining: int | None,
+        reset_after: float | None
+    ) -> None:
+        await self._cast('update', [bucket, limit, remaining, reset_after])
+
+    async def exhaust(self, bucket: str, retry_after: float, is_global: bool = False) -> None:
+        await self._cast('exhaust', [bucket, retry_after, is_global])
+
+    async def get(self, namespace: str, key: str) -> bytes | None:
+        return await self._call('get', [namespace, key])
+
+    async def set(self, namespace: str, key: str, value: bytes, ttl: float | None = None) -> None:
+        await self._cast('set', [namespace, key, ttl], value)
+
+    async def invalidate(self, namespace: str, keys: Iterable[str]) -> None:
+        await self._cast('invalidate', [namespace, list(keys)])
+
+    async def _ensure_connected(self) -> bool:
+        if self.connected:
+            return True
+
+        if self._closed or monotonic() < self._retry_at:
+            return False
+
+        if self._connecting is None:
+            self._connecting = get_running_loop().create_future()
+
+            try:
+                connected = await self._connect()
+            except Exception:
+                logger.exception('could not connect to the shared state at %s', self.path)
+                connected = False
+
+            if not connected:
+                self._retry_at = monotonic() + self.reconnect_delay
+
+            self._connecting.set_result(connected)
+            self._connecting = None
+            return connected
+
+        return await self._connecting
+
+    async def _connect(self) -> bool:
+        for _ in range(20):
+            try:
+                reader, writer = await open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if await self._host():
+                    return True
+
+                # another process is starting to host, give it a moment
+                await sleep(0.05)
+                continue
+
+            try:
+                # the host greets every connection it serves, one accepted just as it closed never is
+                async with timeout(self.timeout):
+                    await _read(reader)
+            except TimeoutError:
+                writer.close()
+                logger.warning('the shared state at %s did not answer within %ss', self.path, self.timeout)
+                return False
+            except (IncompleteReadError, ConnectionError):
+                writer.close()
+                continue
+
+            self._reader, self._writer = reader, writer
+            self._reader_task = create_task(self._read(reader))
+
+            if self._handover is not None:
+                _write(writer, [0, 'restore', [self._handover]])
+                self._handover = None
+
+            return True
+
+        return False
+
+    async def _host(self) -> bool:
+        # posix only, imported here so the module can still be imported elsewhere
+        from fcntl import LOCK_EX, LOCK_NB, flock
+
+        if self._lock_fd is None:
+            fd = open_fd(f'{self.path}.lock', O_RDWR | O_CREAT, 0o600)
+
+            try:
+                flock(fd, LOCK_EX | LOCK_NB)
+            except BlockingIOError:
+                close_fd(fd)
+                return False
+
+            self._lock_fd = fd
+
+        if self._server is None:
+            try:
+                # left behind by a host that handed over or exited without cleaning up
+                unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+            self._state = SharedState(self.max_entries)
+
+            if self._handover is not None:
+                self._state.restore(self._handover)
+                self._handover = None
+
+            # the socket is unlinked by hand, a host handing over leaves it in place
+            self._server = await start_unix_server(self._serve, self.path, cleanup_socket=False)
+
+        return True
+
+    def _disconnect(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionResetError('lost the connection to the shared state'))
+
+        self._pending.clear()
+
+    async def _call(self, op: str, args: list[Any]) -> Any:  # noqa: ANN401
+        # a call cut off by the host going away is sent once more, to whoever takes over
+        for _ in range(2):
+            if not await self._ensure_connected():
+                return None
+
+            if self._state is not None:
+                return self._apply(op, args)
+
+            assert self._writer is not None
+            writer = self._writer
+            self._next_id += 1
+            request_id = self._next_id
+            future = self._pending[request_id] = get_running_loop().create_future()
+
+            try:
+                _write(writer, [request_id, op, args])
+
+                async with timeout(self.timeout):
+                    return await future
+            except TimeoutError:
+                logger.warning(
+                    'the shared state at %s did not answer within %ss, using local state',
+                    self.path, self.timeout
+                )
+                self._disconnect()
+                self._retry_at = monotonic() + self.reconnect_delay
+                return None
+            except ConnectionError:
+                if writer is self._writer:
+                    self._lost()
+            finally:
+                self._pending.pop(request_id, None)
+
+        return None
+
+    async def _cast(self, op: str, args: list[Any], payload: bytes = b'') -> None:
+        if not await self._ensure_connected():
+            return
+
+        if self._state is not None:
+            self._apply(op, args, payload)
+            return
+
+        assert self._writer is not None
+
+        try:
+            _write(self._writer, [0, op, args], payload)
+        except ConnectionError:
+            self._lost()
+
+    def _lost(self) -> None:
+        if self._handover is None:
+            logger.warning('lost the connection to the shared state at %s', self.path)
+        else:
+            logger.info('the host of the shared state at %s handed over', self.path)
+
+        self._disconnect()
+
+        if not self._closed:
+            # reconnect straight away, the host may have exited and someone has to take over
+            self._retry_at = 0.0
+            self._reconnect_task = create_task(self._ensure_connected())
+
+    async def _read(self, reader: StreamReader) -> None:
+        try:
+            while True:
+                header, payload = await _read(reader)
+                request_id = header[0]
+
+                if request_id == 0:
+                    if header[1] == 'handover':
+                        self._handover = header[2]
+                        break
+
+                    if header[1] == 'invalidate':
+                        self._invalidated(header[2][0], header[2][1])
+
+                    continue
+
+                if (future := self._pending.get(request_id)) is not None and not future.done():
+                    future.set_result(payload if header[1] == 'bytes' else header[1])
+        except (IncompleteReadError, ConnectionError):
+            pass
+
+        if not self._closed:
+            get_running_loop().call_soon(self._lost)
+
+    def _apply(
+        self,
+        op: str,
+        args: list[Any],
+        payload: bytes = b'',
+        origin: StreamWriter | None = None
+    ) -> Any:  # noqa: ANN401
+        # runs in the process hosting the state, origin is None for its own operations
+        assert self._state is not None
+        state = self._state
+
+        match op:
+            case 'reserve':
+                return state.reserve(*args)
+            case 'update':
+                return state.update(*args)
+            case 'exhaust':
+                return state.exhaust(*args)
+            case 'get':
+                return state.get(*args)
+            case 'set':
+                return state.set(args[0], args[1], bytes(payload), args[2])
+            case 'invalidate':
+                state.invalidate(*args)
+
+                for client in self._clients:
+                    if client is not origin and not client.is_closing():
+                        _write(client, [0, 'invalidate', args])
+
+                if origin is not None:
+                    self._invalidated(args[0], args[1])
+
+                return None
+            case 'restore':
+                return state.restore(*args)
+            case _:
+                logger.warning('unknown shared state operation %r', op)
+                return None
+
+    async def _serve(self, reader: StreamReader, writer: StreamWriter) -> None:
+        if (state := self._state) is None:
+            writer.close()
+            return
+
+        self._clients.add(writer)
+        _write(writer, [0, 'hello', []])
+
+        try:
+            while True:
+                (request_id, op, args), payload = await _read(reader)
+
+                if self._state is not state:
+                    # handed over, the client hangs up once it reads that
+                    continue
+
+                result = self._apply(op, args, payload, writer)
+
+                if not request_id:
+                    continue
+
+                if isinstance(result, bytes):
+                    _write(writer, [request_id, 'bytes'], result)
+                else:
+                    _write(writer, [request_id, result])
+        except (IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+
+def _write(writer: StreamWriter, header: list[Any], payload: bytes = b'') -> None:
+    encoded = to_json(header)
+    writer.write(_FRAME.pack(len(encoded), len(payload)) + encoded + payload)
+
+
+async def _read(reader: StreamReader) -> tuple[list[Any], bytes]:
+    header_size, payload_size = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    header = from_json(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b''
+    return header, payload
@@ -0,0 +1,321 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import AbstractEventLoop, new_event_loop, run_coroutine_threadsafe
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine, Iterable, Iterator, Mapping
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from threading import Lock, Thread, get_ident
+from typing import Any, Self, TypeVar
+
+from .application import Application
+from .gateway import Listener
+from .models import Group, Member, Message
+from .models.abc import EditableBase, EditResult
+from .pagination import PAGE_SIZE
+from .types import PydanticObjectId
+from .user import User
+
+
+__all__ = (
+    'SyncApplication',
+    'SyncUser',
+)
+
+
+T = TypeVar('T')
+
+
+class SyncApplication:
+    '''
+    A blocking facade over `Application`, for synchronous code such as task workers and scripts.
+
+    One event loop runs in a background thread for the life of the facade, so
+    the connection pool, rate limits and caches are shared by every call.
+    Calls may be made from any number of threads at once; each is scheduled
+    on the loop independently, so they run concurrently rather than in turn.
+
+    Takes the same arguments as `Application`. The wrapped application is
+    available as `application`, and any of its coroutines, including model
+    methods like `Member.edit`, can be run with `run`.
+
+    e.g.
+    ```
+    with SyncApplication('token', Intents.MEMBERS_READ) as app:
+        member = app.as_user(123).fetch_member(member_id)
+        app.run(member.edit(name='bob'))
+    ```
+    '''
+
+    def __init__(
+        self,
+        token: str,
+        *args: Any,  # noqa: ANN401
+        timeout: float | None = None,
+        **kwargs: Any  # noqa: ANN401
+    ) -> None:
+        self.timeout = timeout
+        '''The default number of seconds to wait for a call, `None` to wait forever.'''
+        self._loop: AbstractEventLoop = new_event_loop()
+        self._thread = Thread(
+            target=self._loop.run_forever,
+            name='plural-event-loop',
+            daemon=True
+        )
+        self._users_lock = Lock()
+        self._closed = False
+        self._thread.start()
+
+        # created on the loop, aiohttp expects to be used from the loop it was created on
+        self.application = self.run(self._create(token, *args, **kwargs))
+
+    async def _create(self, token: str, *args: Any, **kwargs: Any) -> Application:  # noqa: ANN401
+        return Application(token, *args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f'<SyncApplication closed={self._closed}>'
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    @property
+    def loop(self) -> AbstractEventLoop:
+        '''The event loop the application runs on.'''
+        return self._loop
+
+    def run(self, awaitable: Awaitable[T], timeout: float | None = None) -> T:
+        '''
+        Run a coroutine on the background loop and wait for its result.
+
+        :param awaitable: The coroutine to run.
+        :type awaitable: `Awaitable[T]`
+        :param timeout: The number of seconds to wait. Defaults to `SyncApplication.timeout`.
+        :type timeout: `float` | `None`
+
+        :raises RuntimeError: The facade is closed, or this was called from the loop itself.
+        :raises TimeoutError: The coroutine did not finish in time. It is cancelled.
+
+        :return: The result of the coroutine.
+        '''
+        future = self.submit(awaitable)
+
+        try:
+            return future.result(self.timeout if timeout is None else timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError from None
+
+    def submit(self, awaitable: Awaitable[T]) -> 'Future[T]':
+        '''
+        Schedule a coroutine on the background loop without waiting for it.
+
+        :param awaitable: The coroutine to run.
+        :type awaitable: `Awaitable[T]`
+
+        :return: A future for the result. Cancelling it cancels the coroutine.
+        '''
+        if self._closed:
+            _close(awaitable)
+            raise RuntimeError('The application is closed')
+
+        if get_ident() == self._thread.ident:
+            # waiting on the loop from the loop would never finish
+            _close(awaitable)
+            raise RuntimeError('SyncApplication cannot be used from its own event loop, await the application directly')
+
+        return run_coroutine_threadsafe(_awaitable(awaitable), self._loop)
+
+    def iterate(self, iterator: AsyncIterator[T]) -> Iterator[T]:
+        '''
+        Iterate over an async iterator from the background loop, one item at a time.
+
+        Breaking out of the loop closes the iterator.
+        '''
+        try:
+            while True:
+                try:
+                    yield self.run(anext(iterator))
+                except StopAsyncIteration:
+                    return
+        finally:
+            if (aclose := getattr(iterator, 'aclose', None)) is not None and not self._closed:
+                self.run(aclose())
+
+    def start(self, warm: int | None = None) -> None:
+        '''Open the connection pool. See `Application.start`.'''
+        self.run(self.application.start(warm))
+
+    def close(self) -> None:
+        '''Close the application, then stop the background loop.'''
+        if self._closed:
+            return
+
+        try:
+            self.run(self.application.close())
+        finally:
+            self._closed = True
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def connect(self, reconnect: bool = True) -> 'Future[None]':
+        '''
+        Connect to the event gateway in the background. See `Application.connect`.
+
+        Listeners run on the background loop.
+
+        :return: A future that finishes when the connection is closed.
+        '''
+        return self.submit(self.application.connect(reconnect))
+
+    def listen(self, event: str = '*') -> Callable[[Listener], Listener]:
+        '''Decorator to register a coroutine as an event listener. See `Application.listen`.'''
+        return self.application.listen(event)
+
+    def as_user(self, user_id: int) -> 'SyncUser':
+        '''Return a user object for the given user ID. See `Application.as_user`.'''
+        with self._users_lock:
+            return SyncUser(self, self.application.as_user(user_id))
+
+    def fetch_message(
+        self,
+        message_id: int,
+        existence_only: bool = False,
+        max_wait: float = 10.0,
+        coalesce: bool = True,
+        use_cache: bool = True
+    ) -> Message | bool:
+        '''Fetch a message by either original or proxied ID. See `Application.fetch_message`.'''
+        return self.run(self.application.fetch_message(
+            message_id,
+            existence_only,  # type: ignore[arg-type]
+            max_wait,
+            coalesce,
+            use_cache
+        ))
+
+    def fetch_messages(
+        self,
+        message_ids: Iterable[int],
+        existence_only: bool = False,
+        max_wait: float = 10.0,
+        concurrency: int = 16
+    ) -> dict[int, Message | None] | dict[int, bool]:
+        '''Fetch many messages by either original or proxied ID. See `Application.fetch_messages`.'''
+        return self.run(self.application.fetch_messages(
+            message_ids,
+            existence_only,  # type: ignore[arg-type]
+            max_wait,
+            concurrency
+        ))
+
+    def bulk_edit(
+        self,
+        edits: Iterable[EditableBase | tuple[EditableBase, Mapping[str, Any]]],
+        concurrency: int = 8
+    ) -> list[EditResult]:
+        '''Apply many edits concurrently. See `Application.bulk_edit`.'''
+        return self.run(self.application.bulk_edit(edits, concurrency))
+
+
+class SyncUser:
+    '''A blocking facade over `User`, returned by `SyncApplication.as_user`.'''
+
+    def __init__(self, application: SyncApplication, user: User) -> None:
+        self.application = application
+        self.user = user
+        '''The wrapped user.'''
+
+    def __repr__(self) -> str:
+        return f'<SyncUser {self.user.user_id}>'
+
+    @property
+    def user_id(self) -> int:
+        return self.user.user_id
+
+    def fetch_member(
+        self,
+        member_id: PydanticObjectId | str,
+        coalesce: bool = True,
+        use_cache: bool = True
+    ) -> Member:
+        '''Fetch a member by ID. See `User.fetch_member`.'''
+        return self.application.run(self.user.fetch_member(member_id, coalesce, use_cache))
+
+    def fetch_group(
+        self,
+        group_id: PydanticObjectId | str,
+        coalesce: bool = True,
+        use_cache: bool = True
+    ) -> Group:
+        '''Fetch a group by ID. See `User.fetch_group`.'''
+        return self.application.run(self.user.fetch_group(group_id, coalesce, use_cache))
+
+    def iter_members(
+        self,
+        group_id: PydanticObjectId | str | None = None,
+        *,
+        limit: int | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: int = 1
+    ) -> Iterator[Member]:
+        '''Iterate over the user's members. See `User.iter_members`.'''
+        return self.application.iterate(self.user.iter_members(
+            group_id, limit=limit, page_size=page_size, prefetch=prefetch))
+
+    def iter_groups(
+        self,
+        *,
+        limit: int | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: int = 1
+    ) -> Iterator[Group]:
+        '''Iterate over the user's groups. See `User.iter_groups`.'''
+        return self.application.iterate(self.user.iter_groups(
+            limit=limit, page_size=page_size, prefetch=prefetch))
+
+    def iter_messages(
+        self,
+        channel_id: int | None = None,
+        *,
+        limit: int | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: int = 1
+    ) -> Iterator[Message]:
+        '''Iterate over the user's proxied messages. See `User.iter_messages`.'''
+        return self.application.iterate(self.user.iter_messages(
+            channel_id, limit=limit, page_size=page_size, prefetch=prefetch))
+
+
+async def _awaitable(awaitable: Awaitable[T]) -> T:
+    # run_coroutine_threadsafe only takes coroutines
+    return await awaitable
+
+
+def _close(awaitable: Awaitable[Any]) -> None:
+    # avoids a "coroutine was never awaited" warning for calls that are rejected
+    if isinstance(awaitable, Coroutine):
+        awaitable.close()
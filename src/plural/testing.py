@@ -0,0 +1,580 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import Awaitable, Callable
+from asyncio import Future, Task, get_running_loop, sleep, wait_for
+from zlib import Z_SYNC_FLUSH, compressobj
+from typing import Any, Self
+from hashlib import blake2b
+from random import Random
+from time import monotonic
+from json import loads
+
+from aiohttp import web
+from pydantic import BaseModel, Field
+from pydantic_core import to_json
+from bson import ObjectId
+
+from .enums import GatewayOpcode, Intents
+from .upload import detect_image_extension
+
+
+__all__ = (
+    'MockConfig',
+    'MockAPI',
+)
+
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+class MockConfig(BaseModel):
+    '''Behavior of a `MockAPI`.'''
+    latency: float = Field(0.0, ge=0)
+    '''Seconds added to every response.'''
+    jitter: float = Field(0.0, ge=0)
+    '''Up to this many extra seconds are added to every response, uniformly at random.'''
+    error_rate: float = Field(0.0, ge=0, le=1)
+    '''The fraction of requests that fail with `error_status`.'''
+    error_status: int = Field(500, ge=500, le=599)
+    '''The status of the injected errors.'''
+    reset_rate: float = Field(0.0, ge=0, le=1)
+    '''The fraction of requests whose connection is dropped without a response.'''
+    ratelimit_rate: float = Field(0.0, ge=0, le=1)
+    '''The fraction of requests that are rejected with a 429, regardless of the rate limits.'''
+    ratelimit_limit: int | None = Field(None, ge=1)
+    '''The number of requests allowed per route per window. `None` for no rate limits.'''
+    ratelimit_window: float = Field(1.0, gt=0)
+    '''The rate limit window, in seconds.'''
+    max_wait: float = Field(10.0, ge=0)
+    '''The longest a message lookup will wait for the message to be added.'''
+    seed: int | None = None
+    '''The seed for the injected latency and errors.'''
+
+
+class _Window:
+    __slots__ = ('reset_at', 'count')
+
+    def __init__(self, reset_at: float) -> None:
+        self.reset_at = reset_at
+        self.count = 0
+
+
+class _Socket:
+    __slots__ = ('ws', 'intents', 'compressor')
+
+    def __init__(self, ws: web.WebSocketResponse, compress: bool) -> None:
+        self.ws = ws
+        self.intents = Intents.NONE
+        self.compressor = compressobj() if compress else None
+
+    async def send(self, op: GatewayOpcode, data: Any = None, event: str | None = None) -> None:  # noqa: ANN401
+        payload = to_json({'op': op, 'd': data, 't': event, 's': None})
+
+        if self.compressor is not None:
+            payload = self.compressor.compress(payload) + self.compressor.flush(Z_SYNC_FLUSH)
+
+        await self.ws.send_bytes(payload)
+
+
+class MockAPI:
+    '''
+    An in-memory stand-in for the /plu/ral API, for tests and load testing.
+
+    Implements the message, member, group and image routes used by
+    `Application`, with optional latency, error and rate limit injection,
+    and a gateway that dispatches message events.
+
+    e.g.
+    ```
+    async with MockAPI() as api:
+        member = api.add_member(name='bob', user_id=123)
+        app = Application(
+            'token', Intents.MEMBERS_READ,
+            base_url=api.url, cdn_url=api.url, gateway_url=api.gateway_url)
+    ```
+    '''
+
+    def __init__(
+        self,
+        config: MockConfig | None = None,
+        *,
+        token: str | None = None
+    ) -> None:
+        self.config = config or MockConfig()
+        self.token = token
+        '''The only accepted token, or `None` to accept any.'''
+        self.members: dict[str, dict[str, Any]] = {}
+        self.groups: dict[str, dict[str, Any]] = {}
+        self.messages: dict[int, dict[str, Any]] = {}
+        self.images: dict[str, bytes] = {}
+        self.requests: dict[str, int] = {}
+        '''Requests received, by route.'''
+        self.statuses: dict[int, int] = {}
+        '''Responses sent, by status code.'''
+        self.edits: list[tuple[str, dict[str, Any]]] = []
+        '''The ID and changes of every member edit, in the order they were received.'''
+        self.url = ''
+        '''The base URL, set once started.'''
+        self._original_ids: dict[int, int] = {}
+        self._waiters: dict[int, list[Future[None]]] = {}
+        self._windows: dict[str, _Window] = {}
+        self._random = Random(self.config.seed)
+        self._runner: web.AppRunner | None = None
+        self._sockets: set[_Socket] = set()
+        self._tasks: set[Task[None]] = set()
+        self.app = self._create_app()
+
+    @property
+    def gateway_url(self) -> str:
+        '''The gateway URL, set once started.'''
+        return f'ws{self.url.removeprefix("http")}/gateway'
+
+    async def __aenter__(self) -> Self:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        '''
+        Start serving. A free port is picked when `port` is `0`.
+
+        :return: The base URL.
+        '''
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+
+        assert site._server is not None
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        self.url = f'http://{host}:{port}'
+        return self.url
+
+    async def close(self) -> None:
+        for socket in list(self._sockets):
+            await socket.ws.close()
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def add_group(
+        self,
+        name: str = 'group',
+        *,
+        user_id: int,
+        group_id: str | None = None,
+        **fields: Any  # noqa: ANN401
+    ) -> dict[str, Any]:
+        '''Add a group owned by the given user and return its payload.'''
+        group = {
+            'id': group_id or str(ObjectId()),
+            'name': name,
+            'avatar': None,
+            'channels': [],
+            'tag': None,
+            **fields,
+            'users': [user_id]
+        }
+        self.groups[group['id']] = group
+        return group
+
+    def add_member(
+        self,
+        name: str = 'member',
+        *,
+        user_id: int | None = None,
+        group_id: str | None = None,
+        member_id: str | None = None,
+        **fields: Any  # noqa: ANN401
+    ) -> dict[str, Any]:
+        '''
+        Add a member and return its payload.
+
+        The member is added to `group_id`, or to a new group owned by `user_id`.
+        '''
+        if group_id is None:
+            if user_id is None:
+                raise ValueError('Either user_id or group_id is required')
+
+            group_id = self.add_group(user_id=user_id)['id']
+
+        member = {
+            'id': member_id or str(ObjectId()),
+            'name': name,
+            'avatar': None,
+            'proxy_tags': [],
+            'userproxy': None,
+            **fields,
+            'group_id': group_id
+        }
+        self.members[member['id']] = member
+        return member
+
+    def add_message(
+        self,
+        proxy_id: int,
+        *,
+        original_id: int | None = None,
+        author_id: int = 0,
+        channel_id: int = 0,
+        reason: str = 'mock'
+    ) -> dict[str, Any]:
+        '''Add a proxied message and return its payload. Lookups waiting for it are answered.'''
+        message = {
+            'original_id': original_id,
+            'proxy_id': proxy_id,
+            'author_id': author_id,
+            'channel_id': channel_id,
+            'reason': reason,
+            'timestamp': '2024-01-01T00:00:00Z'
+        }
+        self.messages[proxy_id] = message
+
+        if original_id is not None:
+            self._original_ids[original_id] = proxy_id
+
+        for message_id in (proxy_id, original_id):
+            for waiter in self._waiters.pop(message_id, []):  # type: ignore[arg-type]
+                if not waiter.done():
+                    waiter.set_result(None)
+
+        if self._sockets:
+            task = get_running_loop().create_task(
+                self.dispatch('MESSAGE_CREATE', message, Intents.MESSAGES_EVENTS))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return message
+
+    async def dispatch(
+        self,
+        event: str,
+        data: dict[str, Any],
+        intent: Intents = Intents.NONE
+    ) -> None:
+        '''
+        Send an event to every gateway connection identified with the given intent.
+
+        :param event: The event name. e.g. `MESSAGE_CREATE`
+        :type event: `str`
+        :param data: The event payload.
+        :type data: `dict[str, Any]`
+        :param intent: The intent required to receive the event.
+        :type intent: `Intents`
+        '''
+        for socket in list(self._sockets):
+            if socket.intents & intent == intent and not socket.ws.closed:
+                await socket.send(GatewayOpcode.DISPATCH, data, event)
+
+    def _create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_route('HEAD', '/', self._ok)
+        app.router.add_get('/messages', self._list_messages)
+        app.router.add_post('/messages/bulk', self._bulk_messages)
+        app.router.add_get('/messages/{message_id}', self._get_message)
+        app.router.add_get('/members', self._list_members)
+        app.router.add_get('/members/{member_id}', self._get_member)
+        app.router.add_patch('/members/{member_id}', self._edit_member)
+        app.router.add_get('/groups', self._list_groups)
+        app.router.add_get('/groups/{group_id}', self._get_group)
+        app.router.add_get('/images/{parent_id}/{name}', self._get_image)
+        app.router.add_get('/gateway', self._gateway)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Handler) -> web.StreamResponse:
+        resource = request.match_info.route.resource
+        route = f'{request.method} {resource.canonical if resource is not None else request.path}'
+        self.requests[route] = self.requests.get(route, 0) + 1
+
+        response = await self._handle(request, handler, route)
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        return response
+
+    async def _handle(
+        self,
+        request: web.Request,
+        handler: Handler,
+        route: str
+    ) -> web.StreamResponse:
+        config = self.config
+
+        if config.latency or config.jitter:
+            await sleep(config.latency + self._random.random() * config.jitter)
+
+        if route.startswith(('GET /images/', 'GET /gateway')):
+            # the cdn isn't authenticated or rate limited, the gateway is authenticated by identify
+            return await handler(request)
+
+        if self.token is not None and request.headers.get('Authorization') != f'Bot {self.token}':
+            return web.Response(status=401, text='Unauthorized')
+
+        headers = {}
+
+        if config.ratelimit_limit is not None:
+            now = monotonic()
+            window = self._windows.get(route)
+
+            if window is None or window.reset_at <= now:
+                window = self._windows[route] = _Window(now + config.ratelimit_window)
+
+            window.count += 1
+            reset_after = window.reset_at - now
+            headers = {
+                'X-RateLimit-Limit': str(config.ratelimit_limit),
+                'X-RateLimit-Remaining': str(max(0, config.ratelimit_limit - window.count)),
+                'X-RateLimit-Reset-After': f'{reset_after:.3f}',
+                'X-RateLimit-Bucket': route
+            }
+
+            if window.count > config.ratelimit_limit:
+                return web.Response(
+                    status=429,
+                    text='Rate limited',
+                    headers={**headers, 'Retry-After': f'{reset_after:.3f}'})
+
+        if config.ratelimit_rate and self._random.random() < config.ratelimit_rate:
+            return web.Response(
+                status=429,
+                text='Rate limited',
+                headers={**headers, 'Retry-After': '0.05'})
+
+        if config.error_rate and self._random.random() < config.error_rate:
+            return web.Response(status=config.error_status, text='Injected error', headers=headers)
+
+        if (
+            config.reset_rate and
+            self._random.random() < config.reset_rate and
+            request.transport is not None
+        ):
+            request.transport.abort()
+            return web.Response(status=499)
+
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    async def _ok(self, _: web.Request) -> web.Response:
+        return web.Response()
+
+    def _user_id(self, request: web.Request) -> int | None:
+        user_id = request.headers.get('X-User-Id')
+        return int(user_id) if user_id is not None else None
+
+    def _owns(self, request: web.Request, group_id: str) -> bool:
+        user_id = self._user_id(request)
+        group = self.groups.get(group_id)
+
+        return group is not None and (user_id is None or user_id in group['users'])
+
+    def _find_message(self, message_id: int) -> dict[str, Any] | None:
+        if (message := self.messages.get(message_id)) is not None:
+            return message
+
+        if (proxy_id := self._original_ids.get(message_id)) is not None:
+            return self.messages.get(proxy_id)
+
+        return None
+
+    async def _get_message(self, request: web.Request) -> web.Response:
+        message_id = int(request.match_info['message_id'])
+        max_wait = min(float(request.query.get('max_wait', 0)), self.config.max_wait)
+
+        if (message := self._find_message(message_id)) is None and max_wait > 0:
+            waiter = get_running_loop().create_future()
+            self._waiters.setdefault(message_id, []).append(waiter)
+
+            try:
+                await wait_for(waiter, max_wait)
+            except TimeoutError:
+                pass
+
+            message = self._find_message(message_id)
+
+        if message is None:
+            return web.Response(status=404, text='Message not found')
+
+        if request.query.get('only_check_existence') == 'true':
+            return web.json_response(True)
+
+        return web.json_response(message)
+
+    async def _bulk_messages(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        existence = body.get('only_check_existence', False)
+        results = {}
+
+        for message_id in body['message_ids']:
+            message = self._find_message(int(message_id))
+            results[str(message_id)] = (message is not None) if existence else message
+
+        return web.json_response(results)
+
+    async def _list_messages(self, request: web.Request) -> web.Response:
+        user_id = self._user_id(request)
+        channel_id = request.query.get('channel_id')
+        after = int(request.query.get('after', -1))
+        limit = int(request.query.get('limit', 100))
+
+        page = []
+
+        for proxy_id in sorted(self.messages):
+            message = self.messages[proxy_id]
+
+            if (
+                proxy_id <= after or
+                (user_id is not None and message['author_id'] != user_id) or
+                (channel_id is not None and message['channel_id'] != int(channel_id))
+            ):
+                continue
+
+            page.append(message)
+
+            if len(page) == limit:
+                break
+
+        return web.json_response(page)
+
+    async def _list_members(self, request: web.Request) -> web.Response:
+        group_id = request.query.get('group_id')
+        members = [
+            member
+            for member in self.members.values()
+            if (group_id is None or member['group_id'] == group_id) and
+            self._owns(request, member['group_id'])
+        ]
+
+        return web.json_response(_page(request, members))
+
+    async def _get_member(self, request: web.Request) -> web.Response:
+        member = self.members.get(request.match_info['member_id'])
+
+        if member is None or not self._owns(request, member['group_id']):
+            return web.Response(status=404, text='Member not found')
+
+        return web.json_response(member)
+
+    async def _edit_member(self, request: web.Request) -> web.Response:
+        member = self.members.get(request.match_info['member_id'])
+
+        if member is None or not self._owns(request, member['group_id']):
+            return web.Response(status=404, text='Member not found')
+
+        changes: dict[str, Any] = {}
+
+        if request.content_type == 'multipart/form-data':
+            async for part in await request.multipart():
+                data = await part.read()  # type: ignore[union-attr]
+
+                if part.name == 'payload_json':
+                    changes.update(loads(data))
+                elif part.name == 'avatar':
+                    if (avatar := self._store_image(member['id'], data)) is None:
+                        return web.Response(status=400, text='Invalid image')
+
+                    changes['avatar'] = avatar
+        else:
+            changes = await request.json()
+
+        self.edits.append((member['id'], changes))
+
+        for field in ('name', 'avatar', 'proxy_tags', 'userproxy'):
+            if field in changes:
+                member[field] = changes[field]
+
+        return web.json_response(member)
+
+    async def _list_groups(self, request: web.Request) -> web.Response:
+        groups = [
+            group
+            for group in self.groups.values()
+            if self._owns(request, group['id'])
+        ]
+
+        return web.json_response(_page(request, groups))
+
+    async def _get_group(self, request: web.Request) -> web.Response:
+        group = self.groups.get(request.match_info['group_id'])
+
+        if group is None or not self._owns(request, group['id']):
+            return web.Response(status=404, text='Group not found')
+
+        return web.json_response(group)
+
+    async def _get_image(self, request: web.Request) -> web.Response:
+        name = request.match_info['name']
+
+        if (data := self.images.get(name)) is None:
+            return web.Response(status=404, text='Image not found')
+
+        return web.Response(body=data)
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        socket = _Socket(ws, request.query.get('compress') == 'zlib-stream')
+
+        await socket.send(GatewayOpcode.HELLO, {'heartbeat_interval': 45000})
+
+        async for message in ws:
+            payload = loads(message.data)
+
+            match payload.get('op'):
+                case GatewayOpcode.HEARTBEAT:
+                    await socket.send(GatewayOpcode.HEARTBEAT_ACK)
+                case GatewayOpcode.IDENTIFY | GatewayOpcode.RESUME:
+                    data = payload.get('d') or {}
+
+                    if self.token is not None and data.get('token') != self.token:
+                        await ws.close(code=4004)
+                        break
+
+                    socket.intents = Intents(data.get('intents', socket.intents))
+                    self._sockets.add(socket)
+                    await socket.send(
+                        GatewayOpcode.DISPATCH, {'session_id': str(ObjectId())}, 'READY')
+
+        self._sockets.discard(socket)
+        return ws
+
+    def _store_image(self, parent_id: str, data: bytes) -> str | None:
+        if (extension := detect_image_extension(data)) is None:
+            return None
+
+        digest = blake2b(data, digest_size=16).digest()
+        self.images[f'{digest.hex()}.{extension.name.lower()}'] = data
+        return (bytes([extension.value]) + digest).hex()
+
+
+def _page(request: web.Request, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    after = request.query.get('after', '')
+    limit = int(request.query.get('limit', 100))
+
+    return sorted(
+        (item for item in items if item['id'] > after),
+        key=lambda item: item['id']
+    )[:limit]
@@ -21,18 +21,24 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
-from typing import Literal, Any, TypeVar, Self
+from typing import Literal, Any, BinaryIO, TypeVar, Self, TYPE_CHECKING
+from binascii import unhexlify
+from os import PathLike
+from re import compile
 
 from pydantic_core.core_schema import ValidationInfo, str_schema
 from pydantic import GetJsonSchemaHandler, GetCoreSchemaHandler
 from pydantic_core import CoreSchema, core_schema
 from pydantic.json_schema import JsonSchemaValue
-from pydantic.validators import plain_validator
-from bson.objectid import ObjectId, InvalidId
+from bson.objectid import ObjectId
 
 from .enums import ImageExtension
 
 
+if TYPE_CHECKING:
+    from .application import Application
+
+
 __all__ = (
     'PydanticObjectId',
     'MISSING',
@@ -40,9 +46,19 @@ __all__ = (
     'Image',
     'MissingOr',
     'MissingNoneOr',
+    'CDN_URL',
 )
 
 
+CDN_URL = 'https://cdn.plural.gg'
+
+
+_OBJECT_ID_PATTERN = r'^[0-9a-fA-F]{24}$'
+_IMAGE_PATTERN = r'^(?:[0-9a-fA-F]{2})+$'
+_OBJECT_ID = compile(_OBJECT_ID_PATTERN)
+_OBJECT_ID_BYTES = compile(_OBJECT_ID_PATTERN.encode())
+
+
 class MissingType:
     def __bool__(self) -> Literal[False]:
         return False
@@ -68,6 +84,8 @@ class MissingType:
         return core_schema.json_or_python_schema(
             json_schema=core_schema.none_schema(),
             python_schema=core_schema.is_instance_schema(cls),
+            # models leave their MISSING fields out (see `UserProxy`), this only stops a dump from failing
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda _: None)
         )
 
     @classmethod
@@ -89,21 +107,37 @@ class PydanticObjectId(ObjectId):
         yield cls.validate
 
     @classmethod
-    def validate(cls, v, _: ValidationInfo):
-        if isinstance(v, bytes):
-            v = v.decode("utf-8")
-        try:
-            return PydanticObjectId(v)
-        except (InvalidId, TypeError):
-            raise ValueError("Id must be of type PydanticObjectId")
+    def validate(cls, v, _: ValidationInfo | None = None):
+        # checked up front so invalid input doesn't pay for a raised and caught InvalidId,
+        # and valid input skips ObjectId's own validation by passing the 12 raw bytes
+        if isinstance(v, str):
+            if _OBJECT_ID.fullmatch(v):
+                return cls(bytes.fromhex(v))
+        elif type(v) is cls:
+            return v
+        elif isinstance(v, ObjectId):
+            return cls(v.binary)
+        elif isinstance(v, bytes):
+            if _OBJECT_ID_BYTES.fullmatch(v):
+                return cls(unhexlify(v))
+        raise ValueError("Id must be of type PydanticObjectId")
+
+    @classmethod
+    def _from_hex(cls, v: str) -> 'PydanticObjectId':
+        return cls(bytes.fromhex(v))
 
     @classmethod
     def __get_pydantic_core_schema__(
         cls, source_type: Any, handler: GetCoreSchemaHandler
     ) -> CoreSchema:  # type: ignore
         return core_schema.json_or_python_schema(
-            python_schema=plain_validator(cls.validate),
-            json_schema=str_schema(),
+            python_schema=core_schema.with_info_plain_validator_function(
+                cls.validate),
+            # the pattern is checked by pydantic-core, so json only calls back to build the id
+            json_schema=core_schema.no_info_after_validator_function(
+                cls._from_hex,
+                str_schema(pattern=_OBJECT_ID_PATTERN)
+            ),
             serialization=core_schema.plain_serializer_function_ser_schema(
                 lambda instance: str(instance), when_used="json"
             ),
@@ -131,24 +165,44 @@ MissingNoneOr = T | None | MissingType
 
 
 class Image:
-    def __init__(self, image_data: bytes, parent_id: PydanticObjectId) -> None:
-        self.extension = ImageExtension(image_data[0])
-        self.hash = image_data[1:].hex()
+    __slots__ = ('_data', '_parent_id', '_cdn_url', '_url', '_hash', '_ext', '_app')
+
+    def __init__(
+        self,
+        image_data: bytes,
+        parent_id: PydanticObjectId,
+        cdn_url: str = CDN_URL,
+        application: 'Application | None' = None
+    ) -> None:
+        # validates the extension byte
+        ImageExtension(image_data[0])
+        self._data = bytes(image_data)
         self._parent_id = parent_id
+        self._cdn_url = cdn_url
+        # derived from the data on first access, then kept
+        self._url: str | None = None
+        self._hash: str | None = None
+        self._ext: str | None = None
+        self._app = application
 
     def __bytes__(self) -> bytes:
-        return self.extension.value.to_bytes() + bytes.fromhex(self.hash)
+        return self._data
 
     def __str__(self) -> str:
-        return bytes(self).hex()
+        return self._data.hex()
+
+    def __repr__(self) -> str:
+        return f'<Image {self}>'
 
     def __eq__(self, other: object) -> bool:
         return (
             isinstance(other, type(self)) and
-            self.extension == other.extension and
-            self.hash == other.hash
+            self._data == other._data
         )
 
+    def __hash__(self) -> int:
+        return hash(self._data)
+
     @classmethod
     def __get_pydantic_core_schema__(
         cls,
@@ -156,12 +210,12 @@ class Image:
         _handler: GetJsonSchemaHandler,
     ) -> CoreSchema:
         return core_schema.json_or_python_schema(
-            json_schema=core_schema.bytes_schema(),
-            python_schema=core_schema.union_schema([
-                core_schema.is_instance_schema(cls),
-                core_schema.bytes_schema(),
-                core_schema.no_info_plain_validator_function(cls.validate)
-            ]),
+            python_schema=core_schema.with_info_plain_validator_function(
+                cls.validate),
+            json_schema=core_schema.with_info_after_validator_function(
+                cls._from_hex,
+                str_schema(pattern=_IMAGE_PATTERN)
+            ),
             serialization=core_schema.plain_serializer_function_ser_schema(
                 lambda x: str(x),
                 return_schema=core_schema.str_schema(),
@@ -169,13 +223,113 @@ class Image:
             )
         )
 
+    @classmethod
+    def validate(cls, value: Any, info: ValidationInfo) -> 'Image':  # noqa: ANN401
+        if isinstance(value, cls):
+            return value
+
+        if isinstance(value, str):
+            value = bytes.fromhex(value)
+
+        if not isinstance(value, bytes):
+            raise ValueError('Image must be bytes or a hex string')
+
+        return cls._from_info(value, info)
+
+    @classmethod
+    def _from_hex(cls, value: str, info: ValidationInfo) -> 'Image':
+        return cls._from_info(bytes.fromhex(value), info)
+
+    @classmethod
+    def _from_info(cls, value: bytes, info: ValidationInfo) -> 'Image':
+        # the parent id is the id field of the model being validated,
+        # the cdn url and application are passed in the validation context
+        context = info.context or {}
+
+        return cls(
+            value,
+            (info.data or {}).get('id'),
+            context.get('cdn_url', CDN_URL),
+            context.get('application')
+        )
+
+    @property
+    def extension(self) -> ImageExtension:
+        """The image extension."""
+        return ImageExtension(self._data[0])
+
+    @property
+    def hash(self) -> str:
+        """The hex hash of the image."""
+        if self._hash is None:
+            self._hash = self._data[1:].hex()
+
+        return self._hash
+
     @property
     def url(self) -> str:
         """The CDN URL of the avatar."""
-        #! figure out how to make this with a modifiable base_url
-        return f'https://cdn.plural.gg/images/{self._parent_id}/{self.hash}.{self.extension.name.lower()}'
+        if self._url is None:
+            self._url = f'{self._cdn_url}/images/{self._parent_id}/{self.hash}.{self.ext}'
+
+        return self._url
 
     @property
     def ext(self) -> str:
         """The string file extension of the image. e.g. 'png'"""
-        return self.extension.name.lower()
+        if self._ext is None:
+            self._ext = self.extension.name.lower()
+
+        return self._ext
+
+    async def read(self) -> memoryview:
+        """
+        Download the image, or read it from the application `ImageCache` if one is set.
+
+        Concurrent reads of the same image share a single download.
+
+        :raises ValueError: The image was not created by an application.
+        :raises HTTPError: The CDN responded with an error status.
+
+        :return: The image bytes. A cached image is memory-mapped rather than copied.
+        """
+        if self._app is None:
+            raise ValueError('The image must be created by the application')
+
+        return await self._app._read_image(self)
+
+    async def save(
+        self,
+        fp: str | PathLike[str] | BinaryIO,
+        *,
+        seek_begin: bool = True
+    ) -> int:
+        """
+        Save the image to a file. See `read`.
+
+        :param fp: The file path or binary file object to write to.
+        :type fp: `str` | `PathLike[str]` | `BinaryIO`
+        :param seek_begin: Whether to seek to the start of a file object after writing. Defaults to `True`.
+        :type seek_begin: `bool`
+
+        :return: The number of bytes written.
+        """
+        # imported here so the models don't pay for asyncio at import
+        from asyncio import to_thread
+
+        data = await self.read()
+
+        if isinstance(fp, str | PathLike):
+            return await to_thread(_write_file, fp, data)
+
+        written = fp.write(data)
+
+        if seek_begin:
+            fp.seek(0)
+
+        return written
+
+
+def _write_file(path: str | PathLike[str], data: memoryview) -> int:
+    with open(path, 'wb') as file:
+        return file.write(data)
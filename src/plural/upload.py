@@ -0,0 +1,193 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from collections.abc import AsyncIterable
+from os import PathLike, fspath, stat
+from typing import BinaryIO
+
+from .enums import ImageExtension
+from .types import Image
+
+
+__all__ = (
+    'MAX_IMAGE_SIZE',
+    'ImageSource',
+    'ImageUpload',
+    'detect_image_extension',
+)
+
+
+MAX_IMAGE_SIZE = 8 * 1024 * 1024
+'''The largest image, in bytes, that will be uploaded.'''
+
+ImageSource = bytes | bytearray | memoryview | str | PathLike[str] | AsyncIterable[bytes] | Image
+'''Image bytes, a path to an image file, an async iterator of image chunks, or an existing `Image` to copy.'''
+
+# the longest signature is webp, RIFF????WEBP
+_HEADER_SIZE = 12
+
+
+def detect_image_extension(data: bytes | bytearray | memoryview) -> ImageExtension | None:
+    '''
+    Detect the format of an image from its magic bytes, without decoding it.
+
+    :param data: The image, or at least its first 12 bytes.
+    :type data: `bytes` | `bytearray` | `memoryview`
+
+    :return: The image extension, or `None` if the format is not supported.
+    '''
+    view = memoryview(data)
+
+    if view[:8] == b'\x89PNG\r\n\x1a\n':
+        return ImageExtension.PNG
+
+    if view[:3] == b'\xff\xd8\xff':
+        return ImageExtension.JPG
+
+    if view[:6] == b'GIF87a' or view[:6] == b'GIF89a':
+        return ImageExtension.GIF
+
+    if view[:4] == b'RIFF' and view[8:12] == b'WEBP':
+        return ImageExtension.WEBP
+
+    return None
+
+
+class ImageUpload:
+    '''
+    An image that has been checked and is ready to upload.
+
+    In-memory images are sent from a view of the original buffer, and files are
+    streamed from disk, reopened for every attempt so rate limited requests can
+    be retried. Async iterators are buffered once, as the size has to be known
+    before the upload starts.
+
+    Use `ImageUpload.prepare` to create one.
+    '''
+    __slots__ = ('extension', 'size', '_data', '_path')
+
+    def __init__(
+        self,
+        extension: ImageExtension,
+        size: int,
+        *,
+        data: memoryview | None = None,
+        path: str | None = None
+    ) -> None:
+        self.extension = extension
+        self.size = size
+        self._data = data
+        self._path = path
+
+    def __repr__(self) -> str:
+        return f'<ImageUpload {self.extension.name.lower()} {self.size} bytes>'
+
+    @classmethod
+    async def prepare(
+        cls,
+        source: ImageSource,
+        max_size: int = MAX_IMAGE_SIZE
+    ) -> 'ImageUpload':
+        '''
+        Check the format and size of an image before it is uploaded.
+
+        :param source: Image bytes, a path to an image file, an async iterator of image chunks, or an existing `Image` to copy.
+        :type source: `ImageSource`
+        :param max_size: The largest allowed image, in bytes. Defaults to `MAX_IMAGE_SIZE`.
+        :type max_size: `int`
+
+        :raises ValueError: The image is empty, too large, or not a supported format.
+
+        :return: The prepared upload.
+        '''
+        if isinstance(source, ImageUpload):
+            _check_size(source.size, max_size)
+            return source
+
+        if isinstance(source, Image):
+            source = await source.read()
+
+        if isinstance(source, bytes | bytearray | memoryview):
+            view = memoryview(source).cast('B')
+            _check_size(view.nbytes, max_size)
+            return cls(_check_extension(view), view.nbytes, data=view)
+
+        if isinstance(source, str | PathLike):
+            # imported here so the models don't pay for asyncio at import
+            from asyncio import to_thread
+
+            path = fspath(source)
+            size, header = await to_thread(_read_header, path)
+            _check_size(size, max_size)
+            return cls(_check_extension(header), size, path=path)
+
+        buffer = bytearray()
+
+        async for chunk in source:
+            buffer += chunk
+
+            # checked as chunks arrive so an oversized stream isn't read to the end
+            if len(buffer) > max_size:
+                _check_size(len(buffer), max_size)
+
+        view = memoryview(buffer)
+        _check_size(view.nbytes, max_size)
+        return cls(_check_extension(view), view.nbytes, data=view)
+
+    @property
+    def filename(self) -> str:
+        return f'image.{self.extension.name.lower()}'
+
+    @property
+    def content_type(self) -> str:
+        return self.extension.mime_type
+
+    def open(self) -> memoryview | BinaryIO:
+        '''Return the body for one upload attempt.'''
+        if self._data is not None:
+            return self._data
+
+        assert self._path is not None
+        return open(self._path, 'rb')  # noqa: SIM115
+
+
+def _read_header(path: str) -> tuple[int, bytes]:
+    size = stat(path).st_size
+
+    with open(path, 'rb') as file:
+        return size, file.read(_HEADER_SIZE)
+
+
+def _check_size(size: int, max_size: int) -> None:
+    if size == 0:
+        raise ValueError('Image must not be empty')
+
+    if size > max_size:
+        raise ValueError(f'Image must be at most {max_size} bytes')
+
+
+def _check_extension(header: bytes | memoryview) -> ImageExtension:
+    if (extension := detect_image_extension(header)) is None:
+        raise ValueError('Image must be a png, jpg, gif or webp')
+
+    return extension
@@ -21,3 +21,355 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+from typing import Any, TypeVar, TYPE_CHECKING
+from collections.abc import AsyncIterator
+from operator import attrgetter
+
+from .types import PydanticObjectId
+from .http import Route
+from .pagination import PAGE_SIZE, paginate
+from .models import Member, Group, Message
+from .models.abc import PluralModel
+
+
+if TYPE_CHECKING:
+    from .application import Application
+    from .scheduler import UserQueue
+
+
+M = TypeVar('M', bound=PluralModel)
+
+
+class User:
+    def __init__(self, user_id: int, application: 'Application') -> None:
+        self.user_id = user_id
+        self.application = application
+        self._headers = {'X-User-Id': str(user_id)}
+        self._owner = str(user_id).encode()
+
+    def __repr__(self) -> str:
+        return f'<User {self.user_id}>'
+
+    async def _request(
+        self,
+        route: Route,
+        *,
+        json: Any = None,  # noqa: ANN401
+        params: dict[str, str] | None = None,
+        files: dict[str, Any] | None = None,
+        coalesce: bool = True
+    ) -> bytes | None:
+        if (scheduler := self.application.scheduler) is None:
+            return await self.application._request(
+                route,
+                json=json,
+                headers=self._headers,
+                params=params,
+                files=files,
+                coalesce=coalesce
+            )
+
+        await scheduler.acquire(self.user_id, route)
+
+        try:
+            return await self.application._request(
+                route,
+                json=json,
+                headers=self._headers,
+                params=params,
+                files=files,
+                coalesce=coalesce
+            )
+        finally:
+            scheduler.release(self.user_id)
+
+    @property
+    def queue(self) -> 'UserQueue | None':
+        '''
+        The scheduling state of this user, including queue depth and wait time.
+
+        `None` if the application has no scheduler, or if the user is idle and its
+        queue was dropped. Statistics start over when a dropped queue is created again.
+        '''
+        if (scheduler := self.application.scheduler) is None:
+            return None
+
+        return scheduler.queues.get(self.user_id)
+
+    async def fetch_member(
+        self,
+        member_id: PydanticObjectId | str,
+        coalesce: bool = True,
+        use_cache: bool = True
+    ) -> Member:
+        '''
+        Fetch a member by ID. Requires the `members.read` intent.
+
+        :param member_id: The member ID.
+        :type member_id: `PydanticObjectId` | `str`
+        :param coalesce: Whether to share an identical request that is already in flight. Defaults to `True`.
+        :type coalesce: `bool`
+        :param use_cache: Whether to return the member from the application cache, if enabled. Defaults to `True`.
+        :type use_cache: `bool`
+
+        :raises NotFound: The member was not found.
+
+        :return: The member.
+        '''
+        member_id = PydanticObjectId(member_id)
+        cache = self.application.cache
+
+        if (
+            use_cache and
+            cache is not None and
+            (member := self._cached(cache.members.get(member_id))) is not None
+        ):
+            return member
+
+        if use_cache and (data := await self._shared_get('members', member_id)) is not None:
+            member = Member._from_data(data, self.application, self)
+
+            if cache is not None:
+                cache.members.set(member_id, member)
+
+            return member
+
+        data = await self._request(
+            Route('GET', '/members/{member_id}', member_id=member_id),
+            coalesce=coalesce
+        )
+
+        member = Member._from_data(data, self.application, self)
+
+        if cache is not None:
+            cache.members.set(member_id, member)
+
+        self._shared_set('members', member_id, data)
+
+        return member
+
+    async def fetch_group(
+        self,
+        group_id: PydanticObjectId | str,
+        coalesce: bool = True,
+        use_cache: bool = True
+    ) -> Group:
+        '''
+        Fetch a group by ID. Requires the `groups.read` intent.
+
+        :param group_id: The group ID.
+        :type group_id: `PydanticObjectId` | `str`
+        :param coalesce: Whether to share an identical request that is already in flight. Defaults to `True`.
+        :type coalesce: `bool`
+        :param use_cache: Whether to return the group from the application cache, if enabled. Defaults to `True`.
+        :type use_cache: `bool`
+
+        :raises NotFound: The group was not found.
+
+        :return: The group.
+        '''
+        group_id = PydanticObjectId(group_id)
+        cache = self.application.cache
+
+        if (
+            use_cache and
+            cache is not None and
+            (group := self._cached(cache.groups.get(group_id))) is not None
+        ):
+            return group
+
+        if use_cache and (data := await self._shared_get('groups', group_id)) is not None:
+            group = Group._from_data(data, self.application, self)
+
+            if cache is not None:
+                cache.groups.set(group_id, group)
+
+            return group
+
+        data = await self._request(
+            Route('GET', '/groups/{group_id}', group_id=group_id),
+            coalesce=coalesce
+        )
+
+        group = Group._from_data(data, self.application, self)
+
+        if cache is not None:
+            cache.groups.set(group_id, group)
+
+        self._shared_set('groups', group_id, data)
+
+        return group
+
+    def iter_members(
+        self,
+        group_id: PydanticObjectId | str | None = None,
+        *,
+        limit: int | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: int = 1
+    ) -> AsyncIterator[Member]:
+        '''
+        Iterate over the user's members. Requires the `members.read` intent.
+
+        e.g. `async for member in user.iter_members(): ...`
+
+        :param group_id: Only return members of this group. Defaults to every group.
+        :type group_id: `PydanticObjectId` | `str` | `None`
+        :param limit: The maximum number of members to return. Defaults to every member.
+        :type limit: `int` | `None`
+        :param page_size: The number of members to request per page. Defaults to `PAGE_SIZE`.
+        :type page_size: `int`
+        :param prefetch: The number of pages to fetch ahead while the current one is consumed. Defaults to 1.
+        :type prefetch: `int`
+
+        :return: An async iterator of members. Breaking out of the loop cancels any request still in flight.
+        '''
+        params = {}
+
+        if group_id is not None:
+            params['group_id'] = str(PydanticObjectId(group_id))
+
+        async def fetch(after: PydanticObjectId | None, size: int) -> list[Member]:
+            members = Member._list_from_data(
+                await self._page(Route('GET', '/members'), params, after, size) or b'[]',
+                self.application,
+                self
+            )
+
+            if (cache := self.application.cache) is not None:
+                for member in members:
+                    cache.members.set(member.id, member)
+
+            return members
+
+        return paginate(
+            fetch,
+            attrgetter('id'),
+            limit=limit,
+            page_size=page_size,
+            prefetch=prefetch
+        )
+
+    def iter_groups(
+        self,
+        *,
+        limit: int | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: int = 1
+    ) -> AsyncIterator[Group]:
+        '''
+        Iterate over the user's groups. Requires the `groups.read` intent.
+
+        :param limit: The maximum number of groups to return. Defaults to every group.
+        :type limit: `int` | `None`
+        :param page_size: The number of groups to request per page. Defaults to `PAGE_SIZE`.
+        :type page_size: `int`
+        :param prefetch: The number of pages to fetch ahead while the current one is consumed. Defaults to 1.
+        :type prefetch: `int`
+
+        :return: An async iterator of groups. Breaking out of the loop cancels any request still in flight.
+        '''
+        async def fetch(after: PydanticObjectId | None, size: int) -> list[Group]:
+            groups = Group._list_from_data(
+                await self._page(Route('GET', '/groups'), {}, after, size) or b'[]',
+                self.application,
+                self
+            )
+
+            if (cache := self.application.cache) is not None:
+                for group in groups:
+                    cache.groups.set(group.id, group)
+
+            return groups
+
+        return paginate(
+            fetch,
+            attrgetter('id'),
+            limit=limit,
+            page_size=page_size,
+            prefetch=prefetch
+        )
+
+    def iter_messages(
+        self,
+        channel_id: int | None = None,
+        *,
+        limit: int | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: int = 1
+    ) -> AsyncIterator[Message]:
+        '''
+        Iterate over the messages proxied for the user, oldest first.
+
+        :param channel_id: Only return messages from this channel. Defaults to every channel.
+        :type channel_id: `int` | `None`
+        :param limit: The maximum number of messages to return. Defaults to every message.
+        :type limit: `int` | `None`
+        :param page_size: The number of messages to request per page. Defaults to `PAGE_SIZE`.
+        :type page_size: `int`
+        :param prefetch: The number of pages to fetch ahead while the current one is consumed. Defaults to 1.
+        :type prefetch: `int`
+
+        :return: An async iterator of messages. Breaking out of the loop cancels any request still in flight.
+        '''
+        params = {}
+
+        if channel_id is not None:
+            params['channel_id'] = str(channel_id)
+
+        async def fetch(after: int | None, size: int) -> list[Message]:
+            messages = Message._list_from_data(
+                await self._page(Route('GET', '/messages'), params, after, size) or b'[]',
+                self.application
+            )
+
+            if (cache := self.application.cache) is not None:
+                for message in messages:
+                    cache.add_message(message)
+
+            return messages
+
+        return paginate(
+            fetch,
+            attrgetter('proxy_id'),
+            limit=limit,
+            page_size=page_size,
+            prefetch=prefetch
+        )
+
+    async def _page(
+        self,
+        route: Route,
+        params: dict[str, str],
+        after: Any,  # noqa: ANN401
+        size: int
+    ) -> bytes | None:
+        params = {**params, 'limit': str(size)}
+
+        if after is not None:
+            params['after'] = str(after)
+
+        return await self._request(route, params=params)
+
+    async def _shared_get(self, namespace: str, model_id: PydanticObjectId) -> bytes | None:
+        if (data := await self.application._shared_get(namespace, str(model_id))) is None:
+            return None
+
+        # shared values are tagged with the user they were fetched as, like `_cached`
+        owner, _, data = data.partition(b'\n')
+        return data if owner == self._owner else None
+
+    def _shared_set(self, namespace: str, model_id: PydanticObjectId, data: bytes | None) -> None:
+        if data is not None:
+            self.application._shared_set(namespace, [str(model_id)], self._owner + b'\n' + data)
+
+    def _cached(self, model: M | None) -> M | None:
+        # a model fetched on behalf of another user must not leak to this one
+        if (
+            model is None or
+            model._user is None or
+            model._user.user_id != self.user_id
+        ):
+            return None
+
+        return model
@@ -0,0 +1,120 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Future, get_running_loop
+from collections import OrderedDict
+
+from .models import Message
+
+
+__all__ = (
+    'MessageWaiters',
+)
+
+
+class MessageWaiters:
+    '''
+    Futures waiting for messages to be proxied, keyed by original and proxy ID.
+
+    Resolved by `MESSAGES_EVENTS` gateway events, so any number of callers can
+    wait for a message without sending a request each. The most recent
+    messages are remembered, so a caller that starts waiting just after the
+    event arrived is still answered.
+    '''
+
+    def __init__(self, recent: int = 1024) -> None:
+        self.recent_size = recent
+        '''How many recently proxied messages are remembered.'''
+        self._waiters: dict[int, set[Future[Message]]] = {}
+        self._recent: OrderedDict[int, Message] = OrderedDict()
+
+    def __len__(self) -> int:
+        '''The number of IDs being waited for.'''
+        return len(self._waiters)
+
+    def get(self, message_id: int) -> Message | None:
+        '''Return a recently proxied message by original or proxy ID, if it is remembered.'''
+        return self._recent.get(message_id)
+
+    def wait(self, message_id: int) -> Future[Message]:
+        '''
+        Return a future that is resolved when the message is proxied.
+
+        Cancel the future to stop waiting.
+
+        :param message_id: The original or proxy message ID.
+        :type message_id: `int`
+        '''
+        future: Future[Message] = get_running_loop().create_future()
+
+        if (message := self._recent.get(message_id)) is not None:
+            future.set_result(message)
+            return future
+
+        self._waiters.setdefault(message_id, set()).add(future)
+        future.add_done_callback(lambda future: self._discard(message_id, future))
+        return future
+
+    def resolve(self, message: Message) -> int:
+        '''
+        Resolve every future waiting for the message.
+
+        :param message: The proxied message.
+        :type message: `Message`
+
+        :return: The number of futures resolved.
+        '''
+        resolved = 0
+
+        for message_id in (message.proxy_id, message.original_id):
+            if message_id is None:
+                continue
+
+            self._recent[message_id] = message
+            self._recent.move_to_end(message_id)
+
+            for future in self._waiters.pop(message_id, ()):
+                if not future.done():
+                    future.set_result(message)
+                    resolved += 1
+
+        while len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+        return resolved
+
+    def forget(self, *message_ids: int | None) -> None:
+        '''Stop remembering messages, e.g. after they are deleted.'''
+        for message_id in message_ids:
+            if message_id is not None:
+                self._recent.pop(message_id, None)
+
+    def _discard(self, message_id: int, future: Future[Message]) -> None:
+        if (
+            (futures := self._waiters.get(message_id)) is not None and
+            future in futures
+        ):
+            futures.discard(future)
+
+            if not futures:
+                del self._waiters[message_id]
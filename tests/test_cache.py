@@ -0,0 +1,194 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Queue, create_task, sleep, wait_for
+from mmap import mmap
+from pathlib import Path
+from typing import Any
+
+from pytest import MonkeyPatch, mark, raises
+
+from plural.application import Application
+from plural.cache import ImageCache, ModelCache, TTLCache
+from plural.errors import NotFound
+from plural.types import PydanticObjectId
+from plural.enums import Intents
+from plural.testing import MockAPI
+
+
+INTENTS = Intents.MEMBERS_READ | Intents.MEMBERS_WRITE | Intents.MEMBERS_EVENTS
+
+
+def test_ttl_expiry(monkeypatch: MonkeyPatch) -> None:
+    now = 0.0
+    monkeypatch.setattr('plural.cache.monotonic', lambda: now)
+    cache: TTLCache[str, int] = TTLCache(maxsize=2, ttl=10.0)
+
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=20.0)
+    now = 15.0
+
+    assert cache.get('a') is None
+    assert 'b' in cache
+    assert cache.get('b') == 2
+
+    now = 25.0
+
+    assert cache.get('b') is None
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.expirations) == (1, 2, 2)
+
+
+def test_least_recently_used_is_evicted() -> None:
+    cache: TTLCache[str, int] = TTLCache(maxsize=2)
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.stats.evictions == 1
+
+
+@mark.parametrize('ttl', [None, 0.05])
+async def test_fetch_uses_the_cache(api: MockAPI, ttl: float | None) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', INTENTS, base_url=api.url, cache=ModelCache(ttl=ttl)) as app:
+        user = app.as_user(1)
+        first = await user.fetch_member(member_id)
+
+        assert await user.fetch_member(member_id) is first
+
+        await sleep(0.1)
+        await user.fetch_member(member_id)
+
+    assert api.requests['GET /members/{member_id}'] == (1 if ttl is None else 2)
+
+
+async def test_edit_writes_through(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', INTENTS, base_url=api.url, cache=ModelCache()) as app:
+        user = app.as_user(1)
+        member = await user.fetch_member(member_id)
+        await member.edit(name='alice')
+
+        assert (await user.fetch_member(member_id)).name == 'alice'
+
+    assert api.requests['GET /members/{member_id}'] == 1
+
+
+async def test_events_invalidate(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    app = Application(
+        'token',
+        INTENTS,
+        base_url=api.url,
+        gateway_url=api.gateway_url,
+        cache=ModelCache()
+    )
+    events: Queue[Any] = Queue()
+
+    @app.listen('member_update')
+    async def on_member_update(event: Any) -> None:  # noqa: ANN401
+        await events.put(event)
+
+    connection = create_task(app.connect())
+
+    try:
+        while not app.gateway.connected:
+            await sleep(0.01)
+
+        user = app.as_user(1)
+        await user.fetch_member(member_id)
+        api.members[member_id]['name'] = 'alice'
+
+        # not seen until the event arrives
+        assert (await user.fetch_member(member_id)).name == 'bob'
+
+        await api.dispatch('MEMBER_UPDATE', api.members[member_id])
+        await wait_for(events.get(), 5)
+
+        assert PydanticObjectId(member_id) not in app.cache.members  # type: ignore[union-attr]
+        assert (await user.fetch_member(member_id)).name == 'alice'
+    finally:
+        await app.close()
+        await connection
+
+    assert api.requests['GET /members/{member_id}'] == 2
+
+
+async def test_cached_models_are_not_shared_between_users(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', INTENTS, base_url=api.url, cache=ModelCache()) as app:
+        await app.as_user(1).fetch_member(member_id)
+
+        # the member is cached, but was fetched as user 1
+        with raises(NotFound):
+            await app.as_user(2).fetch_member(member_id)
+
+        assert (await app.as_user(1).fetch_member(member_id)).name == 'bob'
+
+    assert api.requests['GET /members/{member_id}'] == 2
+
+
+async def test_image_cache(tmp_path: Path) -> None:
+    downloads: list[str] = []
+
+    def downloader(name: str, data: bytes) -> Any:  # noqa: ANN401
+        async def download() -> bytes:
+            downloads.append(name)
+            return data
+
+        return download
+
+    cache = ImageCache(tmp_path, max_size=25)
+
+    assert bytes(await cache.read('a.png', downloader('a.png', b'a' * 10))) == b'a' * 10
+
+    hit = await cache.read('a.png', downloader('a.png', b'stale'))
+
+    # hits are mapped from the file rather than read
+    assert bytes(hit) == b'a' * 10
+    assert isinstance(hit.obj, mmap)
+
+    await cache.read('b.png', downloader('b.png', b'b' * 10))
+    await cache.read('a.png', downloader('a.png', b''))
+    await cache.read('c.png', downloader('c.png', b'c' * 10))
+
+    # b was the least recently used
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['a.png', 'c.png']
+    assert cache.size == 20
+    assert downloads == ['a.png', 'b.png', 'c.png']
+
+    # a new cache picks up the files already on disk
+    reopened = ImageCache(tmp_path, max_size=25)
+    await reopened.read('c.png', downloader('c.png', b''))
+
+    assert (len(reopened), reopened.stats.hits, reopened.stats.misses) == (2, 1, 0)
+
+    await reopened.clear()
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,117 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from bson import ObjectId
+from pytest import mark, raises
+
+from plural.application import Application
+from plural.errors import NotFound
+from plural.models import Member, ProxyTag
+from plural.types import MISSING
+from plural.enums import Intents
+from plural.testing import MockAPI
+
+
+INTENTS = Intents.MEMBERS_READ | Intents.MEMBERS_WRITE
+
+
+async def test_save_sends_only_changed_fields(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', INTENTS, base_url=api.url, track_changes=True) as app:
+        member = await app.as_user(1).fetch_member(member_id)
+
+        assert await member.save() is False
+
+        member.name = 'alice'
+        assert await member.save() is True
+
+        # changed in place, without assigning the field
+        member.proxy_tags.append(ProxyTag(prefix='a:'))
+        assert await member.save() is True
+
+        assert await member.save() is False
+
+    assert api.edits == [
+        (member_id, {'name': 'alice'}),
+        (member_id, {'proxy_tags': [{'prefix': 'a:', 'suffix': '', 'regex': False, 'case_sensitive': False}]})
+    ]
+
+
+async def test_save_requires_track_changes(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', INTENTS, base_url=api.url) as app:
+        member = await app.as_user(1).fetch_member(member_id)
+        member.name = 'alice'
+
+        with raises(ValueError):
+            await member.save()
+
+    assert api.edits == []
+
+
+async def test_bulk_edit(api: MockAPI) -> None:
+    ids = [api.add_member(name, user_id=1)['id'] for name in ('a', 'b', 'c', 'd')]
+
+    async with Application('token', INTENTS, base_url=api.url, track_changes=True) as app:
+        user = app.as_user(1)
+        saved, edited, unchanged, deleted = [await user.fetch_member(member_id) for member_id in ids]
+        saved.name = 'saved'
+        del api.members[ids[3]]
+
+        results = await app.bulk_edit([
+            saved,
+            (edited, {'name': 'edited'}),
+            unchanged,
+            (deleted, {'name': 'deleted'})
+        ], concurrency=2)
+
+    assert [result.model for result in results] == [saved, edited, unchanged, deleted]
+    assert [result.changed for result in results] == [True, True, False, False]
+    assert [result.error for result in results][:3] == [None, None, None]
+    assert isinstance(results[3].error, NotFound)
+    assert sorted(api.edits) == sorted([(ids[0], {'name': 'saved'}), (ids[1], {'name': 'edited'})])
+
+
+def test_edit_body_drops_missing_values() -> None:
+    member = Member.model_validate({'id': str(ObjectId()), 'name': 'bob'})
+
+    assert member._edit_body(name=MISSING, avatar=MISSING, proxy_tags=MISSING, userproxy=MISSING) is None
+    assert member._edit_body(name='alice', avatar=None, proxy_tags=MISSING, userproxy=MISSING) == (
+        b'{"name":"alice","avatar":null}')
+    assert member._edit_body(proxy_tags=[ProxyTag(prefix='a:')]) == (
+        b'{"proxy_tags":[{"prefix":"a:","suffix":"","regex":false,"case_sensitive":false}]}')
+
+
+@mark.parametrize('values', [
+    {'name': 5},
+    {'proxy_tags': 'a:'},
+    {'proxy_tags': [{'prefix': 'a:'}]},
+    {'userproxy': 5}
+])
+def test_edit_body_rejects_bad_types(values: dict[str, object]) -> None:
+    member = Member.model_validate({'id': str(ObjectId()), 'name': 'bob'})
+
+    with raises(ValueError):
+        member._edit_body(**values)
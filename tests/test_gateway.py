@@ -0,0 +1,117 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Queue, create_task, sleep, wait_for
+from typing import Any
+
+from bson import ObjectId
+
+from plural.application import Application
+from plural.registry import MemberRegistry
+from plural.cache import ModelCache
+from plural.enums import Intents
+from plural.testing import MockAPI
+
+
+async def test_bad_payloads_are_dispatched_without_a_model(api: MockAPI) -> None:
+    app = Application(
+        'token',
+        Intents.MEMBERS_EVENTS,
+        base_url=api.url,
+        gateway_url=api.gateway_url,
+        cache=ModelCache()
+    )
+    events: Queue[Any] = Queue()
+
+    @app.listen('member_update')
+    async def on_member_update(event: Any) -> None:  # noqa: ANN401
+        await events.put(event)
+
+    connection = create_task(app.connect())
+
+    try:
+        while not app.gateway.connected:
+            await sleep(0.01)
+
+        member_id = str(ObjectId())
+
+        for payload in (
+            {'name': 'no id'},
+            {'id': member_id, 'name': 'bad tags', 'proxy_tags': [{'prefix': None}]},
+            {'id': member_id, 'name': 'good'}
+        ):
+            await api.dispatch('MEMBER_UPDATE', payload)
+
+        received = [await wait_for(events.get(), 5) for _ in range(3)]
+
+        assert [event.data['name'] for event in received] == ['no id', 'bad tags', 'good']
+        assert [event.model is None for event in received] == [True, True, False]
+        assert received[2].model.id == ObjectId(member_id)
+        assert not connection.done()
+    finally:
+        await app.close()
+        await connection
+
+
+async def test_bad_ids_do_not_end_the_gateway(api: MockAPI) -> None:
+    app = Application(
+        'token',
+        Intents.MEMBERS_EVENTS | Intents.MESSAGES_EVENTS | Intents.GROUPS_EVENTS,
+        base_url=api.url,
+        gateway_url=api.gateway_url,
+        cache=ModelCache()
+    )
+    registry = MemberRegistry()
+    registry.attach(app)
+    events: Queue[Any] = Queue()
+
+    @app.listen()
+    async def on_event(event: Any) -> None:  # noqa: ANN401
+        await events.put(event)
+
+    connection = create_task(app.connect())
+
+    try:
+        while not app.gateway.connected:
+            await sleep(0.01)
+
+        await api.dispatch('MEMBER_UPDATE', {'id': 'not an id', 'name': 'bad'})
+        await api.dispatch('MEMBER_DELETE', {'id': 'not an id'})
+        await api.dispatch('GROUP_DELETE', {'id': ['not', 'an', 'id']})
+        await api.dispatch('MESSAGE_DELETE', {'proxy_id': 'abc', 'original_id': None})
+        await api.dispatch('MEMBER_UPDATE', ['not', 'an', 'object'])  # type: ignore[arg-type]
+        await api.dispatch('MEMBER_UPDATE', {'id': str(ObjectId()), 'name': 'good'})
+
+        received = [await wait_for(events.get(), 5) for _ in range(5)]
+
+        # the payload that isn't an object is dropped, every other event still arrives
+        assert sorted(event.name for event in received) == [
+            'group_delete', 'member_delete', 'member_update', 'member_update', 'message_delete'
+        ]
+        assert {event.data['name']: event.model is None for event in received if 'name' in event.data} == {
+            'bad': True, 'good': False
+        }
+        assert not connection.done()
+    finally:
+        await app.close()
+        await connection
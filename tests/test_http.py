@@ -0,0 +1,193 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import CancelledError, create_task, gather, get_running_loop, sleep
+from time import perf_counter
+
+from aiohttp import ClientConnectionError
+from pytest import mark, raises
+
+from plural.application import Application
+from plural.errors import HTTPError
+from plural.http import RetryPolicy
+from plural.metrics import Metrics
+from plural.route import Route
+from plural.enums import Intents
+from plural.testing import MockAPI, MockConfig
+
+
+RETRY = RetryPolicy(max_retries=10, backoff_base=0.01, backoff_max=0.01)
+
+
+@mark.parametrize('config', [
+    MockConfig(error_rate=0.5, error_status=503, seed=0),
+    MockConfig(reset_rate=0.5, seed=0)
+])
+async def test_get_is_retried(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    metrics = Metrics()
+
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url,
+        metrics=metrics,
+        retry=RETRY
+    ) as app:
+        user = app.as_user(1)
+
+        for _ in range(10):
+            assert (await user.fetch_member(member_id, use_cache=False)).name == 'bob'
+
+    # 499 is how the mock records a dropped connection
+    assert api.statuses[200] == 10
+    assert api.statuses.keys() - {200} in ({503}, {499})
+    assert sum(metrics.transient_retries.values()) > 0
+
+
+@mark.parametrize('failure', [
+    MockConfig(error_rate=1.0, error_status=503),
+    MockConfig(reset_rate=1.0)
+])
+async def test_patch_is_not_retried(api: MockAPI, failure: MockConfig) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ | Intents.MEMBERS_WRITE,
+        base_url=api.url,
+        retry=RETRY
+    ) as app:
+        member = await app.as_user(1).fetch_member(member_id)
+        api.config = failure
+
+        with raises((HTTPError, ClientConnectionError)):
+            await member.edit(name='alice')
+
+    assert api.requests['PATCH /members/{member_id}'] == 1
+    assert api.members[member_id]['name'] == 'bob'
+
+
+@mark.parametrize('config', [MockConfig(latency=1.0)])
+async def test_lookup_deadline(api: MockAPI) -> None:
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url,
+        retry=RetryPolicy(deadline_margin=0.1)
+    ) as app:
+        start = perf_counter()
+
+        with raises(TimeoutError):
+            await app.fetch_message(1, max_wait=0.2)
+
+        elapsed = perf_counter() - start
+
+        # an existence check answers no instead
+        assert await app.fetch_message(1, existence_only=True, max_wait=0.2) is False
+
+    assert 0.3 <= elapsed < 0.6
+
+
+@mark.parametrize('config', [MockConfig(jitter=0.05, seed=0)])
+async def test_hedging_respects_budget(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    metrics = Metrics()
+
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url,
+        metrics=metrics,
+        retry=RetryPolicy(hedge_percentile=0.2, hedge_min_samples=5, hedge_budget=0.1)
+    ) as app:
+        user = app.as_user(1)
+
+        for _ in range(40):
+            assert (await user.fetch_member(member_id, use_cache=False)).name == 'bob'
+
+    hedges = sum(metrics.hedges.values())
+
+    # most requests are slower than the 20th percentile, the budget only allows a tenth to be hedged
+    assert 1 <= hedges <= 4
+    # a second attempt is cancelled without reaching the API if the first finishes just before it is sent
+    assert 40 <= api.requests['GET /members/{member_id}'] <= 40 + hedges
+
+
+@mark.parametrize('config', [MockConfig(latency=0.05)])
+async def test_identical_gets_are_coalesced(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    metrics = Metrics()
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url, metrics=metrics) as app:
+        user = app.as_user(1)
+        members = await gather(*(user.fetch_member(member_id, use_cache=False) for _ in range(5)))
+        uncoalesced = await gather(*(
+            user.fetch_member(member_id, coalesce=False, use_cache=False)
+            for _ in range(2)
+        ))
+
+    assert {member.name for member in members + uncoalesced} == {'bob'}
+    assert api.requests['GET /members/{member_id}'] == 3
+    assert metrics.coalesced == 4
+
+
+@mark.parametrize('config', [MockConfig(latency=0.1)])
+async def test_cancelled_caller_does_not_fail_the_others(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+        user = app.as_user(1)
+        first = create_task(user.fetch_member(member_id, use_cache=False))
+        await sleep(0.02)
+        second = create_task(user.fetch_member(member_id, use_cache=False))
+        await sleep(0.02)
+        first.cancel()
+
+        assert (await second).name == 'bob'
+
+        with raises(CancelledError):
+            await first
+
+    assert api.requests['GET /members/{member_id}'] == 1
+
+
+@mark.parametrize('config', [MockConfig(latency=0.2)])
+async def test_coalesced_callers_keep_their_deadline(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    route = Route('GET', '/members/{member_id}', member_id=member_id)
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+        first = create_task(app.http.request(route))
+        await sleep(0.02)
+        start = perf_counter()
+
+        with raises(TimeoutError):
+            await app.http.request(route, deadline=get_running_loop().time() + 0.05)
+
+        elapsed = perf_counter() - start
+
+        assert await first is not None
+
+    assert elapsed < 0.15
+    assert api.requests['GET /members/{member_id}'] == 1
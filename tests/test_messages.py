@@ -0,0 +1,92 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from aiohttp import web
+from pytest import mark
+
+from plural.application import BULK_MESSAGE_LIMIT, Application
+from plural.enums import Intents
+from plural.testing import MockAPI, MockConfig
+
+
+class NoBulkAPI(MockAPI):
+    '''An API without the bulk endpoint, answering it with the given status.'''
+
+    def __init__(self, status: int) -> None:
+        self.status = status
+        super().__init__(MockConfig(max_wait=0))
+
+    async def _bulk_messages(self, request: web.Request) -> web.Response:
+        return web.Response(status=self.status)
+
+
+async def test_bulk_lookup(api: MockAPI) -> None:
+    for proxy_id in range(1, 4):
+        api.add_message(proxy_id, original_id=proxy_id + 100)
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+        messages = await app.fetch_messages([1, 102, 3, 99, 1], max_wait=1)
+        exists = await app.fetch_messages([2, 99], existence_only=True, max_wait=1)
+
+    assert {
+        message_id: message and message.proxy_id
+        for message_id, message in messages.items()
+    } == {1: 1, 102: 2, 3: 3, 99: None}
+    assert exists == {2: True, 99: False}
+    assert api.requests == {'POST /messages/bulk': 2}
+
+
+async def test_bulk_lookup_is_chunked(api: MockAPI) -> None:
+    ids = list(range(1, BULK_MESSAGE_LIMIT + 51))
+
+    for proxy_id in ids:
+        api.add_message(proxy_id)
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+        found = [message_id async for message_id, _ in app.iter_message_lookups(ids, existence_only=True)]
+
+    assert found == ids
+    assert api.requests == {'POST /messages/bulk': 2}
+
+
+@mark.parametrize('status', [404, 405])
+async def test_falls_back_to_single_lookups(status: int) -> None:
+    async with NoBulkAPI(status) as api, Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url
+    ) as app:
+        api.add_message(1)
+        api.add_message(2)
+
+        assert await app.fetch_messages([1, 2, 3], existence_only=True, max_wait=1) == (
+            {1: True, 2: True, 3: False})
+
+        # the missing endpoint is remembered
+        assert await app.fetch_messages([2], existence_only=True, max_wait=1) == {2: True}
+
+    assert api.requests == {'POST /messages/bulk': 1, 'GET /messages/{message_id}': 4}
+    # the bulk request, the three found messages and the missing one
+    statuses = {200: 3, 404: 1}
+    statuses[status] = statuses.get(status, 0) + 1
+    assert api.statuses == statuses
@@ -0,0 +1,152 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from bson import ObjectId
+from pytest import mark
+
+from plural.proxy import ProxyTagMatcher
+from plural.models import Member
+
+
+def member(name: str, *tags: tuple[str, str, bool]) -> Member:
+    return Member.model_validate({
+        'id': str(ObjectId()),
+        'name': name,
+        'proxy_tags': [
+            {'prefix': prefix, 'suffix': suffix, 'regex': regex}
+            for prefix, suffix, regex in tags
+        ]
+    })
+
+
+def matched(matcher: ProxyTagMatcher, content: str) -> tuple[str, str] | None:
+    if (match := matcher.match(content)) is None:
+        return None
+
+    return match.member.name, match.content
+
+
+def test_literal_tags() -> None:
+    matcher = ProxyTagMatcher([
+        member('a', ('a:', '', False)),
+        member('b', ('[', ']', False)),
+        member('c', ('', '-c', False))
+    ])
+
+    assert matched(matcher, 'a: hi') == ('a', ' hi')
+    assert matched(matcher, 'A: hi') == ('a', ' hi')
+    assert matched(matcher, '[hi]') == ('b', 'hi')
+    assert matched(matcher, 'hi -c') == ('c', 'hi ')
+    assert matched(matcher, 'hi') is None
+
+
+def test_longest_tag_wins() -> None:
+    matcher = ProxyTagMatcher([
+        member('short', ('a', '', False)),
+        member('long', ('a:', '', False)),
+        member('regex', (r'a:\d+', '', True))
+    ])
+
+    assert matched(matcher, 'a hi') == ('short', ' hi')
+    assert matched(matcher, 'a: hi') == ('long', ' hi')
+    assert matched(matcher, 'a:12 hi') == ('regex', ' hi')
+
+
+@mark.parametrize('reverse', [False, True])
+def test_longest_regex_tag_wins(reverse: bool) -> None:
+    members = [
+        member('short', ('a', '', True)),
+        member('long', ('a:', '', True)),
+        member('digits', (r'r\d+', '', True)),
+        member('fixed', ('r1:', '', True))
+    ]
+    matcher = ProxyTagMatcher(members[::-1] if reverse else members)
+
+    assert matched(matcher, 'a:hello') == ('long', 'hello')
+    assert matched(matcher, 'ahello') == ('short', 'hello')
+    assert matched(matcher, 'r1:hello') == ('fixed', 'hello')
+    assert matched(matcher, 'r123hello') == ('digits', 'hello')
+
+
+def test_regex_tags() -> None:
+    matcher = ProxyTagMatcher([
+        member('a', (r'r\d+:', '', True)),
+        member('b', ('<', '>', True)),
+        member('c', ('', r'-\w', True))
+    ])
+
+    assert matched(matcher, 'r12: hi') == ('a', ' hi')
+    assert matched(matcher, 'R1:hi') == ('a', 'hi')
+    assert matched(matcher, '<hi>') == ('b', 'hi')
+    assert matched(matcher, 'hi -x') == ('c', 'hi ')
+    assert matched(matcher, 'r: hi') is None
+
+
+@mark.parametrize(('prefix', 'content'), [
+    (r'(?i)b\d:', 'B1: hi'),
+    (r'(?s)x.:', 'x\n: hi'),
+    (r'(?P<name>q):', 'q: hi'),
+    (r'(f)\1:', 'ff: hi'),
+    (r'(?P<n>g)(?P=n):', 'gg: hi')
+])
+def test_isolated_regex_tags(prefix: str, content: str) -> None:
+    # none of these can join the alternation, and none of them may break the tags that can
+    matcher = ProxyTagMatcher([
+        member('isolated', (prefix, '', True)),
+        member('named', (r'(?P<name>w):', '', True)),
+        member('plain', (r'p\d:', '', True))
+    ])
+
+    assert matched(matcher, content) == ('isolated', ' hi')
+    assert matched(matcher, 'w: hi') == ('named', ' hi')
+    assert matched(matcher, 'p1: hi') == ('plain', ' hi')
+
+
+def test_isolated_regex_suffix() -> None:
+    matcher = ProxyTagMatcher([member('a', ('', r'-(\w)\1', True))])
+
+    assert matched(matcher, 'hi -xx') == ('a', 'hi ')
+    assert matched(matcher, 'hi -xy') is None
+
+
+def test_invalid_regex_is_skipped() -> None:
+    matcher = ProxyTagMatcher([
+        member('bad', ('(', '', True)),
+        member('good', (r'g\d:', '', True))
+    ])
+
+    assert matched(matcher, 'g1: hi') == ('good', ' hi')
+    assert matched(matcher, '( hi') is None
+
+
+def test_remove() -> None:
+    isolated = member('isolated', (r'(f)\1:', '', True))
+    plain = member('plain', (r'p\d:', '', True))
+    matcher = ProxyTagMatcher([isolated, plain])
+
+    matcher.remove(isolated.id)
+    matcher.remove(plain.id)
+
+    assert len(matcher) == 0
+    assert matched(matcher, 'ff: hi') is None
+    assert matched(matcher, 'p1: hi') is None
@@ -0,0 +1,100 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import gather
+from time import perf_counter
+
+from pytest import mark, raises
+
+from plural.application import Application
+from plural.errors import RateLimited
+from plural.enums import Intents
+from plural.testing import MockAPI, MockConfig
+
+
+@mark.parametrize('config', [MockConfig(ratelimit_limit=5, ratelimit_window=0.2)])
+async def test_limits_are_learned(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+        user = app.as_user(1)
+        start = perf_counter()
+
+        for _ in range(12):
+            await user.fetch_member(member_id, use_cache=False)
+
+    # once the first response reports the limit, requests wait for the window instead of hitting it
+    assert api.statuses == {200: 12}
+    assert perf_counter() - start >= 0.35
+
+
+@mark.parametrize('config', [MockConfig(ratelimit_limit=5, ratelimit_window=0.2)])
+async def test_concurrent_requests_stay_under_the_limit(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+        user = app.as_user(1)
+        members = await gather(*(
+            user.fetch_member(member_id, coalesce=False, use_cache=False)
+            for _ in range(20)
+        ))
+
+    assert {member.name for member in members} == {'bob'}
+    assert api.statuses == {200: 20}
+
+
+@mark.parametrize('config', [MockConfig(ratelimit_rate=0.5, seed=0)])
+async def test_429_is_retried(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url,
+        max_ratelimit_retries=20
+    ) as app:
+        user = app.as_user(1)
+
+        for _ in range(10):
+            await user.fetch_member(member_id, use_cache=False)
+
+    assert api.statuses[200] == 10
+    assert api.statuses[429] > 0
+
+
+@mark.parametrize('config', [MockConfig(ratelimit_rate=1.0)])
+async def test_429_retries_are_bounded(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url,
+        max_ratelimit_retries=2
+    ) as app:
+        with raises(RateLimited) as error:
+            await app.as_user(1).fetch_member(member_id)
+
+    assert error.value.retry_after == 0.05
+    assert not error.value.is_global
+    assert api.statuses == {429: 3}
@@ -0,0 +1,71 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from bson import ObjectId
+
+from plural.registry import MemberRegistry
+from plural.models import Member
+
+
+def member(name: str) -> Member:
+    return Member.model_validate({'id': str(ObjectId()), 'name': name})
+
+
+def names(registry: MemberRegistry, query: str, limit: int = 25) -> list[str]:
+    return [entry.name for entry in registry.search(query, limit)]
+
+
+def test_name_starts_rank_first() -> None:
+    registry = MemberRegistry([
+        member('the alpha'),
+        member('Alphabet'),
+        member('alpha'),
+        member('beta')
+    ])
+
+    assert names(registry, 'al') == ['alpha', 'Alphabet', 'the alpha']
+    assert names(registry, 'AL', limit=1) == ['alpha']
+    assert names(registry, 'b') == ['beta']
+    assert names(registry, 'x') == []
+
+
+def test_name_starts_are_not_crowded_out() -> None:
+    registry = MemberRegistry([member(f'zz al{index:02}') for index in range(60)])
+    registry.add(member('alpha'))
+
+    results = names(registry, 'al', limit=5)
+
+    assert results[0] == 'alpha'
+    assert len(results) == 5
+
+
+def test_edits_are_reindexed() -> None:
+    alpha, beta = member('alpha'), member('beta gamma')
+    registry = MemberRegistry([alpha, beta])
+
+    registry.add(alpha.model_copy(update={'name': 'delta'}))
+    registry.remove(beta.id)
+
+    assert names(registry, 'al') == []
+    assert names(registry, 'de') == ['delta']
+    assert names(registry, 'ga') == []
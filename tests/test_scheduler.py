@@ -0,0 +1,178 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import CancelledError, Task, create_task, gather, sleep
+
+from pytest import mark, raises
+
+from plural.application import Application
+from plural.scheduler import FairScheduler
+from plural.enums import Intents
+from plural.testing import MockAPI, MockConfig
+
+
+async def admit_in_order(scheduler: FairScheduler, tasks: dict[Task[None], int]) -> list[int]:
+    '''Release each admitted request in turn and return the users in the order they were admitted.'''
+    order: list[int] = []
+
+    while tasks:
+        await sleep(0)
+        done = [task for task in tasks if task.done()]
+
+        assert len(done) == 1
+
+        order.append(user_id := tasks.pop(done[0]))
+        scheduler.release(user_id)
+
+    return order
+
+
+async def test_cancelled_waiter_is_skipped() -> None:
+    scheduler = FairScheduler(concurrency=1)
+    await scheduler.acquire(1)
+
+    cancelled = create_task(scheduler.acquire(2))
+    waiting = create_task(scheduler.acquire(3))
+    await sleep(0)
+
+    # the cancelled acquire only cleans up on its next step, after the release
+    cancelled.cancel()
+    scheduler.release(1)
+
+    with raises(CancelledError):
+        await cancelled
+
+    await waiting
+
+    assert scheduler.in_flight == 1
+    assert scheduler.depth == 0
+
+    scheduler.release(3)
+
+    assert scheduler.in_flight == 0
+    assert not scheduler.queues
+
+
+async def test_weights() -> None:
+    scheduler = FairScheduler(concurrency=1)
+    scheduler.configure(1, weight=3.0)
+    await scheduler.acquire(0)
+
+    tasks = {
+        create_task(scheduler.acquire(user_id)): user_id
+        for _ in range(8)
+        for user_id in (1, 2)
+    }
+    await sleep(0)
+    scheduler.release(0)
+
+    order = await admit_in_order(scheduler, tasks)
+
+    # while both are waiting, user 1 gets three requests for every one of user 2
+    assert order[:8].count(1) == 6
+    assert order[-4:] == [2] * 4
+
+
+async def test_idle_user_does_not_bank_credit() -> None:
+    scheduler = FairScheduler(concurrency=1)
+
+    for _ in range(5):
+        await scheduler.acquire(1)
+        scheduler.release(1)
+
+    await scheduler.acquire(0)
+    tasks = {
+        create_task(scheduler.acquire(user_id)): user_id
+        for _ in range(3)
+        for user_id in (1, 2)
+    }
+    await sleep(0)
+    scheduler.release(0)
+
+    assert await admit_in_order(scheduler, tasks) == [1, 2, 1, 2, 1, 2]
+
+
+async def test_per_user_limit() -> None:
+    scheduler = FairScheduler(concurrency=10, per_user=2)
+    scheduler.configure(2, limit=3)
+
+    tasks = [create_task(scheduler.acquire(user_id)) for user_id in (1, 1, 1, 2, 2, 2, 2)]
+    await sleep(0)
+
+    assert scheduler.queues[1].in_flight == 2
+    assert scheduler.queues[2].in_flight == 3
+    assert scheduler.depth == 2
+
+    scheduler.release(1)
+    scheduler.release(2)
+    await sleep(0)
+
+    assert all(task.done() for task in tasks)
+    assert scheduler.in_flight == 5
+
+
+async def test_idle_queues_are_dropped() -> None:
+    scheduler = FairScheduler(per_user=1)
+    scheduler.configure(2, weight=2.0)
+
+    await scheduler.acquire(1)
+    waiting = create_task(scheduler.acquire(1))
+    await sleep(0)
+    scheduler.release(1)
+
+    assert 1 in scheduler.queues
+
+    await waiting
+    scheduler.release(1)
+
+    # user 2 keeps its own weight
+    assert list(scheduler.queues) == [2]
+    assert scheduler.requests == 2
+
+
+@mark.parametrize('config', [MockConfig(ratelimit_limit=4, ratelimit_window=0.2)])
+async def test_ratelimit_share(api: MockAPI) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    scheduler = FairScheduler(ratelimit_share=0.5)
+
+    async with Application(
+        'token',
+        Intents.MEMBERS_READ,
+        base_url=api.url,
+        scheduler=scheduler
+    ) as app:
+        user = app.as_user(1)
+        await user.fetch_member(member_id, use_cache=False)
+
+        # user 1 may only use half of the bucket per window
+        await gather(*(user.fetch_member(member_id, coalesce=False, use_cache=False) for _ in range(4)))
+
+        assert scheduler.queues[1].max_wait_time > 0.05
+        assert api.statuses == {200: 5}
+
+        # the queue is kept until the share has refilled, so the user can't start over with a full one
+        assert user.queue is not None
+
+        await sleep(0.25)
+
+        assert user.queue is None
@@ -0,0 +1,198 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import Semaphore, gather, get_running_loop, run, sleep, start_unix_server
+from asyncio import StreamReader, StreamWriter
+from multiprocessing import get_context
+from pathlib import Path
+from time import monotonic
+from typing import Any
+
+from pytest import approx, mark
+
+from plural.application import Application
+from plural.state import SharedState, SocketBackend, _write
+from plural.enums import Intents
+from plural.testing import MockAPI, MockConfig
+
+
+def test_reserve_follows_the_reported_limits() -> None:
+    state = SharedState()
+
+    assert state.reserve('bucket') == 0.0
+
+    state.update('bucket', 2, 1, 0.5)
+
+    assert state.reserve('bucket') == 0.0
+    assert 0.0 < state.reserve('bucket') <= 0.5
+
+
+def test_restore_keeps_the_stricter_limits() -> None:
+    old = SharedState()
+    old.update('exhausted', 5, 0, 10.0)
+    old.update('unknown', 5, 3, 10.0)
+    old.exhaust('', 2.0, is_global=True)
+
+    new = SharedState()
+    new.update('unknown', 5, 1, 10.0)
+    new.restore(old.snapshot())
+
+    assert new.reserve('exhausted') > 0.0
+    assert new.buckets['unknown'].remaining == 1
+    assert new.global_reset_at - monotonic() == approx(2.0, abs=0.1)
+
+
+async def test_socket_backend_shares_state(tmp_path: Path) -> None:
+    host = SocketBackend(tmp_path / 'state.sock')
+    client = SocketBackend(tmp_path / 'state.sock')
+    invalidated: list[tuple[str, list[str]]] = []
+    host.on_invalidate(lambda namespace, keys: invalidated.append((namespace, keys)))
+
+    try:
+        await host.start()
+        await client.start()
+
+        assert host.hosting and not client.hosting
+
+        # writes aren't acknowledged, the client's next call is answered after them
+        await client.update('bucket', 1, 1, 5.0)
+        await client.set('members', 'a', b'payload')
+
+        assert await client.reserve('bucket') == 0.0
+        assert await host.reserve('bucket') > 0.0
+        assert await host.get('members', 'a') == b'payload'
+
+        await client.invalidate('members', ['a'])
+
+        assert await client.get('members', 'a') is None
+        assert await host.get('members', 'a') is None
+        assert invalidated == [('members', ['a'])]
+    finally:
+        await client.close()
+        await host.close()
+
+
+async def test_socket_backend_hands_over(tmp_path: Path) -> None:
+    path = tmp_path / 'state.sock'
+    host, first, second = (SocketBackend(path) for _ in range(3))
+
+    try:
+        for backend in (host, first, second):
+            await backend.start()
+
+        await host.update('bucket', 5, 0, 5.0)
+        await host.close()
+
+        # whichever client takes over, both still see the exhausted bucket
+        assert await first.reserve('bucket') > 0.0
+        assert await second.reserve('bucket') > 0.0
+        assert first.hosting != second.hosting
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_socket_backend_cleans_up(tmp_path: Path) -> None:
+    path = tmp_path / 'state.sock'
+    backend = SocketBackend(path)
+
+    await backend.start()
+
+    assert backend.hosting and path.exists()
+
+    await backend.close()
+
+    assert not backend.hosting and not path.exists()
+
+
+async def test_socket_backend_times_out(tmp_path: Path) -> None:
+    path = tmp_path / 'state.sock'
+
+    async def never_answer(reader: StreamReader, writer: StreamWriter) -> None:
+        _write(writer, [0, 'hello', []])
+        await reader.read()
+
+    server = await start_unix_server(never_answer, path)
+    backend = SocketBackend(path, timeout=0.1, reconnect_delay=10.0)
+
+    try:
+        start = monotonic()
+
+        assert await backend.reserve('bucket') == 0.0
+        assert monotonic() - start < 1.0
+        assert not backend.connected
+
+        # falls back to local state without waiting again
+        assert await backend.get('members', 'a') is None
+        assert monotonic() - start < 1.0
+    finally:
+        await backend.close()
+        server.close()
+
+
+def _worker(url: str, path: str, member_id: str, count: int, delay: float) -> None:
+    async def main() -> None:
+        await sleep(delay)
+
+        async with Application(
+            'token',
+            Intents.MEMBERS_READ,
+            base_url=url,
+            max_ratelimit_retries=20,
+            state=SocketBackend(path)
+        ) as app:
+            user = app.as_user(1)
+            semaphore = Semaphore(5)
+
+            async def fetch() -> Any:  # noqa: ANN401
+                async with semaphore:
+                    return await user.fetch_member(member_id, coalesce=False, use_cache=False)
+
+            await gather(*(fetch() for _ in range(count)))
+
+    run(main())
+
+
+@mark.parametrize('config', [MockConfig(ratelimit_limit=10, ratelimit_window=0.2)])
+async def test_shared_limiting_across_processes(api: MockAPI, tmp_path: Path) -> None:
+    member_id = api.add_member('bob', user_id=1)['id']
+    context = get_context('spawn')
+    # the first process to start hosts the state and the first to finish,
+    # so hosting is handed over while the others are still sending
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(api.url, str(tmp_path / 'state.sock'), member_id, count, delay))
+        for count, delay in ((20, 0.0), (40, 0.1), (60, 0.2))
+    ]
+
+    for process in processes:
+        process.start()
+
+    loop = get_running_loop()
+
+    for process in processes:
+        await loop.run_in_executor(None, process.join)
+
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+    assert api.statuses == {200: 120}
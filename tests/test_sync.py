@@ -0,0 +1,105 @@
+"""
+The MIT License (MIT)
+
+Copyright (c) 2024-present tyrantlink
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+from asyncio import sleep, to_thread
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from pytest import mark, raises
+
+from plural.errors import NotFound
+from plural.enums import Intents
+from plural.sync import SyncApplication
+from plural.testing import MockAPI, MockConfig
+
+
+@mark.parametrize('config', [MockConfig(latency=0.05)])
+async def test_concurrent_callers(api: MockAPI) -> None:
+    member_ids = [api.add_member(f'member {index}', user_id=1)['id'] for index in range(16)]
+
+    def fetch_all() -> tuple[list[str], float]:
+        with SyncApplication('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+            start = perf_counter()
+
+            with ThreadPoolExecutor(16) as executor:
+                members = list(executor.map(
+                    lambda member_id: app.as_user(1).fetch_member(member_id, use_cache=False),
+                    member_ids
+                ))
+
+            return [member.name for member in members], perf_counter() - start
+
+    names, elapsed = await to_thread(fetch_all)
+
+    assert names == [f'member {index}' for index in range(16)]
+    # scheduled on the loop independently, not one after another
+    assert elapsed < 16 * 0.05 / 2
+
+
+async def test_errors_reach_the_caller(api: MockAPI) -> None:
+    def fail() -> None:
+        with SyncApplication('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+            with raises(NotFound):
+                app.as_user(1).fetch_member('0' * 24)
+
+            with raises(TimeoutError):
+                app.run(sleep(1), timeout=0.05)
+
+            async def reentrant() -> None:
+                app.run(sleep(0))
+
+            with raises(RuntimeError):
+                app.run(reentrant())
+
+    await to_thread(fail)
+
+    assert api.requests == {'GET /members/{member_id}': 1}
+
+
+async def test_close_stops_the_loop(api: MockAPI) -> None:
+    api.add_member('bob', user_id=1)
+
+    def run() -> SyncApplication:
+        with SyncApplication('token', Intents.MEMBERS_READ, base_url=api.url) as app:
+            # breaking out of an iterator closes it on the loop
+            for member in app.as_user(1).iter_members():
+                assert member.name == 'bob'
+                break
+
+        return app
+
+    app = await to_thread(run)
+
+    assert not app._thread.is_alive()
+    assert app.loop.is_closed()
+    assert not app.application.http.started
+
+    coroutine = sleep(0)
+
+    with raises(RuntimeError):
+        app.run(coroutine)
+
+    # closed rather than left unawaited
+    assert coroutine.cr_frame is None
+
+    app.close()